@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+准入控制模块
+需要请求上游的工作按优先级（播放 > 详情 > 搜索 > 后台）占用每个worker有限的并发槽位：
+低优先级只能使用部分槽位，为播放请求保留余量；槽位不足时在有界队列中按优先级等待，
+超过各自的最长等待时间或被更高优先级挤出队列时快速返回503，而不是占住线程直到超时
+"""
+
+import time
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+from config import get_config
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 优先级从高到低
+PRIORITIES = ('playback', 'detail', 'search', 'background')
+
+class Overloaded(Exception):
+    """上游并发已满，请求被拒绝"""
+
+    def __init__(self, priority, reason, retry_after):
+        super().__init__(f"{priority} 请求被拒绝: {reason}")
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+class _Waiter:
+    __slots__ = ('rank', 'seq', 'event', 'granted', 'shed')
+
+    def __init__(self, rank, seq):
+        self.rank = rank
+        self.seq = seq
+        self.event = threading.Event()
+        self.granted = False
+        self.shed = False
+
+class AdmissionController:
+    """按优先级分配上游并发槽位
+
+    shares为各优先级最多可占用的槽位比例，max_waits为各优先级在队列中的最长等待秒数（0表示不排队）。
+    队列已满时，新请求可以挤掉队列中优先级更低的等待者。
+    """
+
+    def __init__(self, max_active, max_queue, shares, max_waits, retry_after, enabled=True):
+        self.enabled = enabled
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.max_waits = max_waits
+        self.retry_after = retry_after
+        self._ranks = {priority: rank for rank, priority in enumerate(PRIORITIES)}
+        self._limits = [max(1, round(max_active * shares[priority])) for priority in PRIORITIES]
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._peak_queue = 0
+        self._counts = {
+            priority: {'admitted': 0, 'queued': 0, 'rejected': 0, 'shed': 0, 'expired': 0, 'wait_ms': 0.0}
+            for priority in PRIORITIES
+        }
+
+    def acquire(self, priority, wait=True):
+        """占用一个槽位，无法在最长等待时间内获得时抛出Overloaded；wait为False时不排队"""
+        if not self.enabled:
+            return
+
+        rank = self._ranks[priority]
+        counts = self._counts[priority]
+        max_wait = self.max_waits[priority] if wait else 0
+        with self._lock:
+            # 有同级或更高优先级的请求在排队时不能插队
+            if self._active < self._limits[rank] and not any(w.rank <= rank for w in self._waiters):
+                self._active += 1
+                counts['admitted'] += 1
+                return
+
+            if max_wait <= 0:
+                counts['rejected'] += 1
+                raise Overloaded(priority, 'no_slot', self.retry_after)
+
+            if len(self._waiters) >= self.max_queue:
+                victim = max(self._waiters, key=lambda w: (w.rank, w.seq))
+                if victim.rank <= rank:
+                    counts['rejected'] += 1
+                    raise Overloaded(priority, 'queue_full', self.retry_after)
+                self._waiters.remove(victim)
+                victim.shed = True
+                victim.event.set()
+
+            waiter = _Waiter(rank, next(self._seq))
+            self._waiters.append(waiter)
+            counts['queued'] += 1
+            self._peak_queue = max(self._peak_queue, len(self._waiters))
+
+        started = time.perf_counter()
+        waiter.event.wait(max_wait)
+        with self._lock:
+            counts['wait_ms'] += (time.perf_counter() - started) * 1000
+            if waiter.granted:
+                counts['admitted'] += 1
+                return
+            if waiter.shed:
+                counts['shed'] += 1
+                reason = 'shed'
+            else:
+                self._waiters.remove(waiter)
+                counts['expired'] += 1
+                reason = 'deadline'
+        raise Overloaded(priority, reason, self.retry_after)
+
+    def release(self):
+        """释放槽位，并按优先级把空出的槽位交给排队的请求"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._active -= 1
+            while self._waiters:
+                best = min(self._waiters, key=lambda w: (w.rank, w.seq))
+                if self._active >= self._limits[best.rank]:
+                    break
+                self._waiters.remove(best)
+                best.granted = True
+                self._active += 1
+                best.event.set()
+
+    @contextmanager
+    def slot(self, priority):
+        """在with块内占用一个槽位"""
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        """获取准入统计信息（当前并发、队列深度和各优先级计数）"""
+        with self._lock:
+            queue_depth = {priority: 0 for priority in PRIORITIES}
+            for waiter in self._waiters:
+                queue_depth[PRIORITIES[waiter.rank]] += 1
+            return {
+                'enabled': self.enabled,
+                'active': self._active,
+                'max_active': self.max_active,
+                'limits': dict(zip(PRIORITIES, self._limits)),
+                'queue_depth': queue_depth,
+                'peak_queue_depth': self._peak_queue,
+                'max_queue': self.max_queue,
+                'priorities': {
+                    priority: dict(counts, wait_ms=round(counts['wait_ms'], 1))
+                    for priority, counts in self._counts.items()
+                }
+            }
+
+admission = AdmissionController(
+    max_active=config.ADMISSION_MAX_ACTIVE,
+    max_queue=config.ADMISSION_MAX_QUEUE,
+    shares=config.ADMISSION_SHARES,
+    max_waits=config.ADMISSION_MAX_WAITS,
+    retry_after=config.ADMISSION_RETRY_AFTER,
+    enabled=config.ADMISSION_ENABLED
+)
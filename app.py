@@ -6,41 +6,135 @@ Flask应用主文件 - 优化版本
 支持异步数据获取、缓存管理、错误处理和输入验证
 """
 
+import os
 import re
+import hmac
+import json
 import time
 import logging
+import threading
+from concurrent import futures
 from functools import wraps
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, g, send_from_directory
-from search import search_data
-from video import parse_video_details, get_play_link_by_id, clear_cache, get_cache_stats
+from urllib.parse import urlsplit
+from flask import Flask, Blueprint, Response, render_template, request, jsonify, g, send_from_directory, make_response, redirect
+from werkzeug.middleware.proxy_fix import ProxyFix
+from search import search_data, get_search_page_cache_stats
+from video import parse_video_details, fetch_video_details_batch, get_video_episodes, get_play_link_by_id, get_cache_stats, get_page_cache_stats, start_catalog_refresher, invalidate_video, video_generation
+from catalog import get_catalog
+from page_store import get_page_store
+from cache import TimedCache
+from serialization import dumps, CachedResponse, SUPPORTED_ENCODINGS
+from search_index import search_index, build_local_results
+from suggest import suggest_index
+from models import search_results_to_dict
+from cache_policy import content_ttl, video_ttl
+from hls import hls_proxy_enabled, get_playlist, select_variant, get_hls_cache_stats, resolve_hls_token, hls_proxy_url, HLS_MIMETYPE
+from recorder import request_recorder, build_trace
+from admission import admission, Overloaded
+from generations import generations, NAMESPACES
+from profiler import profiler, ProfilerBusy, to_collapsed, to_speedscope
+from assets import asset_url, assets_dir, resolve_asset
+from thumbs import thumb_proxy_enabled, get_thumbnail, get_cached_thumbnail, get_thumb_cache_stats, resolve_thumb_token, thumb_url, negotiate_format, snap_width
+from logging_setup import setup_logging
 from config import get_config
 
 # 获取配置
 config = get_config()
 
-# 配置日志
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format=config.LOG_FORMAT
-)
+# 配置日志（后台线程写出，重复日志限流）
+setup_logging()
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-app.config.from_object(config)
+# 路由注册在蓝图上，由create_app挂载到应用
+bp = Blueprint('main', __name__)
+bp.add_app_template_global(asset_url)
 
 # 简单的频率限制存储
 _rate_limit_storage = {}
 
+# 不记录的路径：静态文件和管理接口（回放时不应清空缓存）
+_RECORD_EXCLUDED_PREFIXES = ('/static/', '/assets/', '/cache/', '/health', '/debug/')
+
+def response_generation(key):
+    """响应缓存键所属范围的代数：search:* 属于搜索，video:<id>:* 和 episodes:<id>:* 属于该视频的详情和剧集，
+    videos:<id>,<id>:* 属于其中每个视频"""
+    kind, _, rest = key.partition(':')
+    if kind == 'search':
+        return generations.current('search')
+    return sum(video_generation(video_id) for video_id in rest.split(':', 1)[0].split(','))
+
+# 预序列化响应缓存：缓存命中时直接返回JSON字节，跳过字典构建和编码
+_response_cache = TimedCache(
+    default_timeout=config.CACHE_TIMEOUT,
+    max_size=config.CACHE_MAX_SIZE,
+    generation=response_generation
+)
+
+def json_response(data, status=200, cache_status=None):
+    """使用快速JSON路径构建响应"""
+    response = Response(dumps(data), status=status, mimetype='application/json')
+    if cache_status:
+        response.headers['X-Cache'] = cache_status
+    return response
+
+def choose_encoding(body_size):
+    """根据Accept-Encoding和大小阈值选择压缩编码"""
+    if body_size < config.COMPRESS_MIN_SIZE:
+        return None
+    for encoding in SUPPORTED_ENCODINGS:
+        if encoding in request.accept_encodings:
+            return encoding
+    return None
+
+def cached_response(entry, cache_status=None, mimetype='application/json'):
+    """从预序列化的缓存条目构建响应
+    
+    ETag和Last-Modified来自缓存条目的版本，支持If-None-Match/If-Modified-Since返回304，
+    并按客户端支持的编码返回条目上缓存的压缩响应体。
+    """
+    encoding = choose_encoding(len(entry.body))
+    
+    response = Response(mimetype=mimetype)
+    response.set_etag(f"{entry.etag}-{encoding}" if encoding else entry.etag)
+    response.last_modified = entry.created_at
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    if cache_status:
+        response.headers['X-Cache'] = cache_status
+    
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+    
+    response.set_data(entry.encoded(encoding))
+    if encoding:
+        response.content_encoding = encoding
+    return response
+
+def overloaded_response(error):
+    """上游并发已满时的快速拒绝响应"""
+    logger.warning(f"准入控制拒绝请求 {request.path}: {error}")
+    response = jsonify({'error': '服务繁忙，请稍后重试'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def request_priority(priority):
+    """浏览器预取的请求（Sec-Purpose/Purpose: prefetch）降为后台优先级"""
+    purpose = request.headers.get('Sec-Purpose') or request.headers.get('Purpose') or ''
+    return 'background' if 'prefetch' in purpose else priority
+
 def clean_rate_limit_storage():
     """清理过期的频率限制记录"""
     current_time = time.time()
+    # 复制一份再遍历，其他请求线程可能同时写入
     expired_keys = [
-        key for key, data in _rate_limit_storage.items()
+        key for key, data in list(_rate_limit_storage.items())
         if current_time - data['last_reset'] > 3600  # 清理1小时前的记录
     ]
     for key in expired_keys:
-        del _rate_limit_storage[key]
+        _rate_limit_storage.pop(key, None)
 
 # 装饰器：性能监控
 def monitor_performance(func):
@@ -55,69 +149,302 @@ def monitor_performance(func):
         if execution_time > 1.0:  # 记录超过1秒的请求
             logger.warning(f"{func.__name__} 执行时间较长: {execution_time:.2f}秒")
         else:
-            logger.debug(f"{func.__name__} 执行时间: {execution_time:.2f}秒")
+            logger.debug("%s 执行时间: %.2f秒", func.__name__, execution_time)
         
         return result
     return wrapper
 
 # 装饰器：频率限制
+def check_rate_limit(per_minute=None, per_hour=None, bucket=None):
+    """为当前客户端计一次请求，超过频率限制时返回False（不计数）
+    
+    bucket为None时各接口共用每个IP的计数，否则使用独立的计数。
+    """
+    if not config.RATE_LIMIT_ENABLED:
+        return True
+    
+    client_ip = request.remote_addr
+    key = client_ip if bucket is None else f"{bucket}:{client_ip}"
+    current_time = time.time()
+    
+    # 清理过期记录
+    if len(_rate_limit_storage) > 1000:  # 防止内存泄漏
+        clean_rate_limit_storage()
+    
+    if key not in _rate_limit_storage:
+        _rate_limit_storage[key] = {
+            'minute_count': 0,
+            'hour_count': 0,
+            'minute_reset': current_time,
+            'hour_reset': current_time,
+            'last_reset': current_time
+        }
+    
+    client_data = _rate_limit_storage[key]
+    
+    # 重置分钟计数
+    if current_time - client_data['minute_reset'] > 60:
+        client_data['minute_count'] = 0
+        client_data['minute_reset'] = current_time
+    
+    # 重置小时计数
+    if current_time - client_data['hour_reset'] > 3600:
+        client_data['hour_count'] = 0
+        client_data['hour_reset'] = current_time
+    
+    # 检查频率限制
+    minute_limit = per_minute or config.RATE_LIMIT_PER_MINUTE
+    hour_limit = per_hour or config.RATE_LIMIT_PER_HOUR
+    
+    if client_data['minute_count'] >= minute_limit:
+        logger.warning(f"客户端 {key} 超过分钟频率限制")
+        return False
+    
+    if client_data['hour_count'] >= hour_limit:
+        logger.warning(f"客户端 {key} 超过小时频率限制")
+        return False
+    
+    # 增加计数
+    client_data['minute_count'] += 1
+    client_data['hour_count'] += 1
+    client_data['last_reset'] = current_time
+    return True
+
 def rate_limit(per_minute=None, per_hour=None):
     """简单的频率限制装饰器"""
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            if not config.RATE_LIMIT_ENABLED:
-                return func(*args, **kwargs)
-            
-            client_ip = request.remote_addr
-            current_time = time.time()
-            
-            # 清理过期记录
-            if len(_rate_limit_storage) > 1000:  # 防止内存泄漏
-                clean_rate_limit_storage()
-            
-            if client_ip not in _rate_limit_storage:
-                _rate_limit_storage[client_ip] = {
-                    'minute_count': 0,
-                    'hour_count': 0,
-                    'minute_reset': current_time,
-                    'hour_reset': current_time,
-                    'last_reset': current_time
-                }
-            
-            client_data = _rate_limit_storage[client_ip]
-            
-            # 重置分钟计数
-            if current_time - client_data['minute_reset'] > 60:
-                client_data['minute_count'] = 0
-                client_data['minute_reset'] = current_time
-            
-            # 重置小时计数
-            if current_time - client_data['hour_reset'] > 3600:
-                client_data['hour_count'] = 0
-                client_data['hour_reset'] = current_time
-            
-            # 检查频率限制
-            minute_limit = per_minute or config.RATE_LIMIT_PER_MINUTE
-            hour_limit = per_hour or config.RATE_LIMIT_PER_HOUR
-            
-            if client_data['minute_count'] >= minute_limit:
-                logger.warning(f"客户端 {client_ip} 超过分钟频率限制")
+            if not check_rate_limit(per_minute, per_hour):
                 return jsonify({'error': '请求过于频繁，请稍后再试'}), 429
-            
-            if client_data['hour_count'] >= hour_limit:
-                logger.warning(f"客户端 {client_ip} 超过小时频率限制")
-                return jsonify({'error': '请求过于频繁，请稍后再试'}), 429
-            
-            # 增加计数
-            client_data['minute_count'] += 1
-            client_data['hour_count'] += 1
-            client_data['last_reset'] = current_time
-            
             return func(*args, **kwargs)
         return wrapper
     return decorator
 
+def apply_hls_proxy(episodes):
+    """启用m3u8代理时，返回播放地址改写为本地代理地址的剧集列表（分片仍直连CDN）"""
+    if not hls_proxy_enabled():
+        return list(episodes)
+    
+    return [
+        episode.with_play_url(hls_proxy_url(episode.play_url)) if episode.play_url else episode
+        for episode in episodes
+    ]
+
+def apply_hls_proxy_to_video(video):
+    """启用m3u8代理时，返回播放地址改写为本地代理地址的Video"""
+    if not hls_proxy_enabled():
+        return video
+    
+    return video._replace(
+        m3u8_url=hls_proxy_url(video.m3u8_url) if video.m3u8_url else video.m3u8_url,
+        episodes=tuple(apply_hls_proxy(video.episodes))
+    )
+
+def apply_thumb_proxy(results):
+    """启用缩略图代理时，返回封面地址改写为本地缩略图地址的搜索结果"""
+    if not thumb_proxy_enabled():
+        return results
+    
+    return dict(results, items=[
+        item._replace(image_url=thumb_url(item.image_url, config.THUMB_DEFAULT_WIDTH)) if item.image_url else item
+        for item in results['items']
+    ])
+
+def merge_local_results(keyword, results, page, limit):
+    """上游结果的最后一页（及之后的页）用本地索引中上游没有的结果补足limit条
+
+    本地结果按上游全部结果去重，接在上游结果之后与其一起分页，has_more按本地结果是否还有剩余计算。
+    """
+    upstream = results
+    if page > 1:
+        # 前面各页的结果：上游结果页已缓存，不会重新请求
+        with admission.slot(request_priority('search')):
+            upstream = search_data(keyword, page=1, limit=page * limit)
+        if upstream is None:
+            return results
+    seen_ids = {item.video_id for item in upstream['items']}
+    
+    # 本地结果在合并后列表中的起始位置（当前页之前已经显示的本地结果数）
+    extra_start = max(0, (page - 1) * limit - len(seen_ids))
+    room = limit - len(results['items'])
+    local_items = search_index.search(keyword, limit=len(seen_ids) + extra_start + room + 1)
+    extra_items = [item for item in local_items if item.video_id not in seen_ids]
+    
+    items = results['items'] + extra_items[extra_start:extra_start + room]
+    return dict(
+        results,
+        items=items,
+        item_count=len(items),
+        has_more=len(extra_items) > extra_start + room,
+        partial=results['partial'] or upstream['partial']
+    )
+
+# 进行中的上游解析：同一缓存键的并发请求共享一次解析结果
+_inflight_lock = threading.Lock()
+_inflight_calls = {}
+
+class _InflightCall:
+    """一次进行中的调用，其他请求等待其完成后共享结果"""
+    __slots__ = ('event', 'result')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+def singleflight(key, func, default=None):
+    """同一key的并发调用只执行一次func，其余调用等待并共享结果"""
+    with _inflight_lock:
+        call = _inflight_calls.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _InflightCall()
+            _inflight_calls[key] = call
+    
+    if not is_leader:
+        if not call.event.wait(config.REQUEST_TIMEOUT + config.ASYNC_TIMEOUT):
+            logger.warning(f"等待进行中的请求超时: {key}")
+            return default
+        return call.result if call.result is not None else default
+    
+    try:
+        call.result = func()
+    finally:
+        with _inflight_lock:
+            _inflight_calls.pop(key, None)
+        call.event.set()
+    return call.result
+
+def video_response_ttl(video):
+    """详情响应的缓存时间：按剧集状态和播放地址有效期决定，有剧集未解析出播放地址时按默认时间缓存以便重试"""
+    max_age = None
+    if any(not episode.play_url for episode in video.episodes):
+        max_age = config.CACHE_TIMEOUT
+    return video_ttl(video, max_age)
+
+def video_cache_key(video_id, max_episodes):
+    """视频详情响应的缓存键"""
+    return f"video:{video_id}:{max_episodes}"
+
+def load_video_response(video_id, max_episodes, use_async=True):
+    """解析视频详情并写入响应缓存，返回(缓存条目, 响应数据)，失败时返回(None, None)
+    
+    /play预取和随后的API请求使用同一缓存键，只会触发一次上游解析。
+    """
+    cache_key = video_cache_key(video_id, max_episodes)
+    
+    def build():
+        play_link = get_play_link_by_id(video_id)
+        logger.info("开始解析视频详情，播放链接: %s", play_link)
+        video = parse_video_details(
+            play_link, 
+            use_async=use_async, 
+            max_episodes=max_episodes
+        )
+        if not video:
+            return None, None
+        
+        search_index.add_video_detail(video_id, video)
+        suggest_index.add(video_id, video.title)
+        ttl = video_response_ttl(video)
+        video = apply_hls_proxy_to_video(video)
+        response_data = {'success': True, 'data': video.to_dict()}
+        entry = CachedResponse.from_data(response_data)
+        _response_cache.set(cache_key, entry, timeout=ttl)
+        return entry, response_data
+    
+    return singleflight(cache_key, build, default=(None, None))
+
+def videos_cache_key(video_ids, max_episodes, play_urls):
+    """批量详情响应的缓存键"""
+    return f"videos:{','.join(video_ids)}:{max_episodes}:{play_urls}"
+
+def compact_video_dict(video_id, video, play_urls):
+    """批量详情中的单个视频：列表页需要的元数据和前几集，play_urls为False时不含播放地址"""
+    if play_urls:
+        video = apply_hls_proxy_to_video(video)
+        episodes = [episode.to_dict() for episode in video.episodes]
+    else:
+        episodes = [
+            {'title': episode.title, 'url': episode.url, 'number': episode.number}
+            for episode in video.episodes
+        ]
+    data = {
+        'video_id': video_id,
+        'video_title': video.title,
+        'tags': list(video.tags),
+        'status_info': video.status_info,
+        'update_text': video.update_text,
+        'formatted_date': video.formatted_date,
+        'release_date': video.release_date,
+        'episode_count': video.episode_count,
+        'episodes': episodes
+    }
+    if play_urls:
+        data['m3u8_url'] = video.m3u8_url
+    return data
+
+# 播放页预取使用的有界线程池（每个worker一个，首次使用时创建），以及进行中的预取
+_prefetch_pool = None
+_prefetch_lock = threading.Lock()
+_prefetch_futures = {}
+
+def _get_prefetch_pool():
+    global _prefetch_pool
+    if _prefetch_pool is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _prefetch_pool = ThreadPoolExecutor(
+            max_workers=config.PLAY_PREFETCH_WORKERS,
+            thread_name_prefix='play-prefetch'
+        )
+    return _prefetch_pool
+
+def _prefetch(video_id, max_episodes):
+    """在预取线程中解析首屏数据，结束后释放请求线程占用的准入槽位"""
+    try:
+        load_video_response(video_id, max_episodes)
+    except Exception as e:
+        logger.error("播放页预取出错 %s: %s", video_id, e, exc_info=True)
+    finally:
+        admission.release()
+
+def _forget_prefetch(cache_key):
+    with _prefetch_lock:
+        _prefetch_futures.pop(cache_key, None)
+
+def prefetch_video_response(video_id, max_episodes):
+    """播放页渲染时在有界线程池中预取首屏数据，返回Future
+    
+    同一视频已在预取时返回已有的Future；准入槽位已满时不排队，直接放弃并返回None（播放器随后自行请求）。
+    """
+    cache_key = video_cache_key(video_id, max_episodes)
+    with _prefetch_lock:
+        future = _prefetch_futures.get(cache_key)
+        if future is not None:
+            return future
+        try:
+            admission.acquire('detail', wait=False)
+        except Overloaded as e:
+            logger.info("跳过播放页预取 %s: %s", video_id, e)
+            return None
+        try:
+            future = _get_prefetch_pool().submit(_prefetch, video_id, max_episodes)
+        except Exception:
+            admission.release()
+            raise
+        _prefetch_futures[cache_key] = future
+    # 在锁外注册：已完成的Future会立即在当前线程中调用回调
+    future.add_done_callback(lambda _: _forget_prefetch(cache_key))
+    return future
+
+def _reset_prefetch_after_fork():
+    global _prefetch_pool, _prefetch_lock
+    _prefetch_pool = None
+    _prefetch_lock = threading.Lock()
+    _prefetch_futures.clear()
+
+os.register_at_fork(after_in_child=_reset_prefetch_after_fork)
+
 # 输入验证函数
 def validate_video_id(video_id):
     """验证视频ID格式"""
@@ -141,12 +468,42 @@ def validate_search_query(query):
     
     return True, None
 
-@app.route('/')
+@bp.before_app_request
+def start_request_trace():
+    """启用请求记录时按采样率标记本次请求，未采样的请求不计时"""
+    if (config.RECORD_ENABLED
+            and request.method in ('GET', 'POST')
+            and not request.path.startswith(_RECORD_EXCLUDED_PREFIXES)
+            and request_recorder.sampled()):
+        g.trace_started = (time.time(), time.perf_counter())
+
+@bp.after_app_request
+def finish_request_trace(response):
+    """记录采样请求的接口、参数、耗时和缓存结果"""
+    started = g.pop('trace_started', None)
+    if started is not None:
+        started_at, started_counter = started
+        try:
+            request_recorder.record(build_trace(request, response, started_at, time.perf_counter() - started_counter))
+        except Exception as e:
+            logger.error(f"记录请求出错: {e}", exc_info=True)
+    return response
+
+@bp.before_app_request
+def start_request_profile():
+    """按慢请求分析时标记当前线程正在处理的请求"""
+    profiler.request_started(f"{request.method} {request.endpoint}")
+
+@bp.teardown_app_request
+def finish_request_profile(error=None):
+    profiler.request_finished()
+
+@bp.route('/')
 def index():
     """主页"""
     return render_template('index.html')
 
-@app.route('/episode-play-url', methods=['POST'])
+@bp.route('/episode-play-url', methods=['POST'])
 @rate_limit(per_minute=30, per_hour=100)
 def get_episode_play_url():
     """获取单个剧集的播放地址"""
@@ -159,7 +516,7 @@ def get_episode_play_url():
         if not episode_url:
             return jsonify({'success': False, 'error': '剧集URL不能为空'}), 400
         
-        logger.info(f"获取剧集播放地址: {episode_url}")
+        logger.info("获取剧集播放地址: %s", episode_url)
         
         # 确保URL是完整的
         if not episode_url.startswith('http'):
@@ -167,10 +524,13 @@ def get_episode_play_url():
         
         # 使用现有的函数获取播放地址
         from video import get_episode_play_url
-        play_url = get_episode_play_url(episode_url)
+        with admission.slot('playback'):
+            play_url = get_episode_play_url(episode_url)
         
         if play_url:
-            logger.info(f"成功获取剧集播放地址: {play_url}")
+            logger.info("成功获取剧集播放地址: %s", play_url)
+            if hls_proxy_enabled():
+                play_url = hls_proxy_url(play_url)
             return jsonify({
                 'success': True,
                 'play_url': play_url
@@ -182,6 +542,8 @@ def get_episode_play_url():
                 'error': '未找到播放地址'
             }), 404
             
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"获取剧集播放地址出错: {e}", exc_info=True)
         return jsonify({
@@ -189,7 +551,7 @@ def get_episode_play_url():
             'error': '服务器内部错误'
         }), 500
 
-@app.route('/play-fixed')
+@bp.route('/play-fixed')
 def play_fixed():
     """修复版本的播放页面"""
     video_id = request.args.get('id')
@@ -202,12 +564,12 @@ def play_fixed():
         logger.warning(f"播放页面收到无效的视频ID: {video_id}")
         return render_template('error.html', message='无效的视频ID格式'), 400
     
-    logger.info(f"渲染修复版播放页面: {video_id}")
+    logger.info("渲染修复版播放页面: %s", video_id)
     return render_template('play_fixed.html')
 
 
 
-@app.route('/search')
+@bp.route('/search')
 @rate_limit(per_minute=30, per_hour=100)
 @monitor_performance
 def search():
@@ -223,33 +585,104 @@ def search():
             logger.warning(f"无效的搜索查询: {keyword}, 错误: {error_msg}")
             return jsonify({'error': error_msg}), 400
         
-        logger.info(f"搜索关键词: {keyword}")
+        # 结果来源：upstream（默认）、local（仅本地索引）、merged（上游结果合并本地索引）
+        source = request.args.get('source', 'upstream')
+        if source not in ('upstream', 'local', 'merged'):
+            return jsonify({'error': '无效的参数格式'}), 400
+        
+        # 分页参数：page从1开始，limit为每页条数
+        try:
+            page = int(request.args.get('page', 1))
+            limit = int(request.args.get('limit', config.SEARCH_PAGE_SIZE))
+            
+            # 限制分页参数范围
+            if page < 1:
+                page = 1
+            if limit > 100:
+                limit = 100
+            elif limit < 1:
+                limit = 1
+        except ValueError:
+            logger.warning(f"无效的分页参数: page={request.args.get('page')}, limit={request.args.get('limit')}")
+            return jsonify({'error': '无效的参数格式'}), 400
+        
+        logger.info("搜索关键词: %s, 来源: %s, 页码: %s", keyword, source, page)
+        
+        if source == 'local':
+            # 多取一条判断之后是否还有结果
+            start = (page - 1) * limit
+            local_items = search_index.search(keyword, limit=start + limit + 1)
+            if local_items:
+                results = dict(
+                    build_local_results(keyword, local_items[start:start + limit]),
+                    page=page, limit=limit, has_more=len(local_items) > start + limit
+                )
+                return json_response(search_results_to_dict(apply_thumb_proxy(results)))
+            # 本地没有结果时回退到上游
+        
+        cache_key = f"search:{source}:{keyword}:{page}:{limit}"
+        cached_entry = _response_cache.get(cache_key)
+        if cached_entry is not None:
+            return cached_response(cached_entry, 'HIT')
         
         # 记录请求开始时间
         start_time = time.time()
-        results = search_data(keyword)
+        with admission.slot(request_priority('search')):
+            results = search_data(keyword, page=page, limit=limit)
         search_time = time.time() - start_time
         
+        if results is not None:
+            search_index.add_search_results(results)
+            suggest_index.add_search_results(results)
+            # 本地索引中上游没有的结果接在上游结果之后分页
+            if source == 'merged' and not results['has_more']:
+                results = merge_local_results(keyword, results, page, limit)
+        
         if results:
-            logger.info(f"搜索到 {results.get('item_count', 0)} 个结果, 耗时: {search_time:.2f}秒")
+            logger.info("搜索到 %s 个结果, 耗时: %.2f秒", results.get('item_count', 0), search_time)
+            
+            results = search_results_to_dict(apply_thumb_proxy(results))
+            entry = CachedResponse.from_data(results)
+            # 有上游页获取失败时不缓存，下次请求重新获取
+            if not results['partial']:
+                _response_cache.set(cache_key, entry)
             
-            # 添加性能信息到响应中（开发环境）
+            # 添加性能信息到响应中（开发环境，不进入缓存）
             if config.DEBUG:
                 results['_debug'] = {
                     'search_time': round(search_time, 2),
                     'timestamp': datetime.now().isoformat()
                 }
+                return json_response(results, cache_status='MISS')
             
-            return jsonify(results)
+            return cached_response(entry, 'MISS')
         else:
-            logger.info(f"未找到相关视频: {keyword}")
+            logger.info("未找到相关视频: %s", keyword)
             return jsonify({'error': '未找到相关视频'}), 404
             
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"搜索出错: {e}", exc_info=True)
         return jsonify({'error': '搜索服务暂时不可用，请稍后重试'}), 500
 
-@app.route('/video/<video_id>')
+@bp.route('/suggest')
+def suggest():
+    """搜索联想接口 - 完全基于内存，不请求上游"""
+    prefix = request.args.get('q', '').strip()
+    if not prefix or len(prefix) > config.MAX_SEARCH_LENGTH:
+        return jsonify({'success': True, 'suggestions': []})
+    
+    try:
+        limit = int(request.args.get('limit', config.SUGGEST_TOP_K))
+    except ValueError:
+        return jsonify({'error': '无效的参数格式'}), 400
+    if limit < 1:
+        return jsonify({'error': '无效的参数格式'}), 400
+    
+    return jsonify({'success': True, 'suggestions': suggest_index.suggest(prefix, limit)})
+
+@bp.route('/video/<video_id>')
 @rate_limit(per_minute=20, per_hour=60)
 @monitor_performance
 def get_video_data(video_id):
@@ -275,7 +708,13 @@ def get_video_data(video_id):
             logger.warning(f"无效的max_episodes参数: {request.args.get('max_episodes')}")
             return jsonify({'error': '无效的参数格式'}), 400
         
-        logger.info(f"获取视频数据: {video_id}, 异步: {use_async}, 最大剧集数: {max_episodes}")
+        logger.info("获取视频数据: %s, 异步: %s, 最大剧集数: %s", video_id, use_async, max_episodes)
+        
+        cache_key = video_cache_key(video_id, max_episodes)
+        cached_entry = _response_cache.get(cache_key)
+        if cached_entry is not None:
+            suggest_index.record_hit(video_id)
+            return cached_response(cached_entry, 'HIT')
         
         # 构建播放链接
         play_link = get_play_link_by_id(video_id)
@@ -287,30 +726,29 @@ def get_video_data(video_id):
         start_time = time.time()
         
         # 解析视频详情
-        logger.info(f"开始解析视频详情，播放链接: {play_link}")
-        video_data = parse_video_details(
-            play_link, 
-            use_async=use_async, 
-            max_episodes=max_episodes
-        )
+        with admission.slot(request_priority('detail')):
+            entry, response_data = load_video_response(video_id, max_episodes, use_async=use_async)
         
         parse_time = time.time() - start_time
         
-        if video_data:
-            logger.info(f"成功获取视频数据: {video_data.get('video_title', 'Unknown')}, 耗时: {parse_time:.2f}秒")
+        if entry:
+            suggest_index.record_hit(video_id)
+            video_data = response_data['data']
+            logger.info("成功获取视频数据: %s, 耗时: %.2f秒", video_data.get('video_title', 'Unknown'), parse_time)
             
-            # 添加性能信息到响应中（开发环境）
-            response_data = {'success': True, 'data': video_data}
+            # 添加性能信息到响应中（开发环境，不进入缓存）
             if config.DEBUG:
+                response_data = dict(response_data)
                 response_data['_debug'] = {
                     'parse_time': round(parse_time, 2),
-                    'episodes_count': len(video_data.get('episodes', [])),
+                    'episodes_count': video_data.get('episode_count', 0),
                     'use_async': use_async,
                     'timestamp': datetime.now().isoformat(),
                     'play_link': play_link
                 }
+                return json_response(response_data, cache_status='MISS')
             
-            return jsonify(response_data)
+            return cached_response(entry, 'MISS')
         else:
             logger.error(f"获取视频数据失败: {video_id}, 播放链接: {play_link}")
             logger.error("parse_video_details函数返回了None，可能的原因：")
@@ -320,11 +758,281 @@ def get_video_data(video_id):
             logger.error("4. 被目标网站屏蔽")
             return jsonify({'error': '视频数据不存在或无法访问，请检查视频ID或稍后重试'}), 404
             
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"获取视频数据出错: {e}", exc_info=True)
         return jsonify({'error': '视频服务暂时不可用，请稍后重试'}), 500
 
-@app.route('/play')
+@bp.route('/videos')
+@rate_limit(per_minute=20, per_hour=120)
+@monitor_performance
+def get_videos_batch():
+    """批量获取视频详情 - 列表页用一次请求取回多个视频的剧集数、更新状态和首集
+    
+    参数：ids 逗号分隔的视频ID，max_episodes 每个视频返回的剧集数（默认1，0表示不返回剧集），
+    play_urls=false 不解析播放地址（只需要详情页，目录命中时不请求上游）。
+    超时未完成的视频列在pending中，响应标记为partial且不缓存。
+    """
+    try:
+        video_ids = list(dict.fromkeys(
+            video_id.strip() for video_id in request.args.get('ids', '').split(',') if video_id.strip()
+        ))
+        if not video_ids:
+            return jsonify({'error': '缺少视频ID'}), 400
+        if len(video_ids) > config.VIDEOS_BATCH_MAX_IDS:
+            return jsonify({'error': f'一次最多查询{config.VIDEOS_BATCH_MAX_IDS}个视频'}), 400
+        for video_id in video_ids:
+            if not validate_video_id(video_id):
+                logger.warning(f"无效的视频ID: {video_id}")
+                return jsonify({'error': '无效的视频ID格式'}), 400
+        
+        try:
+            max_episodes = int(request.args.get('max_episodes', 1))
+            play_urls = request.args.get('play_urls', 'true').lower() == 'true'
+            
+            # 限制最大剧集数
+            if max_episodes > 100:
+                max_episodes = 100
+            elif max_episodes < 0:
+                max_episodes = 0
+        except ValueError:
+            logger.warning(f"无效的max_episodes参数: {request.args.get('max_episodes')}")
+            return jsonify({'error': '无效的参数格式'}), 400
+        
+        cache_key = videos_cache_key(video_ids, max_episodes, play_urls)
+        cached_entry = _response_cache.get(cache_key)
+        if cached_entry is not None:
+            return cached_response(cached_entry, 'HIT')
+        
+        start_time = time.time()
+        play_links = {video_id: get_play_link_by_id(video_id) for video_id in video_ids}
+        
+        # 整批占用一个槽位，批内并发由VIDEOS_BATCH_CONCURRENCY限制；不要播放地址的是列表页补充信息，按后台优先级
+        with admission.slot(request_priority('search' if play_urls else 'background')):
+            results, timed_out = fetch_video_details_batch(
+                list(play_links.values()),
+                max_episodes=max_episodes,
+                resolve=play_urls and max_episodes > 0
+            )
+        
+        videos = []
+        missing = []
+        pending = []
+        ttls = []
+        timed_out = set(timed_out)
+        for video_id, play_link in play_links.items():
+            if play_link in timed_out:
+                pending.append(video_id)
+                continue
+            video = results.get(play_link)
+            if video is None:
+                missing.append(video_id)
+                continue
+            search_index.add_video_detail(video_id, video)
+            suggest_index.add(video_id, video.title)
+            ttls.append(video_response_ttl(video) if play_urls else video_ttl(video))
+            videos.append(compact_video_dict(video_id, video, play_urls))
+        
+        logger.info(
+            "批量获取视频数据: %s 个, 成功 %s, 失败 %s, 超时 %s, 耗时: %.2f秒",
+            len(video_ids), len(videos), len(missing), len(pending), time.time() - start_time
+        )
+        
+        response_data = {
+            'success': True,
+            'data': {
+                'videos': videos,
+                'missing': missing,
+                'pending': pending,
+                'partial': bool(pending)
+            }
+        }
+        # 只缓存完整的结果，失败和超时的视频下次重新获取
+        if pending or missing:
+            return json_response(response_data, cache_status='PARTIAL' if pending else 'MISS')
+        
+        entry = CachedResponse.from_data(response_data)
+        _response_cache.set(cache_key, entry, timeout=min(ttls))
+        return cached_response(entry, 'MISS')
+    
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logger.error(f"批量获取视频数据出错: {e}", exc_info=True)
+        return jsonify({'error': '视频服务暂时不可用，请稍后重试'}), 500
+
+@bp.route('/video/<video_id>/episodes')
+@rate_limit(per_minute=30, per_hour=100)
+@monitor_performance
+def get_video_episodes_route(video_id):
+    """分页获取剧集列表 - 基于offset游标"""
+    try:
+        # 输入验证
+        if not validate_video_id(video_id):
+            logger.warning(f"无效的视频ID: {video_id}")
+            return jsonify({'error': '无效的视频ID格式'}), 400
+        
+        # 获取查询参数并验证
+        try:
+            use_async = request.args.get('async', 'true').lower() == 'true'
+            resolve = request.args.get('resolve', 'true').lower() == 'true'
+            offset = int(request.args.get('offset', 0))
+            limit = int(request.args.get('limit', config.MAX_EPISODES))
+            
+            # 限制分页参数范围
+            if offset < 0:
+                offset = 0
+            if limit > 100:
+                limit = 100
+            elif limit < 1:
+                limit = 1
+                
+        except ValueError:
+            logger.warning(f"无效的分页参数: offset={request.args.get('offset')}, limit={request.args.get('limit')}")
+            return jsonify({'error': '无效的参数格式'}), 400
+        
+        play_link = get_play_link_by_id(video_id)
+        if not play_link:
+            logger.warning(f"无法构建播放链接: {video_id}")
+            return jsonify({'error': '无效的视频ID'}), 404
+        
+        logger.info("获取剧集分页: %s, offset: %s, limit: %s, 解析播放地址: %s", video_id, offset, limit, resolve)
+        
+        cache_key = f"episodes:{video_id}:{offset}:{limit}:{resolve}"
+        cached_entry = _response_cache.get(cache_key)
+        if cached_entry is not None:
+            return cached_response(cached_entry, 'HIT')
+        
+        # 只取剧集列表（不解析播放地址）是播放器在后台补全完整列表
+        with admission.slot(request_priority('detail' if resolve else 'background')):
+            episodes_page = get_video_episodes(
+                play_link,
+                offset=offset,
+                limit=limit,
+                use_async=use_async,
+                resolve=resolve
+            )
+        
+        if episodes_page is None:
+            logger.error(f"获取剧集分页失败: {video_id}")
+            return jsonify({'error': '视频数据不存在或无法访问，请检查视频ID或稍后重试'}), 404
+        
+        ttl = content_ttl(config.CACHE_TIMEOUT, [episode.play_url for episode in episodes_page['episodes']])
+        episodes = apply_hls_proxy(episodes_page['episodes'])
+        episodes_page = dict(episodes_page, episodes=[episode.to_dict() for episode in episodes])
+        entry = CachedResponse.from_data({'success': True, 'data': episodes_page})
+        _response_cache.set(cache_key, entry, timeout=ttl)
+        return cached_response(entry, 'MISS')
+            
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logger.error(f"获取剧集分页出错: {e}", exc_info=True)
+        return jsonify({'error': '视频服务暂时不可用，请稍后重试'}), 500
+
+@bp.route('/hls/<token>.m3u8')
+def hls_playlist(token):
+    """m3u8播放列表代理 - 缓存并改写上游播放列表，分片仍由CDN直接提供"""
+    if not hls_proxy_enabled():
+        return jsonify({'error': '资源未找到'}), 404
+    
+    m3u8_url = resolve_hls_token(token)
+    if not m3u8_url:
+        logger.warning(f"无效的播放列表token: {token}")
+        return jsonify({'error': '无效的播放列表地址'}), 404
+    
+    try:
+        max_bandwidth = request.args.get('max_bandwidth')
+        max_bandwidth = int(max_bandwidth) if max_bandwidth else None
+    except ValueError:
+        return jsonify({'error': '无效的参数格式'}), 400
+    
+    try:
+        with admission.slot('playback'):
+            playlist = get_playlist(m3u8_url)
+            if playlist is None:
+                return jsonify({'error': '获取播放列表失败'}), 502
+            
+            # 指定码率上限时直接返回预先选好的媒体播放列表，省去播放器一次往返
+            if playlist.is_master and max_bandwidth is not None:
+                variant_url = select_variant(playlist, max_bandwidth)
+                variant = get_playlist(variant_url) if variant_url else None
+                if variant is not None:
+                    playlist = variant
+        
+        return cached_response(playlist.response, mimetype=HLS_MIMETYPE)
+    
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logger.error(f"播放列表代理出错: {e}", exc_info=True)
+        return jsonify({'error': '播放列表代理暂时不可用'}), 500
+
+@bp.route('/img/<token>')
+def thumbnail(token):
+    """封面缩略图代理 - 按标准宽度缩放并转码上游封面，地址不变的结果由浏览器长期缓存"""
+    if not thumb_proxy_enabled():
+        return jsonify({'error': '资源未找到'}), 404
+    
+    image_url = resolve_thumb_token(token)
+    if not image_url:
+        logger.warning(f"无效的封面token: {token}")
+        return jsonify({'error': '无效的封面地址'}), 404
+    
+    try:
+        width = int(request.args.get('w', config.THUMB_DEFAULT_WIDTH))
+    except ValueError:
+        return jsonify({'error': '无效的参数格式'}), 400
+    if width <= 0:
+        return jsonify({'error': '无效的参数格式'}), 400
+    
+    width = snap_width(width)
+    fmt = negotiate_format(request.headers.get('Accept', ''))
+    try:
+        thumb = get_cached_thumbnail(image_url, width, fmt)
+        if thumb is None:
+            with admission.slot('background'):
+                thumb = singleflight(
+                    f"img:{image_url}:{width}:{fmt}",
+                    lambda: get_thumbnail(image_url, width, fmt)
+                )
+    except Overloaded:
+        thumb = None
+    except Exception as e:
+        logger.error(f"封面代理出错: {e}", exc_info=True)
+        thumb = None
+    
+    if thumb is None:
+        # 代理失败或繁忙时让浏览器直接加载原图（不缓存重定向，下次仍经过代理）
+        return redirect(image_url)
+    
+    data, mimetype, etag = thumb
+    response = Response(data, mimetype=mimetype)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = config.THUMB_MAX_AGE
+    response.cache_control.immutable = True
+    response.vary.add('Accept')
+    return response.make_conditional(request)
+
+@bp.route('/assets/<path:filename>')
+def static_asset(filename):
+    """构建后的静态资源 - 文件名带内容哈希，浏览器长期缓存；按Accept-Encoding返回预压缩版本"""
+    asset = resolve_asset(filename, request.accept_encodings)
+    if asset is None:
+        return jsonify({'error': '资源未找到'}), 404
+    
+    path, mimetype, encoding = asset
+    response = send_from_directory(assets_dir(), path, mimetype=mimetype, max_age=config.ASSETS_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+@bp.route('/play')
 def play():
     """播放页面"""
     video_id = request.args.get('id')
@@ -337,34 +1045,167 @@ def play():
         logger.warning(f"播放页面收到无效的视频ID: {video_id}")
         return render_template('error.html', message='无效的视频ID格式'), 400
     
-    logger.info(f"渲染播放页面: {video_id}")
-    # 直接渲染播放页面模板，让前端通过API获取数据
-    return render_template('play.html')
+    logger.info("渲染播放页面: %s", video_id)
+    
+    # 页面请求时即开始在服务端解析首屏数据，短暂等待后内联到模板中，省去一次往返；
+    # 频率限制只作用于预取（独立计数），超过时照常渲染页面，由播放器自行请求数据
+    max_episodes = config.PLAY_INITIAL_EPISODES
+    entry = _response_cache.get(video_cache_key(video_id, max_episodes))
+    if entry is None and check_rate_limit(per_minute=20, per_hour=60, bucket='play-prefetch'):
+        prefetch = prefetch_video_response(video_id, max_episodes)
+        if prefetch is not None:
+            futures.wait([prefetch], timeout=config.PLAY_PREFETCH_WAIT)
+            entry = _response_cache.get(video_cache_key(video_id, max_episodes))
+    
+    initial_data = None
+    preconnect_origins = []
+    links = []
+    if entry is not None:
+        # JSON中的"<"只会出现在字符串内，转义后可安全内联到<script>中
+        initial_data = entry.body.decode('utf-8').replace('<', '\\u003c')
+        m3u8_url = json.loads(entry.body)['data'].get('m3u8_url') or ''
+        parts = urlsplit(m3u8_url)
+        if parts.scheme and parts.netloc:
+            origin = f"{parts.scheme}://{parts.netloc}"
+            preconnect_origins.append(origin)
+            links.append(f"<{origin}>; rel=preconnect; crossorigin")
+    else:
+        # 数据尚未就绪：预加载播放器将要请求的API，请求会复用进行中的解析
+        links.append(f"</video/{video_id}?async=true&max_episodes={max_episodes}>; rel=preload; as=fetch; crossorigin")
+    
+    response = make_response(render_template(
+        'play.html',
+        initial_data=initial_data,
+        preconnect_origins=preconnect_origins
+    ))
+    if links:
+        response.headers['Link'] = ', '.join(links)
+    return response
 
-@app.route('/cache/clear')
+@bp.route('/cache/clear')
 @rate_limit(per_minute=5, per_hour=10)
 def clear_cache_route():
-    """清除缓存接口"""
+    """清除缓存接口
+    
+    参数：namespace 只失效一类缓存（search/detail/episode/hls），video_id 只失效一个视频的详情、剧集和播放地址。
+    通过共享代数表通知所有worker，条目在下次读取时丢弃（不批量删除）；返回在等待时间内确认了新序号的worker数。
+    """
+    namespace = request.args.get('namespace') or None
+    video_id = request.args.get('video_id') or None
+    if namespace is not None and namespace not in NAMESPACES:
+        return jsonify({'error': '无效的参数格式'}), 400
+    if video_id is not None and (not validate_video_id(video_id) or namespace in ('search', 'hls')):
+        return jsonify({'error': '无效的参数格式'}), 400
+    
     try:
-        clear_cache()
-        logger.info("缓存已清除")
-        return jsonify({'success': True, 'message': '缓存已清除'})
+        if video_id:
+            sequence = invalidate_video(video_id, namespace)
+        else:
+            sequence = generations.invalidate(namespace)
+        acknowledged, total, pending = generations.wait_for_acks(sequence, config.INVALIDATION_ACK_TIMEOUT)
+        logger.info(
+            f"缓存已清除: 范围 {namespace or '全部'} {video_id or ''}, 序号 {sequence}, "
+            f"已确认 {acknowledged}/{total}"
+        )
+        return jsonify({
+            'success': True,
+            'message': '缓存已清除',
+            'namespace': namespace or 'all',
+            'video_id': video_id,
+            'sequence': sequence,
+            'workers': {
+                'total': total,
+                'acknowledged': acknowledged,
+                'pending': pending
+            }
+        })
     except Exception as e:
         logger.error(f"清除缓存出错: {e}", exc_info=True)
         return jsonify({'error': '清除缓存失败'}), 500
 
-@app.route('/cache/stats')
+@bp.route('/cache/stats')
 @rate_limit(per_minute=10, per_hour=30)
 def cache_stats_route():
     """获取缓存统计信息"""
     try:
         stats = get_cache_stats()
+        stats['video_page_cache'] = get_page_cache_stats()
+        stats['response_cache'] = _response_cache.stats()
+        stats['search_page_cache'] = get_search_page_cache_stats()
+        stats['hls_cache'] = get_hls_cache_stats()
+        stats['thumb_cache'] = get_thumb_cache_stats()
+        stats['search_index'] = search_index.stats()
+        stats['suggest_index'] = suggest_index.stats()
+        stats['invalidation'] = generations.stats()
+        catalog = get_catalog()
+        if catalog is not None:
+            stats['catalog'] = catalog.stats()
+        page_store = get_page_store()
+        if page_store is not None:
+            stats['upstream_pages'] = page_store.stats()
         return jsonify({'success': True, 'data': stats})
     except Exception as e:
         logger.error(f"获取缓存统计出错: {e}", exc_info=True)
         return jsonify({'error': '获取缓存统计失败'}), 500
 
-@app.route('/health')
+@bp.route('/debug/profile')
+@rate_limit(per_minute=5, per_hour=30)
+def debug_profile():
+    """对处理本请求的worker采样分析seconds秒，返回折叠栈或speedscope格式
+    
+    需要配置PROFILE_TOKEN，并通过X-Profile-Token头或token参数传入。
+    参数：seconds 采样时长，format collapsed/speedscope，idle=true 计入等待中的线程，
+    slow_ms 只保留耗时超过该值的请求期间的样本（默认计入等待），pid 只在指定的worker上分析。
+    """
+    if not config.PROFILE_TOKEN:
+        return jsonify({'error': '资源未找到'}), 404
+    
+    token = request.headers.get('X-Profile-Token') or request.args.get('token', '')
+    if not hmac.compare_digest(token.encode('utf-8'), config.PROFILE_TOKEN.encode('utf-8')):
+        logger.warning(f"性能分析令牌无效: {request.remote_addr}")
+        return jsonify({'error': '无权访问'}), 403
+    
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        slow_ms = request.args.get('slow_ms')
+        slow_ms = float(slow_ms) if slow_ms is not None else None
+        pid = request.args.get('pid')
+        pid = int(pid) if pid is not None else None
+    except ValueError:
+        return jsonify({'error': '无效的参数格式'}), 400
+    
+    output_format = request.args.get('format', 'collapsed')
+    if output_format not in ('collapsed', 'speedscope') or not 0 < seconds <= config.PROFILE_MAX_SECONDS:
+        return jsonify({'error': '无效的参数格式'}), 400
+    
+    # 请求由哪个worker处理取决于谁先accept，指定pid时不匹配则让调用方重试
+    if pid is not None and pid != os.getpid():
+        return jsonify({'error': '请求未落在指定的worker上，请重试', 'pid': os.getpid()}), 409
+    
+    include_idle = request.args.get('idle', 'true' if slow_ms is not None else 'false').lower() == 'true'
+    
+    try:
+        result = profiler.profile(seconds, include_idle=include_idle, slow_ms=slow_ms)
+    except ProfilerBusy:
+        return jsonify({'error': '该worker正在进行性能分析', 'pid': os.getpid()}), 409
+    
+    logger.warning(
+        f"性能分析完成: pid {result['pid']}, {result['duration']:.1f}秒, {result['samples']} 次采样, "
+        f"慢请求 {result['slow_requests']}/{result['requests']}"
+    )
+    
+    name = f"pid {result['pid']} {time.strftime('%Y-%m-%d %H:%M:%S')}"
+    if output_format == 'speedscope':
+        response = Response(to_speedscope(result, name), mimetype='application/json')
+        response.headers['Content-Disposition'] = f"attachment; filename=profile-{result['pid']}.speedscope.json"
+    else:
+        response = Response(to_collapsed(result), mimetype='text/plain')
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Profile-Pid'] = str(result['pid'])
+    response.headers['X-Profile-Samples'] = str(result['samples'])
+    return response
+
+@bp.route('/health')
 def health_check():
     """健康检查端点"""
     try:
@@ -374,6 +1215,7 @@ def health_check():
             'timestamp': datetime.now().isoformat(),
             'version': '2.0.0',
             'cache_stats': cache_stats,
+            'admission': admission.stats(),
             'config': {
                 'debug': config.DEBUG,
                 'rate_limit_enabled': config.RATE_LIMIT_ENABLED,
@@ -389,7 +1231,7 @@ def health_check():
         }), 500
 
 # 全局错误处理
-@app.errorhandler(400)
+@bp.app_errorhandler(400)
 def bad_request(error):
     """400错误处理"""
     logger.warning(f"400错误: {error}")
@@ -397,7 +1239,7 @@ def bad_request(error):
         return jsonify({'error': '请求格式错误'}), 400
     return render_template('error.html', message='请求格式错误'), 400
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found(error):
     """404错误处理"""
     logger.warning(f"404错误: {request.url}")
@@ -405,7 +1247,7 @@ def not_found(error):
         return jsonify({'error': '资源未找到'}), 404
     return render_template('error.html', message='页面未找到'), 404
 
-@app.errorhandler(429)
+@bp.app_errorhandler(429)
 def rate_limit_exceeded(error):
     """429错误处理 - 频率限制"""
     logger.warning(f"频率限制触发: {request.remote_addr}")
@@ -413,7 +1255,12 @@ def rate_limit_exceeded(error):
         return jsonify({'error': '请求过于频繁，请稍后再试'}), 429
     return render_template('error.html', message='请求过于频繁，请稍后再试'), 429
 
-@app.errorhandler(500)
+@bp.app_errorhandler(Overloaded)
+def overloaded(error):
+    """503错误处理 - 准入控制拒绝"""
+    return overloaded_response(error)
+
+@bp.app_errorhandler(500)
 def internal_error(error):
     """500错误处理"""
     logger.error(f"500错误: {error}", exc_info=True)
@@ -421,7 +1268,7 @@ def internal_error(error):
         return jsonify({'error': '服务器内部错误'}), 500
     return render_template('error.html', message='服务器内部错误'), 500
 
-@app.errorhandler(Exception)
+@bp.app_errorhandler(Exception)
 def handle_exception(error):
     """处理未捕获的异常"""
     logger.error(f"未处理的异常: {error}", exc_info=True)
@@ -429,6 +1276,19 @@ def handle_exception(error):
         return jsonify({'error': '服务器内部错误'}), 500
     return render_template('error.html', message='服务器内部错误'), 500
 
+def create_app(config_object=None):
+    """创建Flask应用
+    
+    gunicorn预加载时在主进程中调用一次，worker通过fork共享已导入的模块和已构建的应用。
+    """
+    app = Flask(__name__)
+    app.config.from_object(config_object or config)
+    # 部署在nginx等反向代理之后时，频率限制、日志和请求记录使用代理转发的客户端地址
+    if config.TRUSTED_PROXY_HOPS > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=config.TRUSTED_PROXY_HOPS, x_proto=config.TRUSTED_PROXY_HOPS)
+    app.register_blueprint(bp)
+    return app
+
 if __name__ == '__main__':
     print("🚀 启动优化版播放器应用...")
     print("📊 新功能:")
@@ -448,7 +1308,12 @@ if __name__ == '__main__':
     print(f"🐛 调试模式: {'开启' if config.DEBUG else '关闭'}")
     print(f"⏱️ 频率限制: {'开启' if config.RATE_LIMIT_ENABLED else '关闭'}")
     
+    # 后台刷新视频目录中可能有新剧集的视频（gunicorn下由gunicorn.conf.py在每个worker中启动）
+    start_catalog_refresher()
+    generations.start_watcher()
+    
     # 启动应用
+    app = create_app()
     app.run(
         debug=config.DEBUG, 
         host='0.0.0.0', 
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+静态资源地址模块
+读取build_static.py生成的清单，模板通过asset_url()引用带内容哈希的文件名；
+提供这些文件时按Accept-Encoding选择预先压缩的br/gzip版本
+"""
+
+import os
+import json
+import logging
+import mimetypes
+import threading
+from config import get_config
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 按优先顺序：预压缩版本的编码 -> 文件后缀
+_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+def assets_dir():
+    """构建输出目录的绝对路径"""
+    return os.path.join(_BASE_DIR, config.ASSETS_DIR)
+
+def _load_manifest():
+    """读取清单，返回 {源路径: 资源信息} 和 {哈希文件名: 资源信息}；未构建时都为空"""
+    path = os.path.join(assets_dir(), 'manifest.json')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            assets = json.load(f)['assets']
+    except FileNotFoundError:
+        logger.info("未找到静态资源清单 %s，模板使用static下的原文件（运行 python build_static.py 构建）", path)
+        return {}, {}
+    except (ValueError, KeyError) as e:
+        logger.error(f"静态资源清单格式错误 {path}: {e}")
+        return {}, {}
+    return assets, {asset['file']: asset for asset in assets.values()}
+
+def _manifest_tables():
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                _manifest = _load_manifest()
+    return _manifest
+
+def asset_url(path):
+    """模板中引用静态资源：已构建时返回带哈希的 /assets/ 地址，否则返回 /static/ 下的原文件"""
+    if config.ASSETS_ENABLED:
+        asset = _manifest_tables()[0].get(path)
+        if asset is not None:
+            return f"/assets/{asset['file']}"
+    return f"/static/{path}"
+
+def resolve_asset(filename, accept_encodings):
+    """查找带哈希的资源文件，返回(相对输出目录的文件名, MIME类型, 内容编码)，不在清单中时返回None
+
+    accept_encodings为请求的Accept-Encoding（werkzeug的Accept对象），
+    浏览器支持且构建时生成了对应版本时返回预压缩文件，内容编码为None表示未压缩的原文件。
+    """
+    asset = _manifest_tables()[1].get(filename)
+    if asset is None:
+        return None
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in _ENCODINGS:
+        if encoding in asset and accept_encodings[encoding] > 0:
+            return filename + suffix, mimetype, encoding
+    return filename, mimetype, None
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+静态资源构建工具
+压缩static下的JS/CSS（去除注释和多余空白），按内容哈希重命名，并预先生成gzip（以及安装了brotli时的br）版本，
+输出到ASSETS_DIR并写入清单；模板通过asset_url()引用带哈希的文件名。构建过程不需要网络，在构建镜像时运行：
+
+    python build_static.py
+    python build_static.py --check     # 只输出压缩前后的大小，不写入文件
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import argparse
+from config import get_config
+
+# 获取配置
+config = get_config()
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+_STATIC_DIR = os.path.join(_BASE_DIR, 'static')
+
+# 参与构建的资源（相对static目录）
+_PATTERNS = {
+    '.js': 'js',
+    '.css': 'css'
+}
+
+_HASH_LENGTH = 10
+
+_IDENTIFIER = re.compile(r'[\w$]')
+# 出现在这些关键字之后的"/"是正则表达式而不是除号
+_REGEX_KEYWORDS = frozenset(('return', 'typeof', 'instanceof', 'case', 'do', 'else', 'in', 'of',
+                             'new', 'delete', 'void', 'throw', 'yield', 'await'))
+# 紧挨着这些字符的空格可以去掉（不含+、-、/、.，避免拼出++、--、注释或数字字面量）
+_JS_PUNCTUATION = frozenset('{}()[];,:=<>?!&|*%^~')
+# 以这些字符结尾的行与下一行之间不会发生自动插入分号，换行可以去掉
+_JS_JOIN_AFTER = frozenset('{([,;:=?&|')
+# 以这些字符开头的行接在上一行之后，换行可以去掉
+_JS_JOIN_BEFORE = frozenset('})].,;:?')
+# CSS中紧挨着这些字符的空格可以去掉（"a :hover"与"a:hover"含义不同，冒号只去掉其后的空格；calc()中的+、-必须保留空格）
+_CSS_BEFORE = frozenset('{};,>~)!')
+_CSS_AFTER = frozenset('{};,>~(:')
+
+class _Writer:
+    """输出时延迟写入空白：根据前后的字符决定保留空格、换行还是去掉"""
+
+    def __init__(self, drop_space, drop_newline=None):
+        self.parts = []
+        self.pending = ''
+        self.last = ''
+        self._drop_space = drop_space
+        self._drop_newline = drop_newline
+
+    def space(self, newline=False):
+        if newline and self._drop_newline is not None:
+            self.pending = '\n'
+        elif not self.pending:
+            self.pending = ' '
+
+    def write(self, text):
+        if self.pending and self.last:
+            first = text[0]
+            if self.pending == '\n':
+                if not self._drop_newline(self.last, first):
+                    self.parts.append('\n')
+            elif not self._drop_space(self.last, first):
+                self.parts.append(' ')
+        self.pending = ''
+        self.parts.append(text)
+        self.last = text[-1]
+
+    def output(self):
+        return ''.join(self.parts)
+
+def _scan_string(source, i):
+    """返回从i处引号开始的字符串结束后的位置"""
+    quote = source[i]
+    i += 1
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        i += 1
+        if char == quote:
+            break
+    return i
+
+def _scan_regex(source, i):
+    """返回从i处"/"开始的正则表达式字面量（不含标志）结束后的位置"""
+    i += 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        i += 1
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            break
+    return i
+
+def _regex_allowed(writer):
+    """根据已输出的内容判断"/"开始的是正则表达式还是除号"""
+    text = writer.output()
+    if not text:
+        return True
+    last = text[-1]
+    if last in ')]}':
+        return False
+    if _IDENTIFIER.match(last):
+        match = re.search(r'[\w$]+$', text)
+        return match.group() in _REGEX_KEYWORDS
+    return True
+
+def _minify_js_code(source, i, writer, in_template=False):
+    """压缩从i开始的代码，in_template时在与"${"配对的"}"处返回"""
+    depth = 0
+    length = len(source)
+    while i < length:
+        char = source[i]
+        if char in ' \t\r\n\f\v':
+            start = i
+            while i < length and source[i] in ' \t\r\n\f\v':
+                i += 1
+            writer.space('\n' in source[start:i])
+            continue
+        if char == '/' and source.startswith('//', i):
+            end = source.find('\n', i)
+            i = length if end < 0 else end
+            continue
+        if char == '/' and source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = length if end < 0 else end + 2
+            writer.space('\n' in source[i:end])
+            i = end
+            continue
+        if char in '\'"':
+            end = _scan_string(source, i)
+            writer.write(source[i:end])
+            i = end
+            continue
+        if char == '`':
+            i = _minify_template(source, i, writer)
+            continue
+        if char == '/' and _regex_allowed(writer):
+            end = _scan_regex(source, i)
+            writer.write(source[i:end])
+            i = end
+            continue
+        if in_template:
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                if depth == 0:
+                    return i
+                depth -= 1
+        match = _IDENTIFIER.match(source, i)
+        if match:
+            end = i + 1
+            while end < length and _IDENTIFIER.match(source, end):
+                end += 1
+            writer.write(source[i:end])
+            i = end
+            continue
+        writer.write(char)
+        i += 1
+    return i
+
+def _minify_template(source, i, writer):
+    """原样输出模板字符串，其中${...}内的代码同样压缩"""
+    start = i
+    i += 1
+    length = len(source)
+    while i < length:
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '`':
+            writer.write(source[start:i + 1])
+            return i + 1
+        if char == '$' and source.startswith('${', i):
+            writer.write(source[start:i + 2])
+            inner = _Writer(writer._drop_space, writer._drop_newline)
+            i = _minify_js_code(source, i + 2, inner, in_template=True)
+            if inner.parts:
+                writer.write(inner.output())
+            start = i
+        i += 1
+    writer.write(source[start:])
+    return length
+
+def _js_drop_space(prev, nxt):
+    if prev in _JS_PUNCTUATION or nxt in _JS_PUNCTUATION:
+        return True
+    # "a + b"可以写成"a+b"，"a + +b"、"a - -b"不能
+    if prev in '+-' or nxt in '+-':
+        return prev != nxt
+    return False
+
+def _js_drop_newline(prev, nxt):
+    return prev in _JS_JOIN_AFTER or nxt in _JS_JOIN_BEFORE
+
+def minify_js(source):
+    """去除注释和多余空白
+
+    保留可能触发自动插入分号的换行，字符串、模板字符串和正则表达式原样保留，不重命名变量。
+    """
+    writer = _Writer(_js_drop_space, _js_drop_newline)
+    _minify_js_code(source, 0, writer)
+    return writer.output() + '\n'
+
+def _css_drop_space(prev, nxt):
+    return prev in _CSS_AFTER or nxt in _CSS_BEFORE
+
+def minify_css(source):
+    """去除注释、多余空白和规则末尾的分号，字符串原样保留"""
+    writer = _Writer(_css_drop_space)
+    i = 0
+    length = len(source)
+    while i < length:
+        char = source[i]
+        if char in ' \t\r\n\f':
+            while i < length and source[i] in ' \t\r\n\f':
+                i += 1
+            writer.space()
+            continue
+        if char == '/' and source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = length if end < 0 else end + 2
+            writer.space()
+            continue
+        if char in '\'"':
+            end = _scan_string(source, i)
+            writer.write(source[i:end])
+            i = end
+            continue
+        if char == '}' and writer.last == ';':
+            writer.parts[-1] = writer.parts[-1][:-1]
+            writer.pending = ''
+        writer.write(char)
+        i += 1
+    return writer.output() + '\n'
+
+_MINIFIERS = {
+    '.js': minify_js,
+    '.css': minify_css
+}
+
+def _sources():
+    """static下参与构建的文件（相对static目录，使用/分隔）"""
+    for extension, directory in sorted(_PATTERNS.items()):
+        root = os.path.join(_STATIC_DIR, directory)
+        if not os.path.isdir(root):
+            continue
+        for name in sorted(os.listdir(root)):
+            if name.endswith(extension):
+                yield f"{directory}/{name}"
+
+def _hashed_name(path, data):
+    stem, extension = os.path.splitext(path)
+    digest = hashlib.sha256(data).hexdigest()[:_HASH_LENGTH]
+    return f"{stem}.{digest}{extension}"
+
+def build(output_dir, write=True):
+    """构建全部资源，返回清单 {源路径: {file, size, gzip, br}}"""
+    assets = {}
+    for path in _sources():
+        with open(os.path.join(_STATIC_DIR, path), 'r', encoding='utf-8') as f:
+            source = f.read()
+        extension = os.path.splitext(path)[1]
+        data = _MINIFIERS[extension](source).encode('utf-8')
+        variants = {'gzip': gzip.compress(data, 9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+        # 压缩后没有变小的版本不保留
+        variants = {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+        name = _hashed_name(path, data)
+        assets[path] = {
+            'file': name,
+            'source_size': len(source.encode('utf-8')),
+            'size': len(data),
+            **{encoding: len(body) for encoding, body in variants.items()}
+        }
+        if not write:
+            continue
+        target = os.path.join(output_dir, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        suffixes = {'gzip': '.gz', 'br': '.br'}
+        for encoding, body in variants.items():
+            with open(target + suffixes[encoding], 'wb') as f:
+                f.write(body)
+    return assets
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='压缩静态资源并生成带内容哈希的文件名')
+    parser.add_argument('--output', default=config.ASSETS_DIR,
+                        help=f'输出目录，相对项目根目录（默认{config.ASSETS_DIR}）')
+    parser.add_argument('--check', action='store_true', help='只输出压缩前后的大小，不写入文件')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    output_dir = os.path.join(_BASE_DIR, args.output)
+    if not args.check:
+        # 旧的哈希文件没有页面再引用，整个目录重新生成
+        if os.path.isdir(output_dir):
+            shutil.rmtree(output_dir)
+        os.makedirs(output_dir)
+
+    assets = build(output_dir, write=not args.check)
+    if not args.check:
+        with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump({'assets': assets}, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    for path, asset in assets.items():
+        sizes = ', '.join(f"{encoding} {asset[encoding]}" for encoding in ('gzip', 'br') if encoding in asset)
+        print(f"{path} -> {asset['file']}: {asset['source_size']} -> {asset['size']} 字节（{sizes}）")
+    if brotli is None:
+        print("未安装brotli，只生成gzip版本")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+内存缓存模块
+按字节预算限制的带过期时间缓存，淘汰策略参考W-TinyLFU：
+新条目先进入小的LRU窗口，离开窗口时与主区最旧的条目比较访问频率，
+只有更常被访问的条目才能进入主区，爬虫式的一次性扫描不会冲掉热点数据
+"""
+
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+from config import get_config
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每个条目的固定开销（条目对象、字典槽位、键），按近似值计入字节数
+_ENTRY_OVERHEAD = 200
+
+def estimate_size(value):
+    """估算缓存值占用的字节数（共享的驻留字符串会被重复计入，结果偏大）"""
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is not None:
+        return nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(key) + estimate_size(item) for key, item in value.items()
+        )
+    if isinstance(value, (tuple, list, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+class FrequencySketch:
+    """Count-Min Sketch访问频率估计
+
+    4行计数器，每个计数上限15；累计记录次数达到样本量后所有计数减半，使过去的热度逐渐衰减。
+    """
+
+    _SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+    _MAX_COUNT = 15
+
+    def __init__(self, capacity):
+        width = 1 << max(4, (max(capacity, 1) * 4 - 1).bit_length())
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in self._SEEDS]
+        self._sample_size = max(capacity, 1) * 10
+        self._additions = 0
+
+    def _indexes(self, key):
+        h = hash(key)
+        for seed in self._SEEDS:
+            yield (((h ^ seed) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32 & self._mask
+
+    def increment(self, key):
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < self._MAX_COUNT:
+                row[index] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._age()
+
+    def frequency(self, key):
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def _age(self):
+        self._rows = [bytearray(count >> 1 for count in row) for row in self._rows]
+        self._additions //= 2
+
+    def clear(self):
+        self._rows = [bytearray(len(row)) for row in self._rows]
+        self._additions = 0
+
+class _Entry:
+    __slots__ = ('value', 'stored_at', 'expires_at', 'size', 'segment', 'generation')
+
+    def __init__(self, value, stored_at, expires_at, size, segment, generation):
+        self.value = value
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.size = size
+        self.segment = segment
+        self.generation = generation
+
+# 条目所在的区段
+_WINDOW, _PROBATION, _PROTECTED = 0, 1, 2
+
+class TimedCache:
+    """带过期时间、按字节预算和条目数限制的缓存（线程安全，gthread worker中多个线程共享）
+
+    每个条目可以有自己的过期时间，未指定时使用default_timeout。
+    窗口占预算的1%，主区分为试用段和保护段（保护段占主区的80%），试用段中再次命中的条目升入保护段。
+    generation(key)返回键所属范围的当前代数（见generations.py），条目写入后代数变化即视为过期。
+    """
+
+    def __init__(self, default_timeout=None, max_size=1000, max_bytes=None, sizeof=None, generation=None):
+        self.default_timeout = default_timeout or config.CACHE_TIMEOUT
+        self.max_size = max_size
+        self.max_bytes = max_bytes or config.CACHE_MAX_BYTES
+        self._sizeof = sizeof or estimate_size
+        self._generation = generation
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._segments = (OrderedDict(), OrderedDict(), OrderedDict())
+        self._segment_bytes = [0, 0, 0]
+        self._window_max_bytes = max(1, self.max_bytes // 100)
+        self._window_max_size = max(1, max_size // 100)
+        self._protected_max_bytes = (self.max_bytes - self._window_max_bytes) * 0.8
+        self._sketch = FrequencySketch(max_size)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def bytes_used(self):
+        return sum(self._segment_bytes)
+
+    def get(self, key):
+        """获取缓存值"""
+        generation = self._generation(key) if self._generation else None
+        with self._lock:
+            self._sketch.increment(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # 检查是否过期
+            if time.time() >= entry.expires_at:
+                self._remove(key, entry)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            # 写入后所属范围被失效
+            if entry.generation != generation:
+                self._remove(key, entry)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._touch(key, entry)
+            return entry.value
+
+    def expires_in(self, key):
+        """条目剩余的有效秒数，不存在、已过期或已失效时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or (self._generation and entry.generation != self._generation(key)):
+            return None
+        remaining = entry.expires_at - time.time()
+        return remaining if remaining > 0 else None
+
+    def set(self, key, value, timeout=None):
+        """设置缓存值，timeout为该条目的有效秒数（0表示不缓存）"""
+        timeout = self.default_timeout if timeout is None else timeout
+        size = self._sizeof(value) + sys.getsizeof(key) + _ENTRY_OVERHEAD
+        generation = self._generation(key) if self._generation else None
+
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                self._remove(key, existing)
+            if timeout <= 0:
+                return
+            if size > self.max_bytes:
+                self.rejections += 1
+                return
+
+            self._sketch.increment(key)
+            now = time.time()
+            entry = _Entry(value, now, now + timeout, size, _WINDOW, generation)
+            self._entries[key] = entry
+            self._segments[_WINDOW][key] = entry
+            self._segment_bytes[_WINDOW] += size
+            self._evict()
+
+    def _touch(self, key, entry):
+        """命中时更新条目位置：试用段的条目升入保护段，保护段超出预算时最旧的条目降回试用段"""
+        if entry.segment != _PROBATION:
+            self._segments[entry.segment].move_to_end(key)
+            return
+
+        self._move(key, entry, _PROTECTED)
+        protected = self._segments[_PROTECTED]
+        while self._segment_bytes[_PROTECTED] > self._protected_max_bytes and len(protected) > 1:
+            demoted_key = next(iter(protected))
+            self._move(demoted_key, protected[demoted_key], _PROBATION)
+
+    def _move(self, key, entry, segment):
+        del self._segments[entry.segment][key]
+        self._segment_bytes[entry.segment] -= entry.size
+        entry.segment = segment
+        self._segments[segment][key] = entry
+        self._segment_bytes[segment] += entry.size
+
+    def _remove(self, key, entry):
+        del self._entries[key]
+        del self._segments[entry.segment][key]
+        self._segment_bytes[entry.segment] -= entry.size
+
+    def _over_budget(self):
+        return self.bytes_used > self.max_bytes or len(self._entries) > self.max_size
+
+    def _evict(self):
+        """淘汰条目直到满足字节预算和条目数限制（调用方持有锁）"""
+        # 窗口超出预算时，最旧的条目作为候选进入试用段
+        window = self._segments[_WINDOW]
+        candidates = []
+        while len(window) > 1 and (
+            self._segment_bytes[_WINDOW] > self._window_max_bytes or len(window) > self._window_max_size
+        ):
+            key = next(iter(window))
+            self._move(key, window[key], _PROBATION)
+            candidates.append(key)
+
+        now = time.time()
+        probation = self._segments[_PROBATION]
+        while self._over_budget():
+            victim_key = next(iter(probation), None)
+            if victim_key is None:
+                # 试用段为空时依次从保护段、窗口淘汰最旧的条目
+                segment = self._segments[_PROTECTED] or window
+                victim_key = next(iter(segment))
+                self._remove(victim_key, segment[victim_key])
+                self.evictions += 1
+                continue
+
+            victim = probation[victim_key]
+            candidate_key = candidates.pop() if candidates else None
+            if candidate_key is None or candidate_key == victim_key or candidate_key not in probation:
+                self._remove(victim_key, victim)
+                self.evictions += 1
+                continue
+
+            # 候选必须比被替换的条目更常被访问才能留下（已过期的条目直接淘汰）
+            if victim.expires_at <= now or self._sketch.frequency(candidate_key) > self._sketch.frequency(victim_key):
+                self._remove(victim_key, victim)
+                self.evictions += 1
+                candidates.append(candidate_key)
+            else:
+                self._remove(candidate_key, probation[candidate_key])
+                self.rejections += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            for segment in self._segments:
+                segment.clear()
+            self._segment_bytes = [0, 0, 0]
+            self._sketch.clear()
+        logger.info("缓存已清空")
+
+    def stats(self):
+        """获取缓存统计信息"""
+        now = time.time()
+        with self._lock:
+            expiry_times = [entry.expires_at for entry in self._entries.values()]
+            segment_sizes = [len(segment) for segment in self._segments]
+            bytes_used = self.bytes_used
+            hits, misses = self.hits, self.misses
+
+        valid_items = sum(1 for expires_at in expiry_times if now < expires_at)
+        return {
+            'total_items': len(expiry_times),
+            'valid_items': valid_items,
+            'expired_items': len(expiry_times) - valid_items,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0,
+            'bytes_used': bytes_used,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+            'rejections': self.rejections,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'segments': {
+                'window': segment_sizes[_WINDOW],
+                'probation': segment_sizes[_PROBATION],
+                'protected': segment_sizes[_PROTECTED]
+            },
+            'max_size': self.max_size,
+            'cache_timeout': self.default_timeout
+        }
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+缓存有效期策略模块
+按内容决定每个缓存条目的有效期：带签名的m3u8地址按其过期参数缓存，
+已完结的剧集长期缓存，连载中的剧集按观测到的更新间隔调整检查频率
+"""
+
+import re
+import time
+import calendar
+from urllib.parse import urlsplit, parse_qsl
+from config import get_config
+
+# 获取配置
+config = get_config()
+
+# "全80集"、"已完结"等表示已完结，"更新至12集"、"未完结"表示连载中
+_COMPLETED_PATTERN = re.compile(r'全\s*\d+\s*集|(?<![未没])完结|大结局')
+
+# 十进制过期时间戳参数（秒或毫秒），如 ?expires=1700000000、?e=1700000000
+_DECIMAL_EXPIRY_PARAMS = ('expires', 'expire', 'expiry', 'exp', 'e', 'deadline', 'x-expires')
+# 十六进制过期时间戳参数（腾讯云txTime、网宿wsTime）
+_HEX_EXPIRY_PARAMS = ('txtime', 'wstime')
+# Akamai令牌，如 ?hdnts=st=1700000000~exp=1700003600~acl=/*~hmac=...
+_TOKEN_PARAMS = ('hdnts', '__token__')
+_TOKEN_EXPIRY_PATTERN = re.compile(r'(?:^|~)exp=(\d+)')
+
+def is_completed(status_info):
+    """根据状态信息判断剧集是否已完结"""
+    return bool(status_info and _COMPLETED_PATTERN.search(status_info))
+
+def _parse_timestamp(value, hex_allowed=False):
+    """解析时间戳参数，只接受合理范围内的值（排除有效时长等其他含义的数字）"""
+    if value.isdigit():
+        timestamp = int(value)
+    elif hex_allowed:
+        try:
+            timestamp = int(value, 16)
+        except ValueError:
+            return None
+    else:
+        return None
+
+    if 10 ** 12 <= timestamp < 10 ** 13:
+        timestamp //= 1000  # 毫秒
+    if 10 ** 9 <= timestamp < 10 ** 10:
+        return timestamp
+    return None
+
+def m3u8_expiry(url):
+    """从签名m3u8地址的查询参数中解析过期时间（Unix时间戳），没有签名参数时返回None"""
+    if not url or '?' not in url:
+        return None
+
+    params = {key.lower(): value for key, value in parse_qsl(urlsplit(url).query)}
+
+    for name in _DECIMAL_EXPIRY_PARAMS:
+        if name in params:
+            expiry = _parse_timestamp(params[name])
+            if expiry:
+                return expiry
+
+    for name in _HEX_EXPIRY_PARAMS:
+        if name in params:
+            expiry = _parse_timestamp(params[name], hex_allowed=True)
+            if expiry:
+                return expiry
+
+    for name in _TOKEN_PARAMS:
+        match = _TOKEN_EXPIRY_PATTERN.search(params.get(name, ''))
+        if match:
+            expiry = _parse_timestamp(match.group(1))
+            if expiry:
+                return expiry
+
+    # AWS预签名地址：签发时间 + 有效秒数
+    if 'x-amz-date' in params and params.get('x-amz-expires', '').isdigit():
+        try:
+            signed_at = calendar.timegm(time.strptime(params['x-amz-date'], '%Y%m%dT%H%M%SZ'))
+        except ValueError:
+            return None
+        return signed_at + int(params['x-amz-expires'])
+
+    return None
+
+def play_url_ttl(play_url, now=None):
+    """播放地址的缓存时间：签名地址在过期前留出余量，未签名的地址使用CACHE_TIMEOUT
+
+    返回0表示地址即将过期，不应缓存。
+    """
+    expiry = m3u8_expiry(play_url)
+    if expiry is None:
+        return config.CACHE_TIMEOUT
+
+    now = now or time.time()
+    remaining = expiry - now - config.PLAY_URL_EXPIRY_MARGIN
+    return int(max(0, min(remaining, config.PLAY_URL_MAX_TTL)))
+
+def play_url_valid(play_url, resolved_at, max_age, now=None):
+    """已保存的播放地址是否仍可使用：签名地址看过期参数，未签名地址看解析时间"""
+    if not play_url:
+        return False
+    now = now or time.time()
+    expiry = m3u8_expiry(play_url)
+    if expiry is not None:
+        return expiry - config.PLAY_URL_EXPIRY_MARGIN > now
+    return not max_age or (resolved_at or 0) >= now - max_age
+
+def observe_change_interval(previous_interval, interval):
+    """用新观测到的更新间隔更新估计值（指数加权平均，近期的间隔权重更高）"""
+    if not previous_interval:
+        return interval
+    weight = config.CATALOG_CHANGE_INTERVAL_WEIGHT
+    return weight * interval + (1 - weight) * previous_interval
+
+def series_max_age(status_info, change_interval=None, changed_at=None, now=None):
+    """剧集元数据和剧集列表的有效期
+
+    已完结的剧集很少变化，使用长有效期；连载中的剧集按观测到的更新间隔估计，
+    长时间没有更新时估计值随之增大，没有观测数据时使用默认的连载有效期。
+    """
+    if is_completed(status_info):
+        return config.CATALOG_COMPLETED_MAX_AGE
+    if not change_interval:
+        return config.CATALOG_ONGOING_MAX_AGE
+
+    now = now or time.time()
+    quiet_time = now - changed_at if changed_at else 0
+    estimate = max(change_interval, quiet_time) * config.CATALOG_CHANGE_CHECK_RATIO
+    return int(min(max(estimate, config.CATALOG_ONGOING_MIN_AGE), config.CATALOG_ONGOING_MAX_LEARNED_AGE))
+
+def content_ttl(max_age, play_urls, now=None):
+    """包含播放地址的缓存内容（详情页、API响应）的有效期：不超过其中任一播放地址的有效期"""
+    ttl = max_age
+    now = now or time.time()
+    for play_url in play_urls:
+        if play_url:
+            ttl = min(ttl, play_url_ttl(play_url, now))
+    return int(max(0, ttl))
+
+def video_ttl(video, max_age=None, now=None):
+    """视频详情的缓存有效期，max_age为空时按剧集状态决定"""
+    if max_age is None:
+        max_age = series_max_age(video.status_info)
+    play_urls = [video.m3u8_url] + [episode.play_url for episode in video.episodes]
+    return content_ttl(max_age, play_urls, now)
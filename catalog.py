@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+视频目录持久化模块
+使用SQLite保存已抓取的视频元数据、剧集列表和已解析的m3u8地址（含抓取时间），
+根据更新状态和观测到的更新间隔判断是否需要从上游刷新
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from config import get_config
+from models import Episode, Video
+from cache_policy import is_completed, series_max_age, observe_change_interval, play_url_valid
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_url TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    update_datetime TEXT NOT NULL,
+    formatted_date TEXT NOT NULL,
+    update_text TEXT NOT NULL,
+    status_info TEXT NOT NULL,
+    release_date TEXT NOT NULL,
+    m3u8_url TEXT NOT NULL,
+    episode_count INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    checked_at REAL NOT NULL,
+    changed_at REAL,
+    change_interval REAL,
+    max_age REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS episodes (
+    video_url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    number TEXT NOT NULL,
+    play_url TEXT,
+    resolved_at REAL,
+    PRIMARY KEY (video_url, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_episodes_url ON episodes (url);
+"""
+
+# 旧版本目录缺少的列（更新间隔学习）
+_MIGRATIONS = [
+    ('changed_at', 'ALTER TABLE videos ADD COLUMN changed_at REAL'),
+    ('change_interval', 'ALTER TABLE videos ADD COLUMN change_interval REAL'),
+    ('max_age', 'ALTER TABLE videos ADD COLUMN max_age REAL NOT NULL DEFAULT 0'),
+]
+
+# 按到期时间查找需要刷新的视频
+_INDEXES = """
+DROP INDEX IF EXISTS idx_videos_refresh;
+CREATE INDEX IF NOT EXISTS idx_videos_due ON videos (checked_at + max_age);
+"""
+
+class Catalog:
+    """SQLite视频目录，每个线程使用独立连接"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            self._migrate(conn)
+            conn.executescript(_INDEXES)
+
+    def _migrate(self, conn):
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(videos)")}
+        missing = [statement for column, statement in _MIGRATIONS if column not in columns]
+        for statement in missing:
+            conn.execute(statement)
+        if missing:
+            conn.execute(
+                "UPDATE videos SET max_age = CASE completed WHEN 1 THEN ? ELSE ? END",
+                (config.CATALOG_COMPLETED_MAX_AGE, config.CATALOG_ONGOING_MAX_AGE)
+            )
+            logger.info("视频目录已升级：增加更新间隔字段")
+
+    def reset_connections(self):
+        """丢弃已有连接（fork后子进程不能沿用父进程的SQLite连接）"""
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def upsert_video(self, video_url, video, fetched_at=None):
+        """写入或更新视频及其完整剧集列表"""
+        self.upsert_videos([(video_url, video)], fetched_at)
+
+    def upsert_videos(self, videos, fetched_at=None):
+        """批量写入或更新[(video_url, Video)]，在同一事务中完成
+
+        剧集按地址与已有记录对比，插入或重排后的剧集仍沿用原有的播放地址和解析时间。
+        剧集数或状态发生变化时记录一次更新，并据此更新间隔估计和有效期。
+        """
+        fetched_at = fetched_at or time.time()
+        conn = self._connect()
+        video_rows = []
+        episode_rows = []
+        trims = []
+        for video_url, video in videos:
+            changed_at, change_interval = self._observe_change(conn, video_url, video, fetched_at)
+            max_age = series_max_age(video.status_info, change_interval, changed_at, now=fetched_at)
+            known = {
+                url: (play_url, resolved_at)
+                for url, play_url, resolved_at in conn.execute(
+                    "SELECT url, play_url, resolved_at FROM episodes WHERE video_url = ? AND play_url IS NOT NULL",
+                    (video_url,)
+                )
+            }
+            video_rows.append((
+                video_url, video.title, json.dumps(list(video.tags), ensure_ascii=False),
+                video.update_datetime, video.formatted_date, video.update_text,
+                video.status_info, video.release_date, video.m3u8_url,
+                video.episode_count, int(is_completed(video.status_info)),
+                fetched_at, fetched_at, changed_at, change_interval, max_age
+            ))
+            for position, episode in enumerate(video.episodes):
+                if episode.url in known:
+                    play_url, resolved_at = known[episode.url]
+                elif episode.play_url:
+                    play_url, resolved_at = episode.play_url, fetched_at
+                else:
+                    play_url, resolved_at = None, None
+                episode_rows.append((
+                    video_url, position, episode.title, episode.url, episode.number,
+                    play_url, resolved_at
+                ))
+            trims.append((video_url, len(video.episodes)))
+
+        with conn:
+            conn.executemany("""
+                INSERT INTO videos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (video_url) DO UPDATE SET
+                    title = excluded.title,
+                    tags = excluded.tags,
+                    update_datetime = excluded.update_datetime,
+                    formatted_date = excluded.formatted_date,
+                    update_text = excluded.update_text,
+                    status_info = excluded.status_info,
+                    release_date = excluded.release_date,
+                    m3u8_url = excluded.m3u8_url,
+                    episode_count = excluded.episode_count,
+                    completed = excluded.completed,
+                    fetched_at = excluded.fetched_at,
+                    checked_at = excluded.checked_at,
+                    changed_at = excluded.changed_at,
+                    change_interval = excluded.change_interval,
+                    max_age = excluded.max_age
+            """, video_rows)
+            conn.executemany("""
+                INSERT INTO episodes VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (video_url, position) DO UPDATE SET
+                    title = excluded.title,
+                    url = excluded.url,
+                    number = excluded.number,
+                    play_url = excluded.play_url,
+                    resolved_at = excluded.resolved_at
+            """, episode_rows)
+            conn.executemany(
+                "DELETE FROM episodes WHERE video_url = ? AND position >= ?",
+                trims
+            )
+
+    @staticmethod
+    def _observe_change(conn, video_url, video, now):
+        """与已保存的版本对比，返回更新后的(最近更新时间, 更新间隔估计)"""
+        row = conn.execute(
+            "SELECT episode_count, status_info, changed_at, change_interval FROM videos WHERE video_url = ?",
+            (video_url,)
+        ).fetchone()
+        if row is None:
+            # 首次抓取，上一次更新的时间未知
+            return None, None
+
+        episode_count, status_info, changed_at, change_interval = row
+        if episode_count == video.episode_count and status_info == video.status_info:
+            return changed_at, change_interval
+
+        if changed_at:
+            change_interval = observe_change_interval(change_interval, now - changed_at)
+        return now, change_interval
+
+    def record_play_urls(self, play_urls, resolved_at=None):
+        """记录已解析的剧集播放地址 [(剧集地址, 播放地址)]"""
+        resolved_at = resolved_at or time.time()
+        rows = [(play_url, resolved_at, url) for url, play_url in play_urls if play_url]
+        if not rows:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "UPDATE episodes SET play_url = ?, resolved_at = ? WHERE url = ?",
+                rows
+            )
+
+    def get_video(self, video_url, play_url_max_age=None):
+        """读取视频及完整剧集列表，返回(Video, fetched_at, max_age)，不存在时返回(None, None, None)
+
+        已过期的播放地址不返回（签名地址按过期参数，其他地址按play_url_max_age），由调用方重新解析。
+        max_age为该视频按更新状态和更新间隔得出的有效期。
+        """
+        conn = self._connect()
+        row = conn.execute("""
+            SELECT title, tags, update_datetime, formatted_date, update_text,
+                   status_info, release_date, m3u8_url, fetched_at, max_age
+            FROM videos WHERE video_url = ?
+        """, (video_url,)).fetchone()
+        if row is None:
+            return None, None, None
+
+        now = time.time()
+        episodes = [
+            Episode.create(
+                title, url, number,
+                play_url if play_url_valid(play_url, resolved_at, play_url_max_age, now) else None
+            )
+            for title, url, number, play_url, resolved_at in conn.execute("""
+                SELECT title, url, number, play_url, resolved_at
+                FROM episodes WHERE video_url = ? ORDER BY position
+            """, (video_url,))
+        ]
+
+        video = Video.create(
+            title=row[0],
+            tags=json.loads(row[1]),
+            update_datetime=row[2],
+            formatted_date=row[3],
+            update_text=row[4],
+            status_info=row[5],
+            release_date=row[6],
+            m3u8_url=row[7],
+            episodes=episodes
+        )
+        return video, row[8], row[9]
+
+    def expire_video(self, video_url):
+        """将视频标记为已过期并丢弃已解析的播放地址，返回该视频的剧集地址"""
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE videos SET fetched_at = 0 WHERE video_url = ?", (video_url,))
+            conn.execute(
+                "UPDATE episodes SET play_url = NULL, resolved_at = NULL WHERE video_url = ?",
+                (video_url,)
+            )
+        return [row[0] for row in conn.execute("SELECT url FROM episodes WHERE video_url = ?", (video_url,))]
+
+    def stale_videos(self, limit=50, now=None):
+        """需要刷新的视频地址：距上次检查超过各自的有效期，最早到期的优先"""
+        now = now or time.time()
+        conn = self._connect()
+        rows = conn.execute("""
+            SELECT video_url, checked_at FROM videos
+            WHERE checked_at + max_age < ?
+            ORDER BY checked_at + max_age
+            LIMIT ?
+        """, (now, limit))
+        return rows.fetchall()
+
+    def claim_refresh(self, video_url, checked_at, now=None):
+        """原子地认领一次刷新，避免多个worker重复刷新同一视频"""
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE videos SET checked_at = ? WHERE video_url = ? AND checked_at = ?",
+                (now or time.time(), video_url, checked_at)
+            )
+        return cursor.rowcount == 1
+
+    def clear(self):
+        """清空目录"""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM episodes")
+            conn.execute("DELETE FROM videos")
+
+    def stats(self):
+        """获取目录统计信息"""
+        conn = self._connect()
+        videos, completed = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(completed), 0) FROM videos"
+        ).fetchone()
+        episodes, resolved = conn.execute(
+            "SELECT COUNT(*), COUNT(play_url) FROM episodes"
+        ).fetchone()
+        return {
+            'videos': videos,
+            'completed_videos': completed,
+            'episodes': episodes,
+            'resolved_episodes': resolved,
+            'path': self.path
+        }
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """获取全局目录实例，未启用时返回None"""
+    global _catalog
+    if not config.CATALOG_ENABLED:
+        return None
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = Catalog(config.CATALOG_PATH)
+    return _catalog
+
+def _reset_after_fork():
+    if _catalog is not None:
+        _catalog.reset_connections()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -18,6 +18,7 @@ class Config:
     # 缓存配置
     CACHE_TIMEOUT = int(os.environ.get('CACHE_TIMEOUT', 3600))  # 1小时
     CACHE_MAX_SIZE = int(os.environ.get('CACHE_MAX_SIZE', 1000))  # 最大缓存条目数
+    CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 32 * 1024 * 1024))  # 每个缓存的内存预算（字节）
     
     # 请求配置
     REQUEST_TIMEOUT = int(os.environ.get('REQUEST_TIMEOUT', 5))  # 主请求超时
@@ -25,10 +26,99 @@ class Config:
     MAX_EPISODES = int(os.environ.get('MAX_EPISODES', 20))      # 默认最大剧集数
     MAX_CONCURRENT_REQUESTS = int(os.environ.get('MAX_CONCURRENT_REQUESTS', 10))
     
+    # 批量详情配置（/videos）
+    VIDEOS_BATCH_MAX_IDS = int(os.environ.get('VIDEOS_BATCH_MAX_IDS', 30))          # 一次请求最多查询的视频数
+    VIDEOS_BATCH_CONCURRENCY = int(os.environ.get('VIDEOS_BATCH_CONCURRENCY', 4))   # 每次请求同时进行的上游请求数
+    VIDEOS_BATCH_TIMEOUT = float(os.environ.get('VIDEOS_BATCH_TIMEOUT', 4))         # 超过该秒数返回已完成的部分
+    VIDEOS_BATCH_WORKERS = int(os.environ.get('VIDEOS_BATCH_WORKERS', 8))           # 每个worker获取详情页的线程数
+    
+    # 响应压缩配置
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # 小于该字节数的响应不压缩
+    
+    # m3u8代理配置
+    HLS_PROXY_ENABLED = os.environ.get('HLS_PROXY_ENABLED', 'false').lower() == 'true'
+    HLS_ALLOWED_HOSTS = tuple(host.strip().lower() for host in os.environ.get('HLS_ALLOWED_HOSTS', '').split(',') if host.strip())  # 代理只请求这些域名（含子域名），为空时不启用代理
+    HLS_VOD_TTL = int(os.environ.get('HLS_VOD_TTL', 3600))  # 点播/主播放列表缓存时间
+    HLS_LIVE_TTL = int(os.environ.get('HLS_LIVE_TTL', 5))   # 直播媒体播放列表最长缓存时间
+    
+    # 封面缩略图代理配置
+    THUMB_PROXY_ENABLED = os.environ.get('THUMB_PROXY_ENABLED', 'false').lower() == 'true'
+    THUMB_UPSTREAM_BASE = 'https://djw1.com/'  # 补全相对封面地址，并作为抓取封面时的Referer
+    THUMB_ALLOWED_HOSTS = tuple(host.strip().lower() for host in os.environ.get('THUMB_ALLOWED_HOSTS', 'djw1.com').split(',') if host.strip())  # 只代理这些域名（含子域名）的封面
+    THUMB_WIDTHS = (160, 320, 480)   # 标准宽度，请求的宽度归到不小于它的最近一档
+    THUMB_DEFAULT_WIDTH = int(os.environ.get('THUMB_DEFAULT_WIDTH', 320))  # 搜索结果使用的宽度
+    THUMB_FORMATS = tuple(os.environ.get('THUMB_FORMATS', 'webp,avif').split(','))  # 输出格式优先顺序，浏览器都不支持时使用JPEG
+    THUMB_QUALITY = int(os.environ.get('THUMB_QUALITY', 70))
+    THUMB_AVIF_QUALITY = int(os.environ.get('THUMB_AVIF_QUALITY', 45))  # Pillow的AVIF质量刻度与WebP不同，约45时体积与WebP 70相当
+    THUMB_CACHE_DIR = os.environ.get('THUMB_CACHE_DIR', 'data/thumbs')
+    THUMB_CACHE_MAX_BYTES = int(os.environ.get('THUMB_CACHE_MAX_BYTES', 512 * 1024 * 1024))  # 磁盘缓存上限（含原图）
+    THUMB_MAX_SOURCE_BYTES = 10 * 1024 * 1024  # 超过该大小的原图不代理
+    THUMB_MAX_TRANSCODES = int(os.environ.get('THUMB_MAX_TRANSCODES', os.cpu_count() or 2))  # 每个worker同时进行的转码数
+    THUMB_MAX_AGE = 365 * 86400      # 缩略图地址不变，浏览器长期缓存
+    
+    # 播放页预取配置
+    PLAY_INITIAL_EPISODES = 1   # 播放页首屏解析的剧集数（与player.js首次请求一致）
+    PLAY_PREFETCH_WAIT = float(os.environ.get('PLAY_PREFETCH_WAIT', 1.5))  # 渲染播放页时等待服务端预取的最长秒数
+    PLAY_PREFETCH_WORKERS = int(os.environ.get('PLAY_PREFETCH_WORKERS', 4))  # 每个worker同时进行的播放页预取数（另受准入控制限制）
+    
+    # 静态资源配置（build_static.py的输出目录，相对项目根目录；没有构建时模板引用static下的原文件）
+    ASSETS_ENABLED = os.environ.get('ASSETS_ENABLED', 'true').lower() == 'true'
+    ASSETS_DIR = os.environ.get('ASSETS_DIR', 'static/dist')
+    ASSETS_MAX_AGE = 365 * 86400     # 文件名带内容哈希，内容变化时地址随之变化，浏览器长期缓存
+    
+    # 本地搜索索引配置
+    SEARCH_INDEX_MAX_DOCS = int(os.environ.get('SEARCH_INDEX_MAX_DOCS', 100000))  # 索引最多保留的视频数
+    
+    # 搜索分页配置
+    SEARCH_MAX_PAGES = int(os.environ.get('SEARCH_MAX_PAGES', 5))     # 最多合并的上游结果页数
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 20))    # 返回给客户端的默认每页条数
+    
+    # 搜索联想配置
+    SUGGEST_MAX_ENTRIES = int(os.environ.get('SUGGEST_MAX_ENTRIES', 100000))  # 联想索引最多保留的标题数
+    SUGGEST_TOP_K = 10            # 每个前缀返回的联想条数
+    SUGGEST_MAX_PREFIX_LEN = 4    # 预先维护top-k列表的最长前缀
+    
+    # 视频目录配置
+    CATALOG_ENABLED = os.environ.get('CATALOG_ENABLED', 'true').lower() == 'true'
+    CATALOG_PATH = os.environ.get('CATALOG_PATH', 'data/catalog.db')
+    CATALOG_ONGOING_MAX_AGE = int(os.environ.get('CATALOG_ONGOING_MAX_AGE', 1800))          # 连载中的剧集30分钟后从上游刷新
+    CATALOG_COMPLETED_MAX_AGE = int(os.environ.get('CATALOG_COMPLETED_MAX_AGE', 7 * 86400))  # 已完结的剧集7天后从上游刷新
+    CATALOG_REFRESH_INTERVAL = int(os.environ.get('CATALOG_REFRESH_INTERVAL', 600))         # 后台刷新间隔，0表示不启动
+    CATALOG_ONGOING_MIN_AGE = 300               # 根据更新间隔调整后的连载有效期下限
+    CATALOG_ONGOING_MAX_LEARNED_AGE = 6 * 3600  # 根据更新间隔调整后的连载有效期上限
+    CATALOG_CHANGE_CHECK_RATIO = 0.25           # 有效期占预计更新间隔的比例
+    CATALOG_CHANGE_INTERVAL_WEIGHT = 0.5        # 更新间隔估计中最新观测值的权重
+    
+    # 上游页面存储配置（条件请求重新验证详情页）
+    PAGE_STORE_ENABLED = os.environ.get('PAGE_STORE_ENABLED', 'true').lower() == 'true'
+    PAGE_STORE_PATH = os.environ.get('PAGE_STORE_PATH', 'data/pages.db')
+    PAGE_STORE_MAX_PAGES = int(os.environ.get('PAGE_STORE_MAX_PAGES', 20000))  # 保存的详情页数量上限，超出时删除最久未检查的
+    PAGE_STORE_COMPRESS_LEVEL = 6               # zlib压缩级别
+    
+    # 播放地址有效期配置
+    PLAY_URL_EXPIRY_MARGIN = int(os.environ.get('PLAY_URL_EXPIRY_MARGIN', 120))  # 签名地址在过期前提前失效的秒数
+    PLAY_URL_MAX_TTL = int(os.environ.get('PLAY_URL_MAX_TTL', 86400))           # 签名地址的最长缓存时间
+    
+    # 准入控制配置（每个worker内请求上游的并发槽位，gunicorn每个worker默认16个线程）
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_MAX_ACTIVE = int(os.environ.get('ADMISSION_MAX_ACTIVE', 12))  # 留出线程处理缓存命中和快速拒绝
+    ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 3))     # 排队等待的请求同样占用线程
+    ADMISSION_SHARES = {'playback': 1.0, 'detail': 0.75, 'search': 0.5, 'background': 0.25}  # 各优先级最多占用的槽位比例
+    ADMISSION_MAX_WAITS = {'playback': 5.0, 'detail': 3.0, 'search': 1.0, 'background': 0}  # 最长排队秒数，0表示不排队
+    ADMISSION_RETRY_AFTER = 2  # 503响应的Retry-After秒数
+    
     # 频率限制配置
     RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
     RATE_LIMIT_PER_MINUTE = int(os.environ.get('RATE_LIMIT_PER_MINUTE', 60))
     RATE_LIMIT_PER_HOUR = int(os.environ.get('RATE_LIMIT_PER_HOUR', 200))
+    # 应用前面的反向代理层数：大于0时按X-Forwarded-For/X-Forwarded-Proto取客户端地址和协议（只在确有代理时设置，否则客户端可伪造）
+    TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+    
+    # 请求记录配置（供replay.py回放）
+    RECORD_ENABLED = os.environ.get('RECORD_ENABLED', 'false').lower() == 'true'
+    RECORD_SAMPLE_RATE = float(os.environ.get('RECORD_SAMPLE_RATE', 0.1))  # 记录的请求比例
+    RECORD_DIR = os.environ.get('RECORD_DIR', 'logs/requests')
+    RECORD_MAX_FILES = int(os.environ.get('RECORD_MAX_FILES', 48))  # 按小时轮转，保留的文件数
     
     # 用户代理
     USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36'
@@ -36,6 +126,21 @@ class Config:
     # 日志配置
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    LOG_JSON = os.environ.get('LOG_JSON', 'false').lower() == 'true'    # 每条日志输出一行JSON
+    LOG_ASYNC = os.environ.get('LOG_ASYNC', 'true').lower() == 'true'   # 由后台线程写出日志
+    LOG_RATE_LIMIT_BURST = int(os.environ.get('LOG_RATE_LIMIT_BURST', 50))      # 同一代码位置每个窗口最多输出的日志条数，0表示不限流
+    LOG_RATE_LIMIT_INTERVAL = int(os.environ.get('LOG_RATE_LIMIT_INTERVAL', 10))  # 限流窗口（秒）
+    
+    # 跨worker缓存失效配置（共享代数表）
+    INVALIDATION_PATH = os.environ.get('INVALIDATION_PATH', 'data/generations.bin')
+    INVALIDATION_BUCKETS = int(os.environ.get('INVALIDATION_BUCKETS', 4096))           # 每个命名空间按视频ID/剧集地址哈希的分桶数
+    INVALIDATION_ACK_INTERVAL = float(os.environ.get('INVALIDATION_ACK_INTERVAL', 0.5))  # worker确认失效序号的间隔（秒）
+    INVALIDATION_ACK_TIMEOUT = float(os.environ.get('INVALIDATION_ACK_TIMEOUT', 2))      # 清除接口等待确认的最长时间（秒）
+    
+    # 性能分析配置（/debug/profile，未设置令牌时接口不可用）
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+    PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.01))  # 采样间隔（秒）
+    PROFILE_MAX_SECONDS = int(os.environ.get('PROFILE_MAX_SECONDS', 60))  # 单次分析最长时间
     
     # 安全配置
     ALLOWED_VIDEO_ID_PATTERN = r'^[a-zA-Z0-9_-]+$'
@@ -12,22 +12,126 @@ class ProductionConfig:
     DEBUG = False
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING')
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    LOG_JSON = os.getenv('LOG_JSON', 'true').lower() == 'true'  # 生产环境输出JSON，便于日志系统检索
+    LOG_ASYNC = os.getenv('LOG_ASYNC', 'true').lower() == 'true'
+    LOG_RATE_LIMIT_BURST = int(os.getenv('LOG_RATE_LIMIT_BURST', '50'))
+    LOG_RATE_LIMIT_INTERVAL = int(os.getenv('LOG_RATE_LIMIT_INTERVAL', '10'))
+    
+    # 跨worker缓存失效配置（共享代数表）
+    INVALIDATION_PATH = os.getenv('INVALIDATION_PATH', 'data/generations.bin')
+    INVALIDATION_BUCKETS = int(os.getenv('INVALIDATION_BUCKETS', '4096'))
+    INVALIDATION_ACK_INTERVAL = float(os.getenv('INVALIDATION_ACK_INTERVAL', '0.5'))
+    INVALIDATION_ACK_TIMEOUT = float(os.getenv('INVALIDATION_ACK_TIMEOUT', '2'))
+    
+    # 性能分析配置（/debug/profile，未设置令牌时接口不可用）
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+    PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.01'))
+    PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', '60'))
     
     # 缓存配置 - 生产环境更大的缓存
     CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', '7200'))  # 2小时
     CACHE_MAX_SIZE = int(os.getenv('CACHE_MAX_SIZE', '5000'))  # 更大缓存
+    CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(64 * 1024 * 1024)))  # 每个缓存64MB
     MAX_EPISODES = int(os.getenv('MAX_EPISODES', '50'))
     
     # 请求配置 - 生产环境优化
     REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', '8'))
     ASYNC_TIMEOUT = int(os.getenv('ASYNC_TIMEOUT', '15'))
     MAX_CONCURRENT_REQUESTS = int(os.getenv('MAX_CONCURRENT_REQUESTS', '30'))
+    
+    # 批量详情配置
+    VIDEOS_BATCH_MAX_IDS = int(os.getenv('VIDEOS_BATCH_MAX_IDS', '30'))
+    VIDEOS_BATCH_CONCURRENCY = int(os.getenv('VIDEOS_BATCH_CONCURRENCY', '6'))
+    VIDEOS_BATCH_TIMEOUT = float(os.getenv('VIDEOS_BATCH_TIMEOUT', '4'))
+    VIDEOS_BATCH_WORKERS = int(os.getenv('VIDEOS_BATCH_WORKERS', '8'))
     USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     
+    # 响应压缩配置
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+    
+    # m3u8代理配置
+    HLS_PROXY_ENABLED = os.getenv('HLS_PROXY_ENABLED', 'false').lower() == 'true'
+    HLS_ALLOWED_HOSTS = tuple(host.strip().lower() for host in os.getenv('HLS_ALLOWED_HOSTS', '').split(',') if host.strip())
+    HLS_VOD_TTL = int(os.getenv('HLS_VOD_TTL', '7200'))
+    HLS_LIVE_TTL = int(os.getenv('HLS_LIVE_TTL', '5'))
+    
+    # 封面缩略图代理配置
+    THUMB_PROXY_ENABLED = os.getenv('THUMB_PROXY_ENABLED', 'false').lower() == 'true'
+    THUMB_UPSTREAM_BASE = 'https://djw1.com/'
+    THUMB_ALLOWED_HOSTS = tuple(host.strip().lower() for host in os.getenv('THUMB_ALLOWED_HOSTS', 'djw1.com').split(',') if host.strip())
+    THUMB_WIDTHS = (160, 320, 480)
+    THUMB_DEFAULT_WIDTH = int(os.getenv('THUMB_DEFAULT_WIDTH', '320'))
+    THUMB_FORMATS = tuple(os.getenv('THUMB_FORMATS', 'webp,avif').split(','))
+    THUMB_QUALITY = int(os.getenv('THUMB_QUALITY', '70'))
+    THUMB_AVIF_QUALITY = int(os.getenv('THUMB_AVIF_QUALITY', '45'))
+    THUMB_CACHE_DIR = os.getenv('THUMB_CACHE_DIR', 'data/thumbs')
+    THUMB_CACHE_MAX_BYTES = int(os.getenv('THUMB_CACHE_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+    THUMB_MAX_SOURCE_BYTES = 10 * 1024 * 1024
+    THUMB_MAX_TRANSCODES = int(os.getenv('THUMB_MAX_TRANSCODES', str(os.cpu_count() or 2)))
+    THUMB_MAX_AGE = 365 * 86400
+    
+    # 播放页预取配置
+    PLAY_INITIAL_EPISODES = 1
+    PLAY_PREFETCH_WAIT = float(os.getenv('PLAY_PREFETCH_WAIT', '1.5'))
+    PLAY_PREFETCH_WORKERS = int(os.getenv('PLAY_PREFETCH_WORKERS', '4'))
+    
+    # 静态资源配置
+    ASSETS_ENABLED = os.getenv('ASSETS_ENABLED', 'true').lower() == 'true'
+    ASSETS_DIR = os.getenv('ASSETS_DIR', 'static/dist')
+    ASSETS_MAX_AGE = 365 * 86400
+    
+    # 本地搜索索引配置
+    SEARCH_INDEX_MAX_DOCS = int(os.getenv('SEARCH_INDEX_MAX_DOCS', '100000'))
+    
+    # 搜索分页配置
+    SEARCH_MAX_PAGES = int(os.getenv('SEARCH_MAX_PAGES', '5'))
+    SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '20'))
+    
+    # 搜索联想配置
+    SUGGEST_MAX_ENTRIES = int(os.getenv('SUGGEST_MAX_ENTRIES', '100000'))
+    SUGGEST_TOP_K = 10
+    SUGGEST_MAX_PREFIX_LEN = 4
+    
+    # 视频目录配置
+    CATALOG_ENABLED = os.getenv('CATALOG_ENABLED', 'true').lower() == 'true'
+    CATALOG_PATH = os.getenv('CATALOG_PATH', 'data/catalog.db')
+    CATALOG_ONGOING_MAX_AGE = int(os.getenv('CATALOG_ONGOING_MAX_AGE', '1800'))
+    CATALOG_COMPLETED_MAX_AGE = int(os.getenv('CATALOG_COMPLETED_MAX_AGE', str(7 * 86400)))
+    CATALOG_REFRESH_INTERVAL = int(os.getenv('CATALOG_REFRESH_INTERVAL', '600'))
+    CATALOG_ONGOING_MIN_AGE = int(os.getenv('CATALOG_ONGOING_MIN_AGE', '300'))
+    CATALOG_ONGOING_MAX_LEARNED_AGE = int(os.getenv('CATALOG_ONGOING_MAX_LEARNED_AGE', str(6 * 3600)))
+    CATALOG_CHANGE_CHECK_RATIO = float(os.getenv('CATALOG_CHANGE_CHECK_RATIO', '0.25'))
+    CATALOG_CHANGE_INTERVAL_WEIGHT = float(os.getenv('CATALOG_CHANGE_INTERVAL_WEIGHT', '0.5'))
+    
+    # 上游页面存储配置
+    PAGE_STORE_ENABLED = os.getenv('PAGE_STORE_ENABLED', 'true').lower() == 'true'
+    PAGE_STORE_PATH = os.getenv('PAGE_STORE_PATH', 'data/pages.db')
+    PAGE_STORE_MAX_PAGES = int(os.getenv('PAGE_STORE_MAX_PAGES', '20000'))
+    PAGE_STORE_COMPRESS_LEVEL = int(os.getenv('PAGE_STORE_COMPRESS_LEVEL', '6'))
+    
+    # 播放地址有效期配置
+    PLAY_URL_EXPIRY_MARGIN = int(os.getenv('PLAY_URL_EXPIRY_MARGIN', '120'))
+    PLAY_URL_MAX_TTL = int(os.getenv('PLAY_URL_MAX_TTL', '86400'))
+    
+    # 准入控制配置
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_MAX_ACTIVE = int(os.getenv('ADMISSION_MAX_ACTIVE', '12'))
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '3'))
+    ADMISSION_SHARES = {'playback': 1.0, 'detail': 0.75, 'search': 0.5, 'background': 0.25}
+    ADMISSION_MAX_WAITS = {'playback': 5.0, 'detail': 3.0, 'search': 1.0, 'background': 0}
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '2'))
+    
     # 限流配置 - 生产环境更严格
     RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
     RATE_LIMIT_PER_MINUTE = int(os.getenv('RATE_LIMIT_PER_MINUTE', '60'))
     RATE_LIMIT_PER_HOUR = int(os.getenv('RATE_LIMIT_PER_HOUR', '1000'))
+    TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '0'))
+    
+    # 请求记录配置
+    RECORD_ENABLED = os.getenv('RECORD_ENABLED', 'false').lower() == 'true'
+    RECORD_SAMPLE_RATE = float(os.getenv('RECORD_SAMPLE_RATE', '0.01'))
+    RECORD_DIR = os.getenv('RECORD_DIR', 'logs/requests')
+    RECORD_MAX_FILES = int(os.getenv('RECORD_MAX_FILES', '48'))
     
     # 验证配置
     ALLOWED_VIDEO_ID_PATTERN = r'^[a-zA-Z0-9_-]+$'
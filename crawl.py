@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+批量抓取命令行工具
+按关键词或视频ID离线抓取视频详情并解析剧集播放地址，预先填充视频目录（可同时输出JSONL），
+支持并发上限、请求间隔、断点续抓以及进度和吞吐量统计
+
+用法:
+    python crawl.py --keywords 总裁 重生 --concurrency 4 --delay 1
+    python crawl.py --ids-file ids.txt --output videos.jsonl --checkpoint data/crawl.ckpt
+"""
+
+import re
+import sys
+import json
+import time
+import queue
+import random
+import logging
+import argparse
+import threading
+from config import get_config
+from search import search_data
+from video import (
+    get_play_link_by_id, fetch_video_page, get_video_episodes, close_thread_session
+)
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+class CrawlStats:
+    """抓取计数，由各worker线程在锁内更新"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.keywords = 0
+        self.videos = 0
+        self.episodes = 0
+        self.resolved = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def summary(self):
+        elapsed = max(time.time() - self.started_at, 1e-6)
+        return (
+            f"关键词 {self.keywords}, 视频 {self.videos}, 剧集 {self.episodes} "
+            f"(已解析 {self.resolved}), 跳过 {self.skipped}, 失败 {self.failed}, "
+            f"耗时 {elapsed:.1f}秒, {self.videos / elapsed:.2f} 视频/秒, "
+            f"{self.episodes / elapsed:.1f} 剧集/秒"
+        )
+
+class Crawler:
+    """有界并发的批量抓取器
+
+    关键词任务搜索后为每个结果生成视频任务；视频任务抓取详情页（写入视频目录），
+    再解析剧集播放地址。每个任务完成后追加到检查点文件，重新运行时跳过已完成的任务。
+    """
+
+    def __init__(self, concurrency=4, delay=1.0, max_episodes=0, resolve=True,
+                 refresh=False, output=None, checkpoint=None, progress_interval=5):
+        self.concurrency = max(1, concurrency)
+        self.delay = max(0.0, delay)
+        self.max_episodes = max_episodes
+        self.resolve = resolve
+        self.refresh = refresh
+        self.progress_interval = progress_interval
+        self.stats = CrawlStats()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._submitted = set()
+        self._video_id_pattern = re.compile(config.ALLOWED_VIDEO_ID_PATTERN)
+        self._done = self._load_checkpoint(checkpoint) if checkpoint else {}
+        self._checkpoint = open(checkpoint, 'a', encoding='utf-8') if checkpoint else None
+        self._output = open(output, 'a', encoding='utf-8') if output else None
+
+    @staticmethod
+    def _load_checkpoint(path):
+        """读取检查点，返回{任务键: 关键词任务发现的视频ID列表}"""
+        done = {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 中断时可能留下不完整的最后一行
+                        continue
+                    done[record['key']] = record.get('video_ids', [])
+        except FileNotFoundError:
+            pass
+        return done
+
+    def _write_line(self, f, record):
+        with self._lock:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+
+    def submit(self, kind, value):
+        """提交任务，重复的任务和检查点中已完成的任务会被跳过"""
+        key = f"{kind}:{value}"
+        with self._lock:
+            if key in self._submitted:
+                return
+            self._submitted.add(key)
+            if key in self._done:
+                self.stats.skipped += 1
+                recorded_ids = self._done[key]
+            else:
+                self._queue.put((kind, value))
+                return
+        # 已完成的关键词任务仍需提交其发现的视频（其中未完成的会继续抓取）
+        for video_id in recorded_ids:
+            self.submit('video', video_id)
+
+    def _crawl_keyword(self, keyword):
+        results = search_data(keyword)
+        if results is None:
+            return None
+        video_ids = [item.video_id for item in results['items'] if item.video_id]
+        with self._lock:
+            self.stats.keywords += 1
+        for video_id in video_ids:
+            self.submit('video', video_id)
+        return {'video_ids': video_ids}
+
+    def _crawl_video(self, video_id):
+        if not self._video_id_pattern.match(video_id):
+            logger.warning(f"无效的视频ID: {video_id}")
+            return None
+
+        video_url = get_play_link_by_id(video_id)
+        page = fetch_video_page(video_url, refresh=self.refresh)
+        if page is None:
+            return None
+
+        episodes = page.episodes
+        limit = self.max_episodes or page.episode_count
+        if self.resolve and limit:
+            # 只解析缺少播放地址的剧集，结果写回视频目录
+            result = get_video_episodes(video_url, offset=0, limit=limit, use_async=True)
+            if result is None:
+                return None
+            episodes = tuple(result['episodes']) + page.episodes[limit:]
+
+        with self._lock:
+            self.stats.videos += 1
+            self.stats.episodes += len(episodes)
+            self.stats.resolved += sum(1 for episode in episodes if episode.play_url)
+
+        if self._output:
+            record = page._replace(episodes=episodes).to_dict()
+            record.update(video_id=video_id, video_url=video_url)
+            self._write_line(self._output, record)
+        return {}
+
+    def _run_task(self, kind, value):
+        try:
+            if kind == 'keyword':
+                record = self._crawl_keyword(value)
+            else:
+                record = self._crawl_video(value)
+        except Exception as e:
+            logger.error(f"抓取任务出错 {kind}:{value}: {e}", exc_info=True)
+            record = None
+
+        if record is None:
+            # 失败的任务不写检查点，下次运行时重试
+            with self._lock:
+                self.stats.failed += 1
+            return
+
+        if self._checkpoint:
+            self._write_line(self._checkpoint, dict(record, key=f"{kind}:{value}"))
+
+    def _worker(self):
+        try:
+            while True:
+                task = self._queue.get()
+                if task is None:
+                    break
+                try:
+                    self._run_task(*task)
+                finally:
+                    self._queue.task_done()
+                if self.delay:
+                    # 请求间隔加入随机抖动，避免多个worker同时访问上游
+                    time.sleep(self.delay * random.uniform(0.5, 1.5))
+        finally:
+            close_thread_session()
+
+    def report(self):
+        """向标准错误输出进度"""
+        with self._lock:
+            line = self.stats.summary()
+        print(f"[进度] 队列 {self._queue.unfinished_tasks}, {line}", file=sys.stderr, flush=True)
+
+    def run(self):
+        """运行至所有任务完成，返回统计信息"""
+        workers = [
+            threading.Thread(target=self._worker, name=f'crawl-{i}', daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+
+        # 关键词任务会继续产生视频任务，等待队列真正清空
+        joiner = threading.Thread(target=self._queue.join, daemon=True)
+        joiner.start()
+        while joiner.is_alive():
+            joiner.join(self.progress_interval)
+            self.report()
+
+        for _ in workers:
+            self._queue.put(None)
+        for worker in workers:
+            worker.join()
+        return self.stats
+
+    def close(self):
+        for f in (self._checkpoint, self._output):
+            if f:
+                f.close()
+
+def _read_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='批量抓取视频详情并预先解析播放地址')
+    parser.add_argument('--keywords', nargs='*', default=[], help='搜索关键词')
+    parser.add_argument('--keywords-file', help='关键词文件，每行一个')
+    parser.add_argument('--ids', nargs='*', default=[], help='视频ID')
+    parser.add_argument('--ids-file', help='视频ID文件，每行一个')
+    parser.add_argument('--concurrency', type=int, default=4, help='并发抓取的视频数（默认4）')
+    parser.add_argument('--delay', type=float, default=1.0,
+                        help='每个worker两次任务之间的平均间隔秒数（默认1.0）')
+    parser.add_argument('--episodes', type=int, default=0,
+                        help='每个视频解析的剧集数，0表示全部（默认0）')
+    parser.add_argument('--no-resolve', action='store_true', help='只抓取详情和剧集列表，不解析播放地址')
+    parser.add_argument('--refresh', action='store_true', help='忽略目录中未过期的数据，强制请求上游')
+    parser.add_argument('--output', help='将抓取结果追加写入JSONL文件')
+    parser.add_argument('--checkpoint', help='检查点文件，用于中断后继续抓取')
+    parser.add_argument('--progress-interval', type=float, default=5, help='进度输出间隔秒数（默认5）')
+    parser.add_argument('--verbose', action='store_true', help='输出详细日志')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format=config.LOG_FORMAT
+    )
+
+    keywords = list(args.keywords)
+    video_ids = list(args.ids)
+    if args.keywords_file:
+        keywords.extend(_read_lines(args.keywords_file))
+    if args.ids_file:
+        video_ids.extend(_read_lines(args.ids_file))
+    if not keywords and not video_ids:
+        print('请指定 --keywords/--keywords-file 或 --ids/--ids-file', file=sys.stderr)
+        return 2
+    if not config.CATALOG_ENABLED and not args.output:
+        print('视频目录未启用，抓取结果只会保留在内存中，请指定 --output', file=sys.stderr)
+
+    crawler = Crawler(
+        concurrency=args.concurrency,
+        delay=args.delay,
+        max_episodes=args.episodes,
+        resolve=not args.no_resolve,
+        refresh=args.refresh,
+        output=args.output,
+        checkpoint=args.checkpoint,
+        progress_interval=args.progress_interval
+    )
+    try:
+        for keyword in keywords:
+            crawler.submit('keyword', keyword)
+        for video_id in video_ids:
+            crawler.submit('video', video_id)
+        stats = crawler.run()
+    except KeyboardInterrupt:
+        print(f"\n[中断] {crawler.stats.summary()}", file=sys.stderr)
+        return 130
+    finally:
+        crawler.close()
+
+    print(f"[完成] {stats.summary()}", file=sys.stderr)
+    return 1 if stats.failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
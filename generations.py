@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+跨worker缓存失效模块
+各worker共享一个内存映射文件中的代数计数器：全局、各命名空间，以及每个命名空间内按范围（视频ID、剧集地址）哈希分桶。
+缓存条目写入时记下所属范围的代数，读取时代数变化即视为过期（惰性失效，不批量删除）；
+每个worker的后台线程定期确认已看到的最新失效序号，清除接口据此报告已生效的worker数
+"""
+
+import os
+import mmap
+import time
+import zlib
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from config import get_config
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 可单独失效的命名空间：搜索结果、视频详情、剧集（分页和播放地址）、m3u8播放列表
+NAMESPACES = ('search', 'detail', 'episode', 'hls')
+
+_MAGIC = 0x314E4547  # "GEN1"
+_MAX_WORKERS = 64
+# 文件头：魔数、分桶数、失效序号、全局代数，随后是各命名空间代数
+_HEADER = 4
+
+class GenerationTable:
+    """共享代数表
+
+    文件由8字节无符号计数器组成：文件头、命名空间代数、命名空间×分桶的范围代数，
+    最后是worker登记表（pid、已确认的失效序号、心跳时间）。读取直接访问内存映射，不加锁；
+    失效和登记很少发生，在文件锁内进行。文件无法创建时退化为进程内计数（只对当前worker生效）。
+    """
+
+    def __init__(self, path, buckets):
+        self.path = path
+        self.buckets = buckets
+        self._namespace_index = {namespace: index for index, namespace in enumerate(NAMESPACES)}
+        self._buckets_offset = _HEADER + len(NAMESPACES)
+        self._workers_offset = self._buckets_offset + len(NAMESPACES) * buckets
+        self._length = self._workers_offset + _MAX_WORKERS * 3
+        self._counters = None
+        self._shared = False
+        self._open_lock = threading.Lock()
+        self._slot = None
+        self._watcher_pid = None
+
+    def _table(self):
+        counters = self._counters
+        if counters is None:
+            with self._open_lock:
+                if self._counters is None:
+                    self._counters = self._open()
+                counters = self._counters
+        return counters
+
+    def _open(self):
+        size = self._length * 8
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                # 只扩大不缩小：仍映射着旧文件的进程访问截断的部分会收到SIGBUS
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                mapped = mmap.mmap(fd, size)
+                counters = memoryview(mapped).cast('Q')
+                if counters[0] != _MAGIC or counters[1] != self.buckets:
+                    # 新文件或分桶数变化：重新初始化
+                    for index in range(self._length):
+                        counters[index] = 0
+                    counters[0] = _MAGIC
+                    counters[1] = self.buckets
+            finally:
+                # mmap复制了描述符，关闭前需要显式解锁，否则锁随映射一直持有
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+            self._shared = True
+            return counters
+        except OSError as e:
+            logger.warning(f"无法打开共享代数表 {self.path}，缓存失效只对当前worker生效: {e}")
+            counters = memoryview(bytearray(size)).cast('Q')
+            counters[0] = _MAGIC
+            counters[1] = self.buckets
+            return counters
+
+    @contextmanager
+    def _locked(self):
+        """跨进程互斥（每次重新打开文件：fork继承的描述符与父进程共享flock）"""
+        counters = self._table()
+        if not self._shared:
+            with self._open_lock:
+                yield counters
+            return
+        with open(self.path, 'rb') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield counters
+
+    def _bucket(self, namespace_index, scope):
+        h = zlib.crc32(scope.encode('utf-8')) % self.buckets
+        return self._buckets_offset + namespace_index * self.buckets + h
+
+    def current(self, namespace, scope=None):
+        """命名空间（及范围）当前的代数，任何相关的失效都会使其增大"""
+        counters = self._table()
+        index = self._namespace_index[namespace]
+        generation = counters[3] + counters[_HEADER + index]
+        if scope is not None:
+            generation += counters[self._bucket(index, scope)]
+        return generation
+
+    def invalidate(self, namespace=None, scopes=None):
+        """使缓存失效，返回新的失效序号
+
+        不指定命名空间和范围时全部失效；只指定命名空间时该命名空间全部失效；
+        指定范围时只失效这些范围（同一分桶内的其他范围会被连带失效，只是多一次未命中）。
+        """
+        namespaces = [namespace] if namespace else list(NAMESPACES)
+        with self._locked() as counters:
+            if scopes:
+                for name in namespaces:
+                    index = self._namespace_index[name]
+                    for bucket in {self._bucket(index, scope) for scope in scopes}:
+                        counters[bucket] += 1
+            elif namespace:
+                counters[_HEADER + self._namespace_index[namespace]] += 1
+            else:
+                counters[3] += 1
+            counters[2] += 1
+            return counters[2]
+
+    @property
+    def sequence(self):
+        return self._table()[2]
+
+    def _worker_slots(self):
+        return range(self._workers_offset, self._length, 3)
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def register_worker(self):
+        """在登记表中为当前进程占用一个位置（复用已退出进程的位置）"""
+        pid = os.getpid()
+        with self._locked() as counters:
+            for slot in self._worker_slots():
+                owner = counters[slot]
+                if owner == pid or owner == 0 or not self._alive(owner):
+                    counters[slot] = pid
+                    counters[slot + 1] = counters[2]
+                    counters[slot + 2] = int(time.time() * 1000)
+                    self._slot = slot
+                    return True
+        logger.warning(f"缓存失效登记表已满（{_MAX_WORKERS}），worker {pid} 不报告确认")
+        return False
+
+    def unregister_worker(self):
+        slot, self._slot = self._slot, None
+        if slot is not None:
+            with self._locked() as counters:
+                if counters[slot] == os.getpid():
+                    counters[slot] = 0
+
+    def acknowledge(self):
+        """记录当前进程已看到的失效序号"""
+        slot = self._slot
+        if slot is not None:
+            counters = self._table()
+            counters[slot + 1] = counters[2]
+            counters[slot + 2] = int(time.time() * 1000)
+
+    def workers(self):
+        """登记中仍在运行的worker：[(pid, 已确认序号, 心跳时间)]"""
+        counters = self._table()
+        stale_before = time.time() - max(5, config.INVALIDATION_ACK_INTERVAL * 10)
+        workers = []
+        for slot in self._worker_slots():
+            pid = counters[slot]
+            if pid and counters[slot + 2] / 1000 >= stale_before and self._alive(pid):
+                workers.append((pid, counters[slot + 1], counters[slot + 2] / 1000))
+        return workers
+
+    def wait_for_acks(self, sequence, timeout):
+        """等待所有worker确认到sequence，返回(已确认, 总数, 未确认的pid)"""
+        # 当前进程处理这个请求，读取共享表时已看到新序号
+        self.acknowledge()
+        deadline = time.monotonic() + timeout
+        while True:
+            workers = self.workers()
+            pending = [pid for pid, acked, _ in workers if acked < sequence]
+            if not pending or time.monotonic() >= deadline:
+                return len(workers) - len(pending), len(workers), pending
+            time.sleep(0.05)
+
+    def start_watcher(self):
+        """登记当前worker并启动确认线程（每个进程一次，fork后的子进程各自启动）"""
+        pid = os.getpid()
+        if self._watcher_pid == pid:
+            return
+        self._watcher_pid = pid
+        self._slot = None
+        if not self.register_worker():
+            return
+        threading.Thread(target=self._watch, name='generation-watcher', daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(config.INVALIDATION_ACK_INTERVAL)
+            try:
+                self.acknowledge()
+            except Exception as e:
+                logger.error(f"确认缓存失效序号出错: {e}")
+
+    def stats(self):
+        counters = self._table()
+        return {
+            'shared': self._shared,
+            'path': self.path,
+            'sequence': counters[2],
+            'global': counters[3],
+            'namespaces': {
+                namespace: counters[_HEADER + index] for namespace, index in self._namespace_index.items()
+            },
+            'workers': [
+                {'pid': pid, 'acknowledged': acked, 'heartbeat': round(heartbeat, 3)}
+                for pid, acked, heartbeat in self.workers()
+            ]
+        }
+
+generations = GenerationTable(config.INVALIDATION_PATH, config.INVALIDATION_BUCKETS)
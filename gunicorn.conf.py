@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Gunicorn 配置文件
+应用几乎全部时间都在等待上游响应，使用gthread worker：每个worker内多个线程并发处理请求，
+worker数只需覆盖CPU（页面解析），线程数决定可同时等待上游的请求数。
+
+用法:
+    gunicorn -c gunicorn.conf.py wsgi:app
+环境变量 GUNICORN_WORKERS / GUNICORN_THREADS / GUNICORN_TIMEOUT / GUNICORN_ACCESS_LOG / GUNICORN_ERROR_LOG 可覆盖默认值。
+"""
+
+import os
+import multiprocessing
+
+# 监听地址
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:3366')
+
+# worker模型：线程池worker，慢请求只占用一个线程而不是整个worker
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# gthread下timeout只检查worker心跳，单个慢请求不会导致worker被杀
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# 定期回收worker，加入抖动避免所有worker同时重启
+max_requests = 1000
+max_requests_jitter = 100
+
+# 在主进程中预先导入应用和解析依赖，worker通过fork以写时复制方式共享
+preload_app = True
+
+# 日志：默认写到本文件所在目录的logs/下（不依赖启动时的工作目录），"-"表示输出到标准输出/标准错误
+_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+
+def _log_path(name, default):
+    path = os.environ.get(name, os.path.join(_LOG_DIR, default))
+    if path != '-':
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return path
+
+accesslog = _log_path('GUNICORN_ACCESS_LOG', 'access.log')
+errorlog = _log_path('GUNICORN_ERROR_LOG', 'error.log')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'warning')
+
+def when_ready(server):
+    """fork worker之前在主进程中预先导入上游请求和解析依赖（应用模块本身只做延迟导入）"""
+    from video import warm_up
+    from thumbs import available_formats
+    warm_up()
+    # 导入Pillow并检测可用的编码器
+    available_formats()
+
+def post_fork(server, worker):
+    """worker启动后初始化本进程的后台任务
+
+    aiohttp会话、事件循环和SQLite连接由各模块的fork钩子重置，
+    主进程只预加载不处理请求，继承的缓存为空，无需清理。
+    """
+    from video import start_catalog_refresher
+    from generations import generations
+    start_catalog_refresher()
+    # 登记到共享代数表，确认线程向/cache/clear报告已看到的失效序号
+    generations.start_watcher()
+
+def worker_exit(server, worker):
+    """worker退出时关闭所有线程的异步会话和连接池"""
+    from video import close_all_sessions
+    from logging_setup import stop_logging
+    from generations import generations
+    close_all_sessions()
+    generations.unregister_worker()
+    # 写出日志队列中剩余的记录
+    stop_logging()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+m3u8播放列表代理模块
+缓存解析后的主播放列表/媒体播放列表，按点播/直播区分过期时间，
+将相对分片地址改写为绝对地址（分片仍由CDN直接提供），并预先计算码率选择
+"""
+
+import re
+import hmac
+import base64
+import hashlib
+import logging
+from functools import lru_cache
+from urllib.parse import urljoin
+from config import get_config
+from cache import TimedCache
+from generations import generations
+from serialization import CachedResponse
+from cache_policy import m3u8_expiry, play_url_ttl
+from proxy_guard import DisallowedHost, proxy_enabled, host_allowed, get_allowed
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+HLS_MIMETYPE = 'application/vnd.apple.mpegurl'
+
+# 标签属性中的URI，例如 #EXT-X-KEY:METHOD=AES-128,URI="key.key"
+_URI_ATTR_PATTERN = re.compile(r'URI="([^"]+)"')
+_BANDWIDTH_PATTERN = re.compile(r'(?:^|,)BANDWIDTH=(\d+)')
+_RESOLUTION_PATTERN = re.compile(r'RESOLUTION=(\d+)x(\d+)')
+_TARGET_DURATION_PATTERN = re.compile(r'#EXT-X-TARGETDURATION:(\d+)')
+
+class HlsPlaylist:
+    """已改写的播放列表缓存条目"""
+
+    __slots__ = ('url', 'is_master', 'is_vod', 'variants', 'response')
+
+    def __init__(self, url, is_master, is_vod, variants, response):
+        self.url = url
+        self.is_master = is_master
+        self.is_vod = is_vod
+        self.variants = variants  # [(bandwidth, height, 上游地址)]，按码率从高到低排列
+        self.response = response
+
+    @property
+    def nbytes(self):
+        """占用内存的估算值（改写后的响应体加上变体列表）"""
+        variants_size = sum(len(url) + 100 for bandwidth, height, url in self.variants)
+        return self.response.nbytes + len(self.url) + variants_size
+
+# 播放列表缓存（每个条目按点播/直播和签名过期时间设置各自的有效期）
+_playlist_cache = TimedCache(
+    default_timeout=config.HLS_VOD_TTL,
+    max_size=config.CACHE_MAX_SIZE,
+    generation=lambda m3u8_url: generations.current('hls')
+)
+
+@lru_cache(maxsize=1)
+def hls_proxy_enabled():
+    """是否启用m3u8代理（SECRET_KEY为默认值或没有配置HLS_ALLOWED_HOSTS时不启用）"""
+    return proxy_enabled('m3u8代理', config.HLS_PROXY_ENABLED, config.HLS_ALLOWED_HOSTS)
+
+def _sign(payload):
+    """对token载荷签名，防止代理被用于任意地址"""
+    digest = hmac.new(config.SECRET_KEY.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256)
+    return digest.hexdigest()[:16]
+
+def make_hls_token(m3u8_url):
+    """为上游m3u8地址生成代理token（无状态，任意worker均可解析）"""
+    payload = base64.urlsafe_b64encode(m3u8_url.encode('utf-8')).decode('ascii').rstrip('=')
+    return f"{payload}.{_sign(payload)}"
+
+def resolve_hls_token(token):
+    """解析代理token，签名无效时返回None"""
+    payload, _, signature = token.rpartition('.')
+    if not payload or not hmac.compare_digest(signature, _sign(payload)):
+        return None
+
+    try:
+        padding = '=' * (-len(payload) % 4)
+        m3u8_url = base64.urlsafe_b64decode(payload + padding).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    if not host_allowed(m3u8_url, config.HLS_ALLOWED_HOSTS):
+        return None
+    return m3u8_url
+
+def hls_proxy_url(m3u8_url):
+    """上游m3u8地址对应的代理地址，域名不在HLS_ALLOWED_HOSTS中时原样返回（由播放器直接请求）"""
+    if not host_allowed(m3u8_url, config.HLS_ALLOWED_HOSTS):
+        return m3u8_url
+    return f"/hls/{make_hls_token(m3u8_url)}.m3u8"
+
+def _rewrite_uri(uri, base_url, is_playlist):
+    """子播放列表走代理，分片和密钥改写为CDN绝对地址"""
+    absolute_url = urljoin(base_url, uri)
+    if is_playlist:
+        return hls_proxy_url(absolute_url)
+    return absolute_url
+
+def parse_playlist(text, url):
+    """解析并改写播放列表，返回(是否主列表, 是否点播, 码率列表, 改写后的文本, 目标分片时长)"""
+    lines = text.splitlines()
+    is_master = any(line.startswith('#EXT-X-STREAM-INF') for line in lines)
+    is_vod = '#EXT-X-ENDLIST' in text or '#EXT-X-PLAYLIST-TYPE:VOD' in text
+
+    target_duration = None
+    match = _TARGET_DURATION_PATTERN.search(text)
+    if match:
+        target_duration = int(match.group(1))
+
+    variants = []
+    rewritten = []
+    pending_stream_inf = None
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            continue
+
+        if stripped.startswith('#'):
+            if stripped.startswith('#EXT-X-STREAM-INF'):
+                pending_stream_inf = stripped
+            if 'URI="' in stripped:
+                # EXT-X-MEDIA/EXT-X-I-FRAME-STREAM-INF指向播放列表，EXT-X-KEY/EXT-X-MAP指向资源
+                is_playlist = stripped.startswith(('#EXT-X-MEDIA', '#EXT-X-I-FRAME-STREAM-INF'))
+                stripped = _URI_ATTR_PATTERN.sub(
+                    lambda m: f'URI="{_rewrite_uri(m.group(1), url, is_playlist)}"',
+                    stripped
+                )
+            rewritten.append(stripped)
+            continue
+
+        if is_master:
+            variant_url = urljoin(url, stripped)
+            if pending_stream_inf:
+                bandwidth_match = _BANDWIDTH_PATTERN.search(pending_stream_inf.split(':', 1)[-1])
+                resolution_match = _RESOLUTION_PATTERN.search(pending_stream_inf)
+                variants.append((
+                    int(bandwidth_match.group(1)) if bandwidth_match else 0,
+                    int(resolution_match.group(2)) if resolution_match else 0,
+                    variant_url
+                ))
+                pending_stream_inf = None
+            rewritten.append(hls_proxy_url(variant_url))
+        else:
+            rewritten.append(urljoin(url, stripped))
+
+    variants.sort(reverse=True)
+    return is_master, is_vod, variants, '\n'.join(rewritten) + '\n', target_duration
+
+def _playlist_ttl(url, is_master, is_vod, target_duration):
+    """点播列表长期缓存（带签名的地址不超过其过期时间），直播列表只缓存半个分片时长"""
+    if is_master or is_vod:
+        if m3u8_expiry(url) is not None:
+            return min(config.HLS_VOD_TTL, play_url_ttl(url))
+        return config.HLS_VOD_TTL
+    if target_duration:
+        return max(1, min(config.HLS_LIVE_TTL, target_duration // 2))
+    return config.HLS_LIVE_TTL
+
+def get_playlist(m3u8_url):
+    """获取已改写的播放列表（带缓存），失败时返回None"""
+    import requests
+    
+    cached_playlist = _playlist_cache.get(m3u8_url)
+    if cached_playlist is not None:
+        logger.debug("播放列表缓存命中: %s", m3u8_url)
+        return cached_playlist
+
+    headers = {
+        'User-Agent': config.USER_AGENT
+    }
+
+    try:
+        response = get_allowed(m3u8_url, config.HLS_ALLOWED_HOSTS, headers=headers, timeout=config.REQUEST_TIMEOUT)
+        response.raise_for_status()
+
+        # 重定向后以最终地址为基准改写相对路径
+        base_url = response.url or m3u8_url
+        is_master, is_vod, variants, text, target_duration = parse_playlist(response.text, base_url)
+        if not text.startswith('#EXTM3U'):
+            logger.warning(f"上游返回的不是m3u8播放列表: {m3u8_url}")
+            return None
+
+        ttl = _playlist_ttl(m3u8_url, is_master, is_vod, target_duration)
+        playlist = HlsPlaylist(
+            url=m3u8_url,
+            is_master=is_master,
+            is_vod=is_vod,
+            variants=variants,
+            response=CachedResponse(text.encode('utf-8'))
+        )
+        _playlist_cache.set(m3u8_url, playlist, timeout=ttl)
+        return playlist
+
+    except DisallowedHost as e:
+        logger.warning(f"播放列表地址（或其重定向）不在允许的域名中 {m3u8_url}: {e}")
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"获取播放列表失败 {m3u8_url}: {e}")
+        return None
+
+def select_variant(playlist, max_bandwidth=None):
+    """从预先排序的码率列表中选择不超过max_bandwidth的最高码率，未指定时选最高码率"""
+    if not playlist.variants:
+        return None
+
+    if max_bandwidth is None:
+        return playlist.variants[0][2]
+
+    for bandwidth, height, variant_url in playlist.variants:
+        if bandwidth <= max_bandwidth:
+            return variant_url
+    # 所有码率都超出限制时退回最低码率
+    return playlist.variants[-1][2]
+
+def clear_hls_cache():
+    """清除播放列表缓存"""
+    _playlist_cache.clear()
+
+def get_hls_cache_stats():
+    """获取播放列表缓存统计信息"""
+    return _playlist_cache.stats()
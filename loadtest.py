@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+压测工具
+用固定延迟的桩代替上游，比较不同gunicorn配置下的吞吐和延迟（不访问真实上游）：
+
+    # 1. 剧集页桩服务（每个请求延迟50ms）
+    python loadtest.py upstream --port 18081 --delay 0.05
+
+    # 2. 以桩上游启动应用：搜索延迟500ms，详情页延迟200ms
+    LOADTEST_UPSTREAM=http://127.0.0.1:18081 gunicorn -c gunicorn.conf.py -b 127.0.0.1:18080 'loadtest:stub_app()'
+    # 对照：旧的sync worker
+    LOADTEST_UPSTREAM=http://127.0.0.1:18081 gunicorn -k sync -w 4 -b 127.0.0.1:18080 'loadtest:stub_app()'
+
+    # 准入控制（ADMISSION_ENABLED）在gunicorn.conf.py之后加入，超出槽位的请求直接返回503；
+    # 比较worker配置时可在第2步加上 ADMISSION_ENABLED=false
+
+    # 3. 施加负载，{n}替换为递增序号（每个请求使用不同的关键词/视频，避免命中缓存）
+    python loadtest.py run --url http://127.0.0.1:18080 --users 32 --seconds 20 --path '/search?q=k{n}'
+    python loadtest.py run --url http://127.0.0.1:18080 --users 32 --seconds 20 --path '/video/v{n}?max_episodes=5'
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import itertools
+import threading
+import statistics
+from collections import Counter
+
+def stub_app():
+    """以桩上游创建应用（gunicorn应用工厂）
+
+    搜索固定延迟LOADTEST_SEARCH_DELAY秒返回空结果；详情页固定延迟LOADTEST_DETAIL_DELAY秒，
+    返回LOADTEST_EPISODES集，剧集页地址指向LOADTEST_UPSTREAM（由upstream子命令提供）。
+    """
+    # 配置在导入应用时读取：桩应用不写入正式数据目录，不受频率限制
+    data_dir = os.environ.get('LOADTEST_DATA_DIR') or tempfile.mkdtemp(prefix='loadtest-')
+    os.environ.setdefault('CATALOG_PATH', os.path.join(data_dir, 'catalog.db'))
+    os.environ.setdefault('PAGE_STORE_ENABLED', 'false')
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+
+    import app as app_module
+    import video
+    from models import Video, Episode
+
+    upstream = os.environ.get('LOADTEST_UPSTREAM', 'http://127.0.0.1:18081').rstrip('/')
+    search_delay = float(os.environ.get('LOADTEST_SEARCH_DELAY', 0.5))
+    detail_delay = float(os.environ.get('LOADTEST_DETAIL_DELAY', 0.2))
+    episode_count = int(os.environ.get('LOADTEST_EPISODES', 20))
+
+    def search_data(keyword, page=1, limit=None):
+        time.sleep(search_delay)
+        return {
+            'search_term': keyword, 'section_title': '', 'item_count': 0, 'items': [],
+            'page': page, 'limit': limit, 'has_more': False, 'upstream_pages': 1, 'partial': False
+        }
+
+    def fetch_video_page(video_url, previous_page=None):
+        time.sleep(detail_delay)
+        video_id = video_url.rsplit('/', 1)[1][:-len('.html')]
+        episodes = [
+            Episode.create(f"第{number}集", f"{upstream}/{video_id}/{number}", str(number))
+            for number in range(1, episode_count + 1)
+        ]
+        return Video.create(video_id, ['压测'], '', '', '', f"更新至{episode_count}集", '', '', episodes)
+
+    app_module.search_data = search_data
+    video._fetch_video_page_upstream = fetch_video_page
+    return app_module.create_app()
+
+def serve_upstream(port, delay):
+    """剧集页桩服务：每个地址返回包含playUrls的剧集页"""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            play_urls = json.dumps({'wwm3u8': f"https://cdn.example.com{self.path}.m3u8"})
+            body = (
+                '<section class="player-content"><script>'
+                f'var playUrls = {play_urls}'
+                '</script></section>'
+            ).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    print(f"剧集页桩服务: http://127.0.0.1:{port}/ （延迟{delay * 1000:.0f}ms）")
+    ThreadingHTTPServer(('127.0.0.1', port), Handler).serve_forever()
+
+def run_load(base_url, path, users, seconds):
+    """users个并发用户在seconds秒内连续请求，返回(成功数, 失败数{状态码: 次数}, 耗时, 排序的延迟列表)"""
+    import requests
+
+    counter = itertools.count()
+    latencies = []
+    errors = Counter()
+    lock = threading.Lock()
+    deadline = time.time() + seconds
+
+    def user():
+        session = requests.Session()
+        while time.time() < deadline:
+            url = base_url.rstrip('/') + path.format(n=next(counter))
+            started = time.perf_counter()
+            try:
+                status = session.get(url, timeout=30).status_code
+            except requests.exceptions.RequestException:
+                status = 'error'
+            elapsed = time.perf_counter() - started
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors[status] += 1
+
+    threads = [threading.Thread(target=user) for _ in range(users)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return len(latencies), errors, time.time() - started, latencies
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='用桩上游压测应用')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    upstream = subparsers.add_parser('upstream', help='启动剧集页桩服务')
+    upstream.add_argument('--port', type=int, default=18081, help='监听端口（默认18081）')
+    upstream.add_argument('--delay', type=float, default=0.05, help='每个请求的延迟秒数（默认0.05）')
+
+    run = subparsers.add_parser('run', help='施加负载并输出吞吐和延迟')
+    run.add_argument('--url', default='http://127.0.0.1:18080', help='应用地址（默认http://127.0.0.1:18080）')
+    run.add_argument('--path', default='/search?q=k{n}', help='请求路径，{n}替换为递增序号')
+    run.add_argument('--users', type=int, default=32, help='并发用户数（默认32）')
+    run.add_argument('--seconds', type=float, default=20, help='持续秒数（默认20）')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'upstream':
+        serve_upstream(args.port, args.delay)
+        return 0
+
+    ok, errors, elapsed, latencies = run_load(args.url, args.path, args.users, args.seconds)
+    # 准入控制拒绝的请求（503）很快返回，单独列出，不计入延迟
+    failed = ' '.join(f"{status}={count}" for status, count in sorted(errors.items(), key=str))
+    if not latencies:
+        print(f"users={args.users} 没有成功的请求（{failed}）")
+        return 1
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(
+        f"users={args.users} ok={ok} rps={ok / elapsed:.1f} "
+        f"p50={statistics.median(latencies) * 1000:.0f}ms p95={p95 * 1000:.0f}ms"
+        + (f" failed: {failed}" if failed else '')
+    )
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
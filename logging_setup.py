@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+日志配置模块
+请求线程只把日志记录放入内存队列，由后台线程格式化并写出（QueueHandler/QueueListener），
+同一代码位置的重复日志按时间窗口限流，省略的条数附在该位置下一条输出的日志上
+"""
+
+import os
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from config import get_config
+
+# 获取配置
+config = get_config()
+
+# LogRecord的标准属性，其余属性视为extra传入的结构化字段
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', logging.INFO, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行JSON，extra传入的字段原样保留"""
+
+    def format(self, record):
+        data = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """文本格式，被限流省略的条数附在消息末尾"""
+
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            text += f" [此前 {suppressed} 条相同位置的日志被省略]"
+        return text
+
+class RateLimitFilter(logging.Filter):
+    """同一代码位置（文件和行号）的日志每个时间窗口最多输出burst条
+
+    按代码位置而不是消息内容计数，f-string拼出的不同消息（如逐个剧集的缓存命中）也会被归为一类。
+    """
+
+    def __init__(self, burst, interval):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        now = record.created
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+class _LazyQueueHandler(QueueHandler):
+    """记录原样放入队列，消息由后台线程格式化
+
+    默认的prepare会在调用线程中格式化消息和异常；同一进程内传递记录不需要序列化，
+    参数对象由后台线程格式化（记录日志后不应再修改作为参数传入的对象）。
+    """
+
+    def prepare(self, record):
+        return record
+
+_listener = None
+_queue_handler = None
+_output_handler = None
+_lock = threading.Lock()
+
+def _start_listener():
+    global _listener
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(_queue_handler.queue, _output_handler, respect_handler_level=True)
+    _listener.start()
+
+def _restart_listener_after_fork():
+    """后台线程不会随fork复制：子进程使用新的队列和写出线程（父进程队列中未写出的记录由父进程负责）"""
+    if _listener is not None:
+        _start_listener()
+
+def setup_logging():
+    """配置根日志记录器，已有处理器时（如命令行工具已配置）不做修改"""
+    global _queue_handler, _output_handler
+    root = logging.getLogger()
+    with _lock:
+        if root.handlers:
+            return
+        root.setLevel(getattr(logging, config.LOG_LEVEL))
+
+        _output_handler = logging.StreamHandler()
+        _output_handler.setFormatter(JsonFormatter() if config.LOG_JSON else TextFormatter(config.LOG_FORMAT))
+
+        handler = _output_handler
+        if config.LOG_ASYNC:
+            _queue_handler = handler = _LazyQueueHandler(queue.SimpleQueue())
+            _start_listener()
+            os.register_at_fork(after_in_child=_restart_listener_after_fork)
+            atexit.register(stop_logging)
+
+        # 限流在调用线程中进行，被省略的日志不进入队列
+        if config.LOG_RATE_LIMIT_BURST > 0:
+            handler.addFilter(RateLimitFilter(config.LOG_RATE_LIMIT_BURST, config.LOG_RATE_LIMIT_INTERVAL))
+        root.addHandler(handler)
+
+def stop_logging():
+    """写出队列中剩余的日志并停止后台线程"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
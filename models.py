@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据模型模块
+视频、剧集和搜索结果的不可变紧凑模型（NamedTuple，无实例字典），
+重复度高的字符串字段做驻留，缓存中的对象可以安全共享
+"""
+
+import sys
+from typing import NamedTuple, Optional, Tuple
+
+def _intern(value):
+    """驻留重复度高的短字符串（集数、标签、状态等）"""
+    return sys.intern(value) if value else ''
+
+class Episode(NamedTuple):
+    """单个剧集"""
+    title: str
+    url: str
+    number: str
+    play_url: Optional[str] = None
+
+    @classmethod
+    def create(cls, title, url, number, play_url=None):
+        return cls(_intern(title), url, _intern(number), play_url)
+
+    def with_play_url(self, play_url):
+        """返回带播放地址的新剧集对象"""
+        return self._replace(play_url=play_url)
+
+    def to_dict(self):
+        return {
+            'title': self.title,
+            'url': self.url,
+            'number': self.number,
+            'play_url': self.play_url
+        }
+
+class Video(NamedTuple):
+    """视频详情及其一段剧集窗口（缓存中保存完整剧集列表）"""
+    title: str
+    tags: Tuple[str, ...]
+    update_datetime: str
+    formatted_date: str
+    update_text: str
+    status_info: str
+    release_date: str
+    m3u8_url: str
+    episodes: Tuple[Episode, ...]
+    episode_count: int
+    next_offset: Optional[int] = None
+
+    @classmethod
+    def create(cls, title, tags, update_datetime, formatted_date, update_text,
+               status_info, release_date, m3u8_url, episodes):
+        episodes = tuple(episodes)
+        return cls(
+            _intern(title),
+            tuple(_intern(tag) for tag in tags),
+            _intern(update_datetime),
+            _intern(formatted_date),
+            update_text,
+            _intern(status_info),
+            _intern(release_date),
+            m3u8_url,
+            episodes,
+            len(episodes)
+        )
+
+    def to_dict(self):
+        return {
+            'video_title': self.title,
+            'tags': list(self.tags),
+            'update_datetime': self.update_datetime,
+            'formatted_date': self.formatted_date,
+            'update_text': self.update_text,
+            'status_info': self.status_info,
+            'release_date': self.release_date,
+            'episodes': [episode.to_dict() for episode in self.episodes],
+            'episode_count': self.episode_count,
+            'next_offset': self.next_offset,
+            'm3u8_url': self.m3u8_url
+        }
+
+class SearchItem(NamedTuple):
+    """搜索结果条目"""
+    title: str
+    play_link: str
+    video_id: str
+    image_url: str
+    episodes: str
+    genres: str
+    episode_count: int = 0
+
+    @classmethod
+    def create(cls, title, play_link, video_id, image_url, episodes, genres, episode_count=0):
+        return cls(
+            _intern(title),
+            play_link,
+            _intern(video_id),
+            image_url,
+            _intern(episodes),
+            _intern(genres),
+            episode_count
+        )
+
+    def merged(self, other):
+        """用other中的非空字段覆盖当前条目，返回新对象"""
+        return self._replace(**{
+            field: value for field, value in zip(other._fields, other) if value
+        })
+
+    def to_dict(self):
+        return {
+            'title': self.title,
+            'play_link': self.play_link,
+            'video_id': self.video_id,
+            'image_url': self.image_url,
+            'episodes': self.episodes,
+            'genres': self.genres,
+            'episode_count': self.episode_count
+        }
+
+def search_results_to_dict(results):
+    """将包含SearchItem的搜索结果转换为可序列化的字典"""
+    return dict(results, items=[item.to_dict() for item in results['items']])
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+上游页面存储模块
+使用SQLite保存压缩后的视频详情页原始HTML及其ETag、Last-Modified和内容哈希（所有worker共享），
+刷新时向上游发送条件请求：返回304，或返回的页面与上次逐字节相同时，不再重新解析
+"""
+
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import Counter, namedtuple
+from config import get_config
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# Python 3.14起标准库自带zstd，更早的版本使用zlib
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    digest TEXT NOT NULL,
+    encoding TEXT,
+    parser INTEGER NOT NULL,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    body BLOB NOT NULL,
+    fetched_at REAL NOT NULL,
+    checked_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pages_checked ON pages (checked_at);
+"""
+
+# 每写入这么多页面检查一次是否超出数量上限
+_PRUNE_EVERY = 64
+
+StoredPage = namedtuple('StoredPage', ['etag', 'last_modified', 'digest', 'encoding', 'parser', 'codec', 'size', 'body'])
+
+def page_digest(body):
+    """页面内容哈希（上游不支持条件请求时用来判断页面是否变化）"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def _compress(body):
+    if zstd is not None:
+        return 'zstd', zstd.compress(body)
+    return 'zlib', zlib.compress(body, config.PAGE_STORE_COMPRESS_LEVEL)
+
+def _decompress(codec, data):
+    if codec == 'zstd':
+        return zstd.decompress(data)
+    return zlib.decompress(data)
+
+class PageStore:
+    """SQLite页面存储，每个线程使用独立连接
+
+    同时在进程内统计条件请求的结果：304、内容未变化、已变化，以及省下的解析次数和传输字节数。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._counters = Counter()
+        self._counters_lock = threading.Lock()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def reset_connections(self):
+        """丢弃已有连接（fork后子进程不能沿用父进程的SQLite连接）"""
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, url):
+        """读取已保存的页面，不存在或编码不可用时返回None"""
+        row = self._connect().execute(
+            "SELECT etag, last_modified, digest, encoding, parser, codec, size, body FROM pages WHERE url = ?",
+            (url,)
+        ).fetchone()
+        if row is None or (row[5] == 'zstd' and zstd is None):
+            return None
+        return StoredPage(*row)
+
+    @staticmethod
+    def conditional_headers(stored):
+        """根据已保存的页面生成条件请求头"""
+        headers = {}
+        if stored is not None:
+            if stored.etag:
+                headers['If-None-Match'] = stored.etag
+            if stored.last_modified:
+                headers['If-Modified-Since'] = stored.last_modified
+        return headers
+
+    @staticmethod
+    def text(stored):
+        """解压并解码已保存的页面"""
+        return _decompress(stored.codec, stored.body).decode(stored.encoding or 'utf-8', errors='replace')
+
+    def put(self, url, body, encoding, etag, last_modified, digest, parser):
+        """保存页面原始内容（压缩后）及其校验信息"""
+        codec, data = _compress(body)
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO pages
+                    (url, etag, last_modified, digest, encoding, parser, codec, size, body, fetched_at, checked_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (url, etag, last_modified, digest, encoding, parser, codec, len(body), data, now, now)
+            )
+        self._writes += 1
+        if self._writes % _PRUNE_EVERY == 0:
+            self._prune(conn)
+
+    def touch(self, url, etag=None, last_modified=None):
+        """页面未变化：更新检查时间，上游给出新的校验信息时一并更新"""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                """
+                UPDATE pages SET checked_at = ?,
+                    etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)
+                WHERE url = ?
+                """,
+                (time.time(), etag, last_modified, url)
+            )
+
+    def discard(self, url):
+        """删除一个页面，下次刷新时无条件请求并重新解析"""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+
+    def _prune(self, conn):
+        """只保留最近检查过的PAGE_STORE_MAX_PAGES个页面"""
+        with conn:
+            deleted = conn.execute(
+                """
+                DELETE FROM pages WHERE url IN (
+                    SELECT url FROM pages ORDER BY checked_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (config.PAGE_STORE_MAX_PAGES,)
+            ).rowcount
+        if deleted:
+            logger.info("页面存储超出上限，删除了 %s 个最久未检查的页面", deleted)
+
+    def count(self, **increments):
+        """累加进程内统计"""
+        with self._counters_lock:
+            self._counters.update(increments)
+
+    def clear(self):
+        """清空存储"""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM pages")
+
+    def stats(self):
+        """获取存储和条件请求统计信息（条件请求统计只包含当前worker）"""
+        pages, raw_bytes, stored_bytes = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(body)), 0) FROM pages"
+        ).fetchone()
+        with self._counters_lock:
+            counters = dict(self._counters)
+        requests = counters.get('requests', 0)
+        reused = counters.get('not_modified', 0) + counters.get('unchanged', 0)
+        return {
+            'pages': pages,
+            'raw_bytes': raw_bytes,
+            'stored_bytes': stored_bytes,
+            'compression_ratio': round(stored_bytes / raw_bytes, 3) if raw_bytes else None,
+            'codec': 'zstd' if zstd is not None else 'zlib',
+            'requests': requests,
+            'not_modified': counters.get('not_modified', 0),
+            'unchanged': counters.get('unchanged', 0),
+            'changed': counters.get('changed', 0),
+            'parses': counters.get('parses', 0),
+            'parses_skipped': counters.get('parses_skipped', 0),
+            'bytes_transferred': counters.get('bytes_transferred', 0),
+            'bytes_saved': counters.get('bytes_saved', 0),
+            'reuse_rate': round(reused / requests, 3) if requests else 0,
+            'path': self.path
+        }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_page_store():
+    """获取全局页面存储实例，未启用时返回None"""
+    global _store
+    if not config.PAGE_STORE_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PageStore(config.PAGE_STORE_PATH)
+    return _store
+
+def _reset_after_fork():
+    if _store is not None:
+        _store.reset_connections()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
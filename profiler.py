@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+采样性能分析模块
+按固定间隔读取当前worker所有线程的调用栈（sys._current_frames），汇总为折叠栈或speedscope格式，
+用于生成火焰图。只在分析期间由发起请求的线程采样，空闲时不做任何工作
+"""
+
+import os
+import sys
+import time
+import json
+import logging
+import threading
+from collections import Counter
+from config import get_config
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 栈顶为这些函数的线程视为在等待（锁、队列、select、网络读取），默认不计入样本
+_IDLE_FUNCTIONS = frozenset({
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('selectors.py', 'select'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+    ('handlers.py', 'dequeue'),
+    ('socket.py', 'accept'),
+    ('socket.py', 'readinto'),
+    ('ssl.py', 'read'),
+    ('ssl.py', 'recv_into'),
+})
+
+class ProfilerBusy(Exception):
+    """当前worker已有分析在进行"""
+
+class _Session:
+    """一次分析的采样结果"""
+
+    def __init__(self, interval, include_idle, slow_seconds):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.slow_seconds = slow_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self.requests = 0
+        self.slow_requests = 0
+        self.lock = threading.Lock()
+        # 慢请求模式：线程标识 -> (请求名, 开始时间, 该请求期间的栈计数)
+        self.active_requests = {}
+
+class SamplingProfiler:
+    """基于线程的统计采样分析器
+
+    分析在发起请求的线程中进行：每隔interval读取一次其他线程的栈，按函数聚合（不区分行号，
+    同一函数在火焰图中合并为一个节点）。指定slow_ms时只保留耗时超过阈值的请求期间的样本，
+    并以请求的方法和接口名作为栈底。
+    """
+
+    def __init__(self):
+        self._session = None
+        self._lock = threading.Lock()
+        self._labels = {}
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, 'co_qualname', code.co_name)
+            filename = code.co_filename
+            # 标准库和第三方库只保留包内路径，项目文件只保留文件名
+            for marker in ('site-packages' + os.sep, 'dist-packages' + os.sep):
+                if marker in filename:
+                    filename = filename.split(marker, 1)[1]
+                    break
+            else:
+                filename = os.path.basename(filename)
+            label = self._labels[code] = f"{name} ({filename}:{code.co_firstlineno})".replace(';', ',')
+        return label
+
+    def _stack(self, frame):
+        """栈底在前的函数标签元组，线程在等待时返回None"""
+        code = frame.f_code
+        if not self._session.include_idle and (os.path.basename(code.co_filename), code.co_name) in _IDLE_FUNCTIONS:
+            return None
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return tuple(labels)
+
+    def profile(self, seconds, interval=None, include_idle=False, slow_ms=None):
+        """在当前线程中采样seconds秒，返回分析结果；已有分析在进行时抛出ProfilerBusy"""
+        interval = interval or config.PROFILE_INTERVAL
+        session = _Session(interval, include_idle, slow_ms / 1000 if slow_ms is not None else None)
+        with self._lock:
+            if self._session is not None:
+                raise ProfilerBusy()
+            self._session = session
+
+        me = threading.get_ident()
+        started = time.perf_counter()
+        deadline = started + seconds
+        try:
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                frames = sys._current_frames()
+                with session.lock:
+                    for ident, frame in frames.items():
+                        if ident == me:
+                            continue
+                        if session.slow_seconds is not None:
+                            active = session.active_requests.get(ident)
+                            if active is None:
+                                continue
+                            stacks = active[2]
+                        else:
+                            stacks = session.stacks
+                        stack = self._stack(frame)
+                        if stack is not None:
+                            stacks[stack] += 1
+                    session.samples += 1
+                del frames
+                time.sleep(max(0.0, interval - (time.perf_counter() - now)))
+        finally:
+            with self._lock:
+                self._session = None
+
+        return {
+            'pid': os.getpid(),
+            'duration': time.perf_counter() - started,
+            'interval': interval,
+            'samples': session.samples,
+            'requests': session.requests,
+            'slow_requests': session.slow_requests,
+            'stacks': session.stacks
+        }
+
+    def request_started(self, name):
+        """慢请求模式下标记当前线程开始处理请求（未在分析时只有一次属性判断）"""
+        session = self._session
+        if session is None or session.slow_seconds is None:
+            return
+        with session.lock:
+            session.active_requests[threading.get_ident()] = (name, time.perf_counter(), Counter())
+
+    def request_finished(self):
+        """请求结束，耗时超过阈值时将该请求期间的样本并入结果"""
+        session = self._session
+        if session is None or session.slow_seconds is None:
+            return
+        with session.lock:
+            active = session.active_requests.pop(threading.get_ident(), None)
+            if active is None:
+                return
+            name, started, stacks = active
+            session.requests += 1
+            if time.perf_counter() - started < session.slow_seconds:
+                return
+            session.slow_requests += 1
+            for stack, count in stacks.items():
+                session.stacks[(name,) + stack] += count
+
+def to_collapsed(result):
+    """折叠栈格式（flamegraph.pl / speedscope / inferno可直接读取），每行"栈;帧 计数"，按计数降序"""
+    return ''.join(
+        f"{';'.join(stack)} {count}\n"
+        for stack, count in result['stacks'].most_common()
+    )
+
+def to_speedscope(result, name):
+    """speedscope的sampled格式，相同的栈合并为一个样本，权重为采样次数乘以间隔（秒）"""
+    frame_index = {}
+    frames = []
+    samples = []
+    weights = []
+    for stack, count in result['stacks'].most_common():
+        indices = []
+        for label in stack:
+            index = frame_index.get(label)
+            if index is None:
+                index = frame_index[label] = len(frames)
+                frames.append({'name': label})
+            indices.append(index)
+        samples.append(indices)
+        weights.append(round(count * result['interval'], 6))
+    total = round(sum(weights), 6)
+    return json.dumps({
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'duanju-profiler',
+        'activeProfileIndex': 0,
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': total,
+            'samples': samples,
+            'weights': weights
+        }]
+    }, ensure_ascii=False)
+
+profiler = SamplingProfiler()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+代理安全检查模块
+m3u8播放列表代理和封面代理按token中的地址请求上游：token用SECRET_KEY签名，
+SECRET_KEY未设置或为公开的默认值时拒绝启用代理；请求只发往允许的域名，重定向逐跳检查
+"""
+
+import logging
+from urllib.parse import urljoin, urlsplit
+from config import get_config
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 代码中出现过的默认密钥，任何人都可以用它们签发token
+_DEFAULT_SECRET_KEYS = frozenset((
+    'dev-secret-key-change-in-production',
+    'production-secret-key-change-me'
+))
+
+_REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+_MAX_REDIRECTS = 5
+
+class DisallowedHost(Exception):
+    """请求（或重定向）的目标不在允许的域名中"""
+
+def secret_key_configured():
+    """SECRET_KEY已设置且不是默认值"""
+    return bool(config.SECRET_KEY) and config.SECRET_KEY not in _DEFAULT_SECRET_KEYS
+
+def proxy_enabled(name, enabled, allowed_hosts):
+    """代理是否可以启用：已开启、SECRET_KEY已设置、配置了允许的域名，否则记录原因并拒绝启用"""
+    if not enabled:
+        return False
+    if not secret_key_configured():
+        logger.error(f"{name}已开启，但SECRET_KEY未设置或为默认值（可被任何人用来签发token），代理不启用")
+        return False
+    if not allowed_hosts:
+        logger.error(f"{name}已开启，但没有配置允许请求的域名，代理不启用")
+        return False
+    return True
+
+def host_allowed(url, allowed_hosts):
+    """地址是否为http(s)且域名是允许的域名或其子域名"""
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or '').lower()
+    except ValueError:
+        return False
+    if parts.scheme not in ('http', 'https') or not host:
+        return False
+    return any(host == allowed or host.endswith('.' + allowed) for allowed in allowed_hosts)
+
+def get_allowed(url, allowed_hosts, **kwargs):
+    """requests.get，只请求允许的域名
+
+    不由requests自动跟随重定向，每一跳都检查目标域名，不允许时抛出DisallowedHost；
+    返回的响应的url为最终地址。
+    """
+    import requests
+
+    for _ in range(_MAX_REDIRECTS + 1):
+        if not host_allowed(url, allowed_hosts):
+            raise DisallowedHost(url)
+        response = requests.get(url, allow_redirects=False, **kwargs)
+        location = response.headers.get('Location')
+        if response.status_code not in _REDIRECT_STATUSES or not location:
+            return response
+        response.close()
+        url = urljoin(url, location)
+    raise requests.exceptions.TooManyRedirects(url)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+请求记录模块
+按采样率把请求轨迹（接口、参数、耗时、状态码、缓存结果）写入按小时轮转的JSONL文件，
+供replay.py按真实的访问分布回放压测。不记录IP、User-Agent和Cookie，客户端只保留按天轮换的匿名标识
+"""
+
+import os
+import glob
+import hmac
+import json
+import time
+import queue
+import random
+import hashlib
+import logging
+import threading
+from config import get_config
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# POST请求体超过该长度时不记录
+_MAX_BODY_LENGTH = 2048
+
+class RequestRecorder:
+    """采样请求记录器
+
+    请求线程只把记录放入队列，由后台线程批量写入当前小时的文件；多个worker进程以追加方式写同一文件，
+    每批记录一次write调用，按小时切换文件名实现轮转，无需进程间协调。
+    """
+
+    def __init__(self, directory, sample_rate, max_files=48, max_queue=10000):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self.max_queue = max_queue
+        self.recorded = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writer_pid = None
+        self._writer_lock = threading.Lock()
+
+    def sampled(self):
+        """本次请求是否需要记录"""
+        return random.random() < self.sample_rate
+
+    @staticmethod
+    def client_id(remote_addr):
+        """客户端匿名标识：按天轮换的HMAC，可以区分同一天内的会话但无法还原IP"""
+        day = time.strftime('%Y%m%d', time.gmtime())
+        digest = hmac.new(config.SECRET_KEY.encode('utf-8'), f"{day}:{remote_addr}".encode('utf-8'), hashlib.sha256)
+        return digest.hexdigest()[:12]
+
+    def record(self, trace):
+        """放入写入队列，队列已满时丢弃（不阻塞请求线程）"""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(trace)
+            self.recorded += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self):
+        """写入线程不会随fork复制，每个进程首次记录时启动自己的写入线程"""
+        pid = os.getpid()
+        if self._writer_pid == pid:
+            return
+        with self._writer_lock:
+            if self._writer_pid == pid:
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            threading.Thread(target=self._write_loop, name='request-recorder', daemon=True).start()
+            self._writer_pid = pid
+
+    def _path(self, now):
+        return os.path.join(self.directory, time.strftime('requests-%Y%m%d-%H.jsonl', time.localtime(now)))
+
+    def _write_loop(self):
+        os.makedirs(self.directory, exist_ok=True)
+        current_path = None
+        while True:
+            traces = [self._queue.get()]
+            while len(traces) < 500:
+                try:
+                    traces.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            path = self._path(traces[0]['t'])
+            if path != current_path:
+                current_path = path
+                self._remove_old_files()
+
+            data = ''.join(json.dumps(trace, ensure_ascii=False, separators=(',', ':')) + '\n' for trace in traces)
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, data.encode('utf-8'))
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                logger.error(f"写入请求记录失败 {path}: {e}")
+
+    def _remove_old_files(self):
+        """只保留最近max_files个小时的记录文件"""
+        files = sorted(glob.glob(os.path.join(self.directory, 'requests-*.jsonl')))
+        for path in files[:-self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        return {
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'queued': self._queue.qsize(),
+            'sample_rate': self.sample_rate,
+            'directory': self.directory
+        }
+
+def build_trace(request, response, started_at, duration):
+    """由请求和响应构建一条记录
+
+    字段：t 开始时间，m 方法，e 接口名，p 路径，q 查询参数，j JSON请求体，s 状态码，
+    d 耗时毫秒，c 缓存结果（X-Cache），b 响应字节数，u 客户端匿名标识
+    """
+    trace = {
+        't': round(started_at, 3),
+        'm': request.method,
+        'e': request.endpoint,
+        'p': request.path,
+        's': response.status_code,
+        'd': round(duration * 1000, 1),
+        'u': RequestRecorder.client_id(request.remote_addr)
+    }
+    if request.args:
+        trace['q'] = request.args.to_dict()
+    if request.method == 'POST' and request.content_length and request.content_length <= _MAX_BODY_LENGTH:
+        body = request.get_json(silent=True)
+        if body is not None:
+            trace['j'] = body
+    cache_status = response.headers.get('X-Cache')
+    if cache_status:
+        trace['c'] = cache_status
+    if response.content_length is not None:
+        trace['b'] = response.content_length
+    return trace
+
+request_recorder = RequestRecorder(
+    config.RECORD_DIR,
+    config.RECORD_SAMPLE_RATE,
+    max_files=config.RECORD_MAX_FILES
+)
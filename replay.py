@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+请求回放命令行工具
+按原始时间间隔（可加速）把recorder.py记录的请求轨迹回放到本地实例，
+输出各接口的延迟分布和缓存命中率，并与记录时的数据对比，用于比较缓存策略和并发配置
+
+用法:
+    python replay.py logs/requests --base-url http://127.0.0.1:3366 --speed 1
+    python replay.py logs/requests/requests-20261019-*.jsonl --speed 10 --concurrency 64 --json report.json
+
+被回放的实例应设置 RATE_LIMIT_ENABLED=false，否则所有请求都来自同一IP，会被频率限制拦截。
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+def load_traces(paths, endpoints=None, limit=None):
+    """读取记录文件（目录按文件名读取其中全部记录），按开始时间排序"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, 'requests-*.jsonl'))))
+        else:
+            files.append(path)
+
+    traces = []
+    for path in files:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    trace = json.loads(line)
+                except ValueError:
+                    # 写入中的文件可能留下不完整的最后一行
+                    continue
+                if endpoints and trace.get('e') not in endpoints:
+                    continue
+                traces.append(trace)
+
+    traces.sort(key=lambda trace: trace['t'])
+    return traces[:limit] if limit else traces
+
+def percentile(values, p):
+    """已排序列表的百分位数"""
+    if not values:
+        return 0
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+def hit_rate(cache_statuses):
+    """X-Cache为HIT的比例，没有缓存结果时返回None"""
+    counts = Counter(status for status in cache_statuses if status)
+    total = counts['HIT'] + counts['MISS']
+    return counts['HIT'] / total if total else None
+
+class Replayer:
+    """按记录的时间间隔发出请求
+
+    主线程按计划时间依次提交请求，同时进行的请求数不超过concurrency；
+    并发已满时请求推迟发出，推迟的时间记为调度延迟（说明实例跟不上记录时的流量）。
+    """
+
+    def __init__(self, base_url, speed=1.0, concurrency=32, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.speed = speed
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.results = []
+        self.started = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._local = threading.local()
+
+    def _session(self):
+        # requests导入较慢，首次发出请求时才导入
+        import requests
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _send(self, trace, lag):
+        url = self.base_url + trace['p']
+        started = time.perf_counter()
+        status, cache_status, error = None, None, None
+        try:
+            if trace.get('m') == 'POST':
+                response = self._session().post(url, params=trace.get('q'), json=trace.get('j'), timeout=self.timeout)
+            else:
+                response = self._session().get(url, params=trace.get('q'), timeout=self.timeout)
+            # 读取完整响应体后再计时
+            response.content
+            status = response.status_code
+            cache_status = response.headers.get('X-Cache')
+        except Exception as e:
+            error = type(e).__name__
+        latency = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            self.results.append({
+                'endpoint': trace.get('e'),
+                'status': status,
+                'latency': latency,
+                'cache': cache_status,
+                'lag': lag * 1000,
+                'error': error
+            })
+
+    def run(self, traces):
+        """回放全部请求，返回实际耗时（秒）"""
+        if not traces:
+            return 0.0
+
+        first_time = traces[0]['t']
+        started = self.started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='replay') as pool:
+            for trace in traces:
+                due = (trace['t'] - first_time) / self.speed if self.speed > 0 else 0
+                delay = due - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+                self._slots.acquire()
+                lag = max(0.0, time.perf_counter() - started - due)
+                future = pool.submit(self._send, trace, lag)
+                future.add_done_callback(lambda _: self._slots.release())
+        return time.perf_counter() - started
+
+    def completed(self):
+        """已完成请求的结果和已用时间（中断时用于输出部分统计）"""
+        with self._lock:
+            results = list(self.results)
+        return results, time.perf_counter() - self.started if self.started else 0.0
+
+def build_report(traces, results, elapsed):
+    """汇总回放结果，并按接口与记录时的延迟和命中率对比"""
+    recorded = defaultdict(list)
+    for trace in traces:
+        recorded[trace.get('e')].append(trace)
+    replayed = defaultdict(list)
+    for result in results:
+        replayed[result['endpoint']].append(result)
+
+    endpoints = {}
+    for endpoint, items in sorted(replayed.items(), key=lambda item: -len(item[1])):
+        latencies = sorted(item['latency'] for item in items)
+        recorded_latencies = sorted(trace['d'] for trace in recorded[endpoint] if 'd' in trace)
+        endpoints[endpoint] = {
+            'requests': len(items),
+            'errors': sum(1 for item in items if item['error'] or (item['status'] or 0) >= 500),
+            'p50': round(percentile(latencies, 50), 1),
+            'p90': round(percentile(latencies, 90), 1),
+            'p99': round(percentile(latencies, 99), 1),
+            'max': round(latencies[-1], 1),
+            'hit_rate': hit_rate(item['cache'] for item in items),
+            'recorded_p50': round(percentile(recorded_latencies, 50), 1),
+            'recorded_p99': round(percentile(recorded_latencies, 99), 1),
+            'recorded_hit_rate': hit_rate(trace.get('c') for trace in recorded[endpoint])
+        }
+
+    lags = sorted(result['lag'] for result in results)
+    return {
+        'requests': len(results),
+        'elapsed': round(elapsed, 2),
+        'throughput': round(len(results) / elapsed, 1) if elapsed else 0,
+        'recorded_span': round(traces[-1]['t'] - traces[0]['t'], 2) if traces else 0,
+        'statuses': dict(Counter(str(result['status'] or result['error']) for result in results)),
+        'hit_rate': hit_rate(result['cache'] for result in results),
+        'recorded_hit_rate': hit_rate(trace.get('c') for trace in traces),
+        'lag_p99': round(percentile(lags, 99), 1),
+        'endpoints': endpoints
+    }
+
+def _format_rate(rate):
+    return '-' if rate is None else f"{rate:.1%}"
+
+def print_report(report):
+    print(f"请求 {report['requests']}，耗时 {report['elapsed']}秒（记录跨度 {report['recorded_span']}秒），"
+          f"吞吐 {report['throughput']} 请求/秒，调度延迟p99 {report['lag_p99']}ms")
+    print(f"状态码 {report['statuses']}")
+    print(f"缓存命中率 {_format_rate(report['hit_rate'])}（记录时 {_format_rate(report['recorded_hit_rate'])}）")
+    print()
+    print(f"{'接口':<32}{'请求':>7}{'错误':>6}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'命中率':>8}"
+          f"{'记录p50':>10}{'记录p99':>10}{'记录命中率':>10}")
+    for endpoint, stats in report['endpoints'].items():
+        print(f"{str(endpoint):<32}{stats['requests']:>7}{stats['errors']:>6}"
+              f"{stats['p50']:>9}{stats['p90']:>9}{stats['p99']:>9}{stats['max']:>9}"
+              f"{_format_rate(stats['hit_rate']):>8}{stats['recorded_p50']:>10}{stats['recorded_p99']:>10}"
+              f"{_format_rate(stats['recorded_hit_rate']):>10}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='回放记录的请求并统计延迟分布和缓存命中率')
+    parser.add_argument('paths', nargs='+', help='记录文件或目录（目录下的requests-*.jsonl）')
+    parser.add_argument('--base-url', default='http://127.0.0.1:3366', help='被回放的实例地址')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='回放速度倍数，0表示不等待、只受并发数限制（默认1）')
+    parser.add_argument('--concurrency', type=int, default=32, help='同时进行的最大请求数（默认32）')
+    parser.add_argument('--timeout', type=float, default=30, help='单个请求超时秒数（默认30）')
+    parser.add_argument('--endpoints', nargs='*', help='只回放这些接口（如 main.search main.get_video_data）')
+    parser.add_argument('--limit', type=int, help='最多回放的请求数')
+    parser.add_argument('--json', help='将统计结果写入JSON文件')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    traces = load_traces(args.paths, endpoints=set(args.endpoints or ()), limit=args.limit)
+    if not traces:
+        print('没有可回放的请求记录', file=sys.stderr)
+        return 2
+
+    replayer = Replayer(args.base_url, speed=args.speed, concurrency=args.concurrency, timeout=args.timeout)
+    try:
+        replayer.run(traces)
+    except KeyboardInterrupt:
+        print('\n[中断] 输出已完成请求的统计', file=sys.stderr)
+
+    results, elapsed = replayer.completed()
+    if not results:
+        return 1
+    report = build_report(traces, results, elapsed)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
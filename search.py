@@ -1,87 +1,312 @@
-import requests
-from bs4 import BeautifulSoup
-
-def search_data(keyword):
-    # 使用前端已编码的关键词，不再进行二次编码
-    url = f"https://djw1.com/search/{keyword}/"
-    
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36'
-    }
-    
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+搜索模块
+抓取上游搜索结果页，识别分页后在当前线程的异步会话上并发获取后续页，按video_id合并去重，
+每个上游页单独缓存
+"""
+
+import re
+import logging
+from collections import namedtuple
+from urllib.parse import quote, urljoin
+from config import get_config
+from models import SearchItem
+from cache import TimedCache
+from generations import generations
+from video import get_session, run_async
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 从播放链接中提取视频ID，例如从 /play/12345.html 提取 12345
+_VIDEO_ID_PATTERN = re.compile(r'/play/([^/]+)\.html')
+_NUMBER_PATTERN = re.compile(r'\d+')
+# 分页容器的class（pagination、pager、page-nav等）
+_PAGER_CLASS_PATTERN = re.compile(r'pag')
+
+_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36'
+}
+
+# 一个上游结果页：标题、条目、分页显示的总页数、分页中各页的地址
+SearchPage = namedtuple('SearchPage', ['title', 'items', 'pages', 'page_urls'])
+
+# 上游结果页缓存（键为"关键词:页码"），随搜索结果一起失效
+_page_cache = TimedCache(
+    default_timeout=config.CACHE_TIMEOUT,
+    max_size=config.CACHE_MAX_SIZE,
+    generation=lambda key: generations.current('search')
+)
+
+# 从分页链接学到的地址格式和每页条数（全站相同），用于在第一页返回前同时请求后续页
+_page_url_template = None
+_page_size = None
+
+def search_url(keyword):
+    """第一页的地址（使用前端已编码的关键词，不再进行二次编码）"""
+    return f"https://djw1.com/search/{keyword}/"
+
+def parse_search_page(html, keyword, base_url):
+    """解析搜索结果页，返回SearchPage"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    container = soup.find('section', class_='container items')
+
+    if not container:
+        # 返回空结果
+        return SearchPage(f"搜索: {keyword}", (), 1, {})
+
+    # 提取标题
+    title_tag = container.find('h1', class_='items-title')
+    title = title_tag.get_text(strip=True) if title_tag else ""
+
+    # 提取列表项
+    items = []
+    for item in container.find_all('li', class_='item'):
+        # 提取播放链接
+        play_link_tag = item.find('a', class_='image-line')
+        play_link = play_link_tag['href'] if play_link_tag and play_link_tag.has_attr('href') else ""
+
+        # 提取图片链接
+        img_tag = item.find('img', class_='thumb')
+        img_src = img_tag['src'] if img_tag and img_tag.has_attr('src') else ""
+
+        # 提取备注
+        remarks_tag = item.find('span', class_='remarks light')
+        remarks = remarks_tag.get_text(strip=True) if remarks_tag else ""
+
+        # 提取标签
+        tags_tag = item.find('span', class_='tags')
+        tags = tags_tag.get_text(strip=True) if tags_tag else ""
+
+        # 提取副标题
+        subtitle_tag = item.find('h3')
+        subtitle = subtitle_tag.get_text(strip=True) if subtitle_tag else ""
+
+        # 从play_link中提取video_id
+        video_id = ""
+        if play_link:
+            match = _VIDEO_ID_PATTERN.search(play_link)
+            if match:
+                video_id = match.group(1)
+
+        items.append(SearchItem.create(
+            title=subtitle,
+            play_link=play_link,
+            video_id=video_id,
+            image_url=img_src,
+            episodes=remarks,
+            genres=tags.strip()
+        ))
+
+    pages, page_urls = _parse_pager(container, keyword, base_url)
+    return SearchPage(title, tuple(items), pages, page_urls)
+
+def _parse_pager(container, keyword, base_url):
+    """识别分页，返回(总页数, {页码: 地址})
+
+    页码取自链接文字，"下一页"、"末页"等没有数字的链接取地址中最后一个数字（去掉关键词后）。
+    """
+    pager = container.find(class_=_PAGER_CLASS_PATTERN)
+    if pager is None:
+        return 1, {}
+
+    keyword_forms = {keyword, quote(keyword)}
+    page_urls = {}
+    for link in pager.find_all('a', href=True):
+        href = link['href'].strip()
+        if not href or href.startswith(('#', 'javascript:')):
+            continue
+        text = link.get_text(strip=True)
+        if text.isdigit():
+            number = int(text)
+        else:
+            stripped = href
+            for form in keyword_forms:
+                stripped = stripped.replace(form, '')
+            numbers = _NUMBER_PATTERN.findall(stripped)
+            if not numbers:
+                continue
+            number = int(numbers[-1])
+        page_urls.setdefault(number, urljoin(base_url, href))
+
+    return max(page_urls, default=1), page_urls
+
+def _page_url(page_urls, page):
+    """第page页的地址：分页中有链接时直接使用，否则按其他页的链接替换页码"""
+    url = page_urls.get(page)
+    if url:
+        return url
+    for known, known_url in page_urls.items():
+        if known < 2:
+            continue
+        matches = [match for match in _NUMBER_PATTERN.finditer(known_url) if int(match.group()) == known]
+        if matches:
+            match = matches[-1]
+            return known_url[:match.start()] + str(page) + known_url[match.end():]
+    return None
+
+def _learn_page_url_template(keyword, first_page):
+    """从分页链接学习"关键词+页码"的地址格式，关键词不在地址中时不学习"""
+    global _page_url_template, _page_size
+    if first_page.pages < 2 or not first_page.items:
+        return
+    url = _page_url(first_page.page_urls, 2)
+    encoded = quote(keyword)
+    if not url or encoded not in url:
+        return
+    template = url.replace('{', '{{').replace('}', '}}')
+    template = template.replace(encoded, '{keyword}', 1)
+    matches = [match for match in _NUMBER_PATTERN.finditer(template) if match.group() == '2']
+    if not matches:
+        return
+    match = matches[-1]
+    _page_url_template = template[:match.start()] + '{page}' + template[match.end():]
+    _page_size = len(first_page.items)
+
+async def _fetch_page(session, keyword, page, url, cache=True):
+    """获取并解析一个上游结果页（缓存优先），失败时返回None"""
+    import aiohttp
+
+    cache_key = f"{keyword}:{page}"
+    cached = _page_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        # 发送HTTP请求
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        # 解析HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        container = soup.find('section', class_='container items')
-        
-        if not container:
-            # 返回空结果
-            return {
-                'search_term': keyword,
-                'section_title': f"搜索: {keyword}",
-                'item_count': 0,
-                'items': []
-            }
-        
-        # 提取标题
-        title_tag = container.find('h1', class_='items-title')
-        title = title_tag.get_text(strip=True) if title_tag else ""
-        
-        # 提取列表项
-        items = []
-        for item in container.find_all('li', class_='item'):
-            # 提取播放链接
-            play_link_tag = item.find('a', class_='image-line')
-            play_link = play_link_tag['href'] if play_link_tag and play_link_tag.has_attr('href') else ""
-            
-            # 提取图片链接
-            img_tag = item.find('img', class_='thumb')
-            img_src = img_tag['src'] if img_tag and img_tag.has_attr('src') else ""
-            
-            # 提取备注
-            remarks_tag = item.find('span', class_='remarks light')
-            remarks = remarks_tag.get_text(strip=True) if remarks_tag else ""
-            
-            # 提取标签
-            tags_tag = item.find('span', class_='tags')
-            tags = tags_tag.get_text(strip=True) if tags_tag else ""
-            
-            # 提取副标题
-            subtitle_tag = item.find('h3')
-            subtitle = subtitle_tag.get_text(strip=True) if subtitle_tag else ""
-            
-            # 从play_link中提取video_id
-            video_id = ""
-            if play_link:
-                # 从URL中提取ID，例如从 /play/12345.html 提取 12345
-                import re
-                match = re.search(r'/play/([^/]+)\.html', play_link)
-                if match:
-                    video_id = match.group(1)
-            
-            items.append({
-                'title': subtitle,
-                'play_link': play_link,
-                'video_id': video_id,  # 添加video_id字段
-                'image_url': img_src,
-                'episodes': remarks,
-                'genres': tags.strip()
-            })
-        
-        return {
-            'search_term': keyword,
-            'section_title': title,
-            'item_count': len(items),
-            'items': items
-        }
-    
-    except requests.exceptions.RequestException as e:
-        print(f"Request error: {e}")
+        async with session.get(url, headers=_HEADERS, timeout=aiohttp.ClientTimeout(total=config.REQUEST_TIMEOUT)) as response:
+            if response.status != 200:
+                logger.warning("搜索结果页请求失败: %s, 状态: %s", url, response.status)
+                return None
+            html = await response.text()
+    except Exception as e:
+        logger.error(f"搜索结果页请求错误 {url}: {e}")
         return None
+
+    try:
+        result = parse_search_page(html, keyword, url)
     except Exception as e:
-        print(f"Error: {e}")
-        return None
\ No newline at end of file
+        logger.error(f"搜索结果页解析错误 {url}: {e}", exc_info=True)
+        return None
+    if cache:
+        _page_cache.set(cache_key, result)
+    return result
+
+async def _search_async(keyword, page, limit):
+    import asyncio
+
+    session = await get_session()
+    max_pages = config.SEARCH_MAX_PAGES
+    wanted = page * limit if limit is not None else None
+
+    # 学到地址格式后，预计需要多页时与第一页同时请求（结果超出实际页数的丢弃）
+    speculative = {}
+    first_cached = _page_cache.get(f"{keyword}:1") is not None
+    if not first_cached and _page_url_template and _page_size:
+        expected = max_pages if wanted is None else min(max_pages, -(-wanted // _page_size))
+        speculative = {
+            number: asyncio.ensure_future(_fetch_page(
+                session, keyword, number,
+                _page_url_template.format(keyword=quote(keyword), page=number),
+                cache=False
+            ))
+            for number in range(2, expected + 1)
+        }
+
+    first_page = await _fetch_page(session, keyword, 1, search_url(keyword))
+    if first_page is None:
+        for task in speculative.values():
+            task.cancel()
+        await asyncio.gather(*speculative.values(), return_exceptions=True)
+        return None
+    _learn_page_url_template(keyword, first_page)
+
+    total_pages = min(first_page.pages, max_pages)
+    fetched = {1: first_page}
+    for number, task in speculative.items():
+        result = await task
+        if number <= total_pages and result is not None:
+            _page_cache.set(f"{keyword}:{number}", result)
+            fetched[number] = result
+
+    while True:
+        items = _merge_pages(fetched)
+        if wanted is None:
+            needed = total_pages
+        elif len(items) >= wanted:
+            break
+        else:
+            # 按第一页的条数估计还需要的页数，去重后不足时再多取一页
+            per_page = max(len(first_page.items), 1)
+            needed = min(total_pages, max(max(fetched) + 1, -(-wanted // per_page)))
+        missing = [number for number in range(2, needed + 1) if number not in fetched]
+        if not missing:
+            break
+        results = await asyncio.gather(*(
+            _fetch_page(session, keyword, number, _page_url(first_page.page_urls, number) or search_url(keyword))
+            for number in missing
+        ))
+        failed = False
+        for number, result in zip(missing, results):
+            if result is None:
+                failed = True
+            fetched[number] = result
+        if failed or needed >= total_pages:
+            items = _merge_pages(fetched)
+            break
+
+    complete = all(result is not None for result in fetched.values())
+    last_fetched = max(fetched)
+    if limit is None:
+        page_items = items
+        has_more = False
+    else:
+        start = (page - 1) * limit
+        page_items = items[start:start + limit]
+        has_more = len(items) > start + limit or last_fetched < total_pages
+
+    return {
+        'search_term': keyword,
+        'section_title': first_page.title,
+        'item_count': len(page_items),
+        'items': page_items,
+        'page': page,
+        'limit': limit,
+        'has_more': has_more,
+        'upstream_pages': total_pages,
+        'partial': not complete
+    }
+
+def _merge_pages(fetched):
+    """按页码顺序合并各页条目，按video_id去重（没有ID的条目按播放链接）"""
+    seen = set()
+    items = []
+    for number in sorted(fetched):
+        result = fetched[number]
+        if result is None:
+            continue
+        for item in result.items:
+            key = item.video_id or item.play_link
+            if key in seen:
+                continue
+            seen.add(key)
+            items.append(item)
+    return items
+
+def search_data(keyword, page=1, limit=None):
+    """搜索视频，返回合并去重后的第page页（每页limit条），失败时返回None
+
+    只请求凑够前page页所需的上游页（最多SEARCH_MAX_PAGES页），后续页并发获取；
+    limit为None时返回全部上游页的结果。has_more表示之后还有结果，partial表示有上游页获取失败。
+    """
+    return run_async(_search_async(keyword, page, limit))
+
+def get_search_page_cache_stats():
+    """获取上游结果页缓存统计信息"""
+    return _page_cache.stats()
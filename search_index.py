@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地搜索索引模块
+对已抓取的搜索结果和视频详情建立倒排索引（标题、类型标签、备注和剧集数），中文按字符n-gram分词，
+支持本地即时搜索（标题联想见suggest.py）
+"""
+
+import re
+import logging
+import threading
+from config import get_config
+from models import SearchItem
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 中文连续片段或英文/数字单词
+_TOKEN_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff]+|[a-z0-9]+')
+
+# 标题命中的权重高于类型标签、备注（"全80集"、"已完结"）和剧集数
+TITLE_WEIGHT = 2
+GENRE_WEIGHT = 1
+
+def _is_cjk(run):
+    return not run.isascii()
+
+def tokenize(text):
+    """索引分词：中文片段产出单字和二元组，英文/数字按单词"""
+    tokens = set()
+    for run in _TOKEN_PATTERN.findall(text.lower()):
+        if _is_cjk(run):
+            tokens.update(run)
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.add(run)
+    return tokens
+
+def query_tokens(text):
+    """查询分词：中文片段只用二元组（单字片段用单字），要求全部命中"""
+    tokens = set()
+    for run in _TOKEN_PATTERN.findall(text.lower()):
+        if _is_cjk(run) and len(run) > 1:
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.add(run)
+    return tokens
+
+class SearchIndex:
+    """线程安全的内存倒排索引，超过max_docs时淘汰最早写入的条目"""
+
+    def __init__(self, max_docs=None):
+        self.max_docs = max_docs or config.SEARCH_INDEX_MAX_DOCS
+        self._lock = threading.Lock()
+        self._docs = {}        # video_id -> SearchItem
+        self._postings = {}    # token -> {video_id: 权重}
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, item):
+        """写入或更新一个SearchItem"""
+        video_id = item.video_id
+        if not video_id or not item.title:
+            return
+
+        with self._lock:
+            existing = self._docs.pop(video_id, None)
+            if existing is not None:
+                self._remove_postings(video_id, existing)
+                # 详情数据缺少的字段保留之前搜索结果中的值
+                item = existing.merged(item)
+
+            self._docs[video_id] = item
+            self._add_postings(video_id, item)
+
+            while len(self._docs) > self.max_docs:
+                oldest_id = next(iter(self._docs))
+                self._remove_postings(oldest_id, self._docs.pop(oldest_id))
+
+    def add_search_results(self, results):
+        """用search_data的结果增量更新索引"""
+        for item in (results or {}).get('items', []):
+            self.add(item)
+
+    def add_video_detail(self, video_id, video):
+        """用parse_video_details返回的Video增量更新索引"""
+        if not video:
+            return
+        self.add(SearchItem.create(
+            title=video.title,
+            play_link=f"/play/{video_id}.html",
+            video_id=video_id,
+            image_url='',
+            episodes=video.status_info,
+            genres=' '.join(video.tags),
+            episode_count=video.episode_count
+        ))
+
+    def _doc_tokens(self, item):
+        title_tokens = tokenize(item.title)
+        # 类型标签、备注和剧集数（如"80集"）使用同一较低权重
+        extra_text = f"{item.genres} {item.episodes}"
+        if item.episode_count:
+            extra_text += f" {item.episode_count}集"
+        genre_tokens = tokenize(extra_text) - title_tokens
+        return title_tokens, genre_tokens
+
+    def _add_postings(self, video_id, item):
+        title_tokens, genre_tokens = self._doc_tokens(item)
+        for token in title_tokens:
+            self._postings.setdefault(token, {})[video_id] = TITLE_WEIGHT
+        for token in genre_tokens:
+            self._postings.setdefault(token, {})[video_id] = GENRE_WEIGHT
+
+    def _remove_postings(self, video_id, item):
+        title_tokens, genre_tokens = self._doc_tokens(item)
+        for token in title_tokens | genre_tokens:
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.pop(video_id, None)
+                if not posting:
+                    del self._postings[token]
+
+    def search(self, keyword, limit=50):
+        """本地搜索，所有查询词元都命中的条目按权重排序返回"""
+        tokens = query_tokens(keyword)
+        if not tokens:
+            return []
+
+        with self._lock:
+            # 从最短的倒排表开始求交集
+            postings = sorted((self._postings.get(token, {}) for token in tokens), key=len)
+            if not postings[0]:
+                return []
+
+            scores = dict(postings[0])
+            for posting in postings[1:]:
+                scores = {
+                    video_id: score + posting[video_id]
+                    for video_id, score in scores.items()
+                    if video_id in posting
+                }
+                if not scores:
+                    return []
+
+            ranked = sorted(
+                scores,
+                key=lambda video_id: (-scores[video_id], len(self._docs[video_id].title))
+            )
+            return [self._docs[video_id] for video_id in ranked[:limit]]
+
+    def clear(self):
+        """清空索引"""
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+
+    def stats(self):
+        """获取索引统计信息"""
+        with self._lock:
+            return {
+                'documents': len(self._docs),
+                'tokens': len(self._postings),
+                'postings': sum(len(posting) for posting in self._postings.values()),
+                'max_docs': self.max_docs
+            }
+
+# 进程内的全局索引
+search_index = SearchIndex()
+
+def build_local_results(keyword, items):
+    """以search_data的返回格式包装本地搜索结果（items为SearchItem）"""
+    return {
+        'search_term': keyword,
+        'section_title': f"搜索: {keyword}",
+        'item_count': len(items),
+        'items': items
+    }
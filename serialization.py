@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+JSON序列化模块 - 快速路径
+安装了orjson时使用orjson编码，否则回退到标准库json；
+并提供预先序列化的响应体，缓存命中时直接返回字节（含压缩后的字节）
+"""
+
+import gzip
+import json
+import time
+import hashlib
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖
+    brotli = None
+
+# 按优先级排列的可用压缩编码
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def dumps(data):
+    """将数据序列化为UTF-8编码的JSON字节"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def compress(body, encoding):
+    """按指定编码压缩响应体"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    raise ValueError(f"不支持的压缩编码: {encoding}")
+
+class CachedResponse:
+    """预先序列化的JSON响应体，ETag只在创建时计算一次
+    
+    压缩后的响应体按编码懒加载并保存在条目上，热点条目只压缩一次。
+    """
+
+    __slots__ = ('body', 'etag', 'created_at', '_encoded')
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.md5(body).hexdigest()
+        self.created_at = time.time()
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        """获取指定编码的响应体，encoding为None时返回原始字节"""
+        if encoding is None:
+            return self.body
+        
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = compress(self.body, encoding)
+            self._encoded[encoding] = body
+        return body
+
+    @property
+    def nbytes(self):
+        """占用内存的估算值，尚未压缩时按原始大小的1/4预留压缩版本的空间"""
+        if self._encoded:
+            encoded_size = sum(len(body) for body in self._encoded.values())
+        else:
+            encoded_size = len(self.body) // 4
+        return len(self.body) + encoded_size + 120
+
+    @classmethod
+    def from_data(cls, data):
+        """从Python数据构建预序列化响应"""
+        return cls(dumps(data))
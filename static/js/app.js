@@ -9,6 +9,12 @@ document.addEventListener('DOMContentLoaded', function () {
     const resultTitle = document.getElementById('result-title');
     const resultCount = document.getElementById('result-count');
     const errorMessage = document.getElementById('error-message');
+    const loadMoreButton = document.getElementById('load-more');
+
+    // 分页状态：当前关键词、已加载的页码和条数
+    let currentQuery = '';
+    let currentPage = 1;
+    let loadedCount = 0;
 
     // 检查元素是否存在
     console.log('搜索元素检查:', {
@@ -36,9 +42,11 @@ document.addEventListener('DOMContentLoaded', function () {
         loader.style.display = 'block';
         resultsContainer.style.display = 'none';
         errorMessage.style.display = 'none';
+        currentQuery = query;
+        currentPage = 1;
 
         try {
-            const searchUrl = `/search?q=${encodeURIComponent(query)}`;
+            const searchUrl = `/search?q=${encodeURIComponent(query)}&page=1`;
             console.log('发送请求到:', searchUrl);
             
             // 发送搜索请求到后端API
@@ -64,8 +72,37 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
-    // 处理搜索响应
-    function handleSearchResponse(data) {
+    // 缩略图代理地址按标准宽度生成srcset，浏览器按显示宽度和像素密度选择（手机上封面占满宽度）
+    function thumbSrcset(imageUrl) {
+        if (!imageUrl || !imageUrl.startsWith('/img/')) {
+            return '';
+        }
+        const base = imageUrl.split('?')[0];
+        const srcset = [160, 320, 480].map(width => `${base}?w=${width} ${width}w`).join(', ');
+        return `srcset="${srcset}" sizes="(max-width: 768px) 100vw, 160px"`;
+    }
+
+    // 加载下一页结果，追加到列表末尾
+    async function loadMore() {
+        loadMoreButton.disabled = true;
+        try {
+            const response = await fetch(`/search?q=${encodeURIComponent(currentQuery)}&page=${currentPage + 1}`);
+            if (!response.ok) {
+                throw new Error(`请求失败: ${response.status} - ${response.statusText}`);
+            }
+            const data = await response.json();
+            currentPage += 1;
+            handleSearchResponse(data, true);
+        } catch (error) {
+            console.error('加载更多出错:', error);
+            showError(`加载更多失败: ${error.message || '无法连接到服务器'}`);
+        } finally {
+            loadMoreButton.disabled = false;
+        }
+    }
+
+    // 处理搜索响应（append为true时追加下一页结果）
+    function handleSearchResponse(data, append = false) {
         loader.style.display = 'none';
 
         console.log('处理搜索响应:', data);
@@ -75,7 +112,11 @@ document.addEventListener('DOMContentLoaded', function () {
             return;
         }
 
-        if (!data.items || data.item_count === 0) {
+        loadMoreButton.style.display = data.has_more ? 'block' : 'none';
+
+        if (append) {
+            loadedCount += data.items ? data.items.length : 0;
+        } else if (!data.items || data.item_count === 0) {
             resultTitle.textContent = `搜索结果: 无匹配内容`;
             resultCount.textContent = '0 个结果';
             resultsList.innerHTML = '';
@@ -84,9 +125,12 @@ document.addEventListener('DOMContentLoaded', function () {
         }
 
         // 显示搜索结果
-        resultTitle.textContent = `搜索结果: ${data.search_term}`;
-        resultCount.textContent = `${data.item_count} 个结果`;
-        resultsList.innerHTML = '';
+        if (!append) {
+            loadedCount = data.item_count;
+            resultTitle.textContent = `搜索结果: ${data.search_term}`;
+            resultsList.innerHTML = '';
+        }
+        resultCount.textContent = data.has_more ? `${loadedCount}+ 个结果` : `${loadedCount} 个结果`;
 
         // 输出搜索结果数据结构
         console.log('搜索结果数据结构:', data);
@@ -100,9 +144,10 @@ document.addEventListener('DOMContentLoaded', function () {
 
             const resultItem = document.createElement('div');
             resultItem.className = 'result-item';
+            resultItem.dataset.videoId = videoId;
             resultItem.innerHTML = `
                 <div class="result-image">
-                    <img src="${item.image_url}" alt="${item.title}">
+                    <img src="${item.image_url}" ${thumbSrcset(item.image_url)} alt="${item.title}" loading="lazy" decoding="async">
                 </div>
                 <div class="result-info">
                     <h3 class="result-title">${item.title}</h3>
@@ -127,6 +172,68 @@ document.addEventListener('DOMContentLoaded', function () {
         });
 
         resultsContainer.style.display = 'block';
+        enrichResults(data.items);
+    }
+
+    // 列表补充信息：一次批量请求取回各视频的剧集数和更新日期（不解析播放地址），失败时保持搜索结果原样
+    function enrichResults(items) {
+        const ids = items.map(item => item.video_id).filter(Boolean).slice(0, 30);
+        if (!ids.length) {
+            return;
+        }
+        fetch(`/videos?ids=${ids.map(encodeURIComponent).join(',')}&max_episodes=0&play_urls=false`)
+            .then(response => response.ok ? response.json() : null)
+            .then(data => {
+                if (!data || !data.success) {
+                    return;
+                }
+                data.data.videos.forEach(video => {
+                    const resultItem = resultsList.querySelector(`[data-video-id="${CSS.escape(video.video_id)}"]`);
+                    const episodes = resultItem && resultItem.querySelector('.result-episodes');
+                    if (!episodes || !video.episode_count) {
+                        return;
+                    }
+                    const parts = [video.status_info || `共${video.episode_count}集`];
+                    if (video.formatted_date) {
+                        parts.push(`${video.formatted_date}更新`);
+                    }
+                    episodes.textContent = parts.join(' · ');
+                });
+            })
+            .catch(error => console.warn('获取列表补充信息失败:', error));
+    }
+
+    // 输入联想：防抖后请求/suggest，结果填充到datalist
+    const suggestionList = document.getElementById('search-suggestions');
+    let suggestTimer = null;
+    let suggestController = null;
+
+    function requestSuggestions() {
+        const query = searchInput.value.trim();
+        if (!query || !suggestionList) {
+            return;
+        }
+
+        if (suggestController) {
+            suggestController.abort();
+        }
+        suggestController = new AbortController();
+
+        fetch(`/suggest?q=${encodeURIComponent(query)}`, { signal: suggestController.signal })
+            .then(response => response.ok ? response.json() : { suggestions: [] })
+            .then(data => {
+                suggestionList.innerHTML = '';
+                (data.suggestions || []).forEach(suggestion => {
+                    const option = document.createElement('option');
+                    option.value = suggestion.title;
+                    suggestionList.appendChild(option);
+                });
+            })
+            .catch(error => {
+                if (error.name !== 'AbortError') {
+                    console.warn('获取搜索联想失败:', error);
+                }
+            });
     }
 
     // 显示错误信息
@@ -138,6 +245,10 @@ document.addEventListener('DOMContentLoaded', function () {
     }
 
     // 绑定事件
+    if (loadMoreButton) {
+        loadMoreButton.addEventListener('click', loadMore);
+    }
+
     if (searchButton) {
         searchButton.addEventListener('click', function() {
             console.log('搜索按钮被点击');
@@ -156,6 +267,10 @@ document.addEventListener('DOMContentLoaded', function () {
                 performSearch();
             }
         });
+        searchInput.addEventListener('input', function () {
+            clearTimeout(suggestTimer);
+            suggestTimer = setTimeout(requestSuggestions, 150);
+        });
         console.log('搜索框事件已绑定');
     } else {
         console.error('搜索输入框元素未找到');
@@ -680,48 +680,71 @@ function loadEpisodePlayUrl(episodeUrl, episodeIndex) {
 
 /**
  * 加载完整播放列表
+ * 按游标分页获取剩余剧集，只拉取元数据，播放地址在点击时再解析
  * @param {string} videoId - 视频ID
  */
 function loadFullEpisodeList(videoId) {
+    const totalEpisodes = currentVideoData ? currentVideoData.episode_count : 0;
+    
     // 如果已经有缓存且数量足够，跳过加载
-    if (cachedEpisodes && cachedEpisodes.length > 5) {
+    if (cachedEpisodes && totalEpisodes && cachedEpisodes.length >= totalEpisodes) {
         console.log('播放列表已缓存，跳过重复加载');
         return;
     }
     
     console.log('开始加载完整播放列表...');
     
-    const params = new URLSearchParams({
-        async: 'true',
-        max_episodes: '50'  // 获取更多剧集
-    });
+    const episodes = (cachedEpisodes || []).slice();
     
-    fetch(`/video/${videoId}?${params}`)
-        .then(response => {
-            if (!response.ok) {
-                throw new Error(`HTTP错误 ${response.status}`);
-            }
-            return response.json();
-        })
-        .then(response => {
-            if (!response.success) {
-                throw new Error(response.error || '获取完整播放列表失败');
-            }
-            
-            const data = response.data;
-            
-            if (data && data.episodes && data.episodes.length > 0) {
+    function loadPage(offset) {
+        const params = new URLSearchParams({
+            offset: String(offset),
+            limit: '100',
+            resolve: 'false'  // 只获取剧集列表，不解析播放地址
+        });
+        
+        return fetch(`/video/${videoId}/episodes?${params}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP错误 ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(response => {
+                if (!response.success) {
+                    throw new Error(response.error || '获取完整播放列表失败');
+                }
+                
+                const page = response.data;
+                page.episodes.forEach((episode, i) => {
+                    const index = page.offset + i;
+                    // 保留已解析的播放地址
+                    if (episodes[index] && episodes[index].play_url) {
+                        return;
+                    }
+                    episodes[index] = episode;
+                });
+                
+                if (page.next_offset !== null && page.next_offset !== undefined) {
+                    return loadPage(page.next_offset);
+                }
+            });
+    }
+    
+    loadPage(episodes.length)
+        .then(() => {
+            if (episodes.length > 0) {
                 // 更新缓存
-                cachedEpisodes = data.episodes;
-                currentVideoData.episodes = data.episodes;
+                cachedEpisodes = episodes;
+                currentVideoData.episodes = episodes;
                 
                 // 重新渲染完整播放列表
-                renderEpisodesList(data.episodes);
+                renderEpisodesList(episodes);
                 
-                console.log(`完整播放列表加载完成，共 ${data.episodes.length} 集`);
+                console.log(`完整播放列表加载完成，共 ${episodes.length} 集`);
                 
                 sendLogToServer('完整播放列表加载成功', {
-                    episodeCount: data.episodes.length
+                    episodeCount: episodes.length
                 });
             }
         })
@@ -734,6 +757,26 @@ function loadFullEpisodeList(videoId) {
         });
 }
 
+/**
+ * 读取服务端内联到页面中的首屏视频数据（只读取一次）
+ * @returns {Object|null} 视频数据
+ */
+function takeInitialVideoData() {
+    const element = document.getElementById('initial-video-data');
+    if (!element) {
+        return null;
+    }
+    element.remove();
+    
+    try {
+        const response = JSON.parse(element.textContent);
+        return response && response.success ? response.data : null;
+    } catch (error) {
+        console.warn('解析内联视频数据失败:', error);
+        return null;
+    }
+}
+
 /**
  * 加载视频数据 - 优化版本
  * @param {string} videoId - 视频ID
@@ -743,6 +786,14 @@ function loadVideoData(videoId) {
         return;
     }
     
+    // 服务端已预取首屏数据时直接初始化播放器，省去一次API往返
+    const initialData = takeInitialVideoData();
+    if (initialData) {
+        initPlayerQuick(initialData);
+        loadFullEpisodeList(videoId);
+        return;
+    }
+    
     // 注释：已移除顶部加载动画
     // showLoading('正在加载视频信息...');
     
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+搜索联想模块
+完全基于内存的标题前缀索引：短前缀预先维护按热度排序的top-k列表，
+长前缀在排序数组上二分查找，热度来自播放/详情请求计数
+"""
+
+import bisect
+import heapq
+import logging
+import threading
+from itertools import islice
+from config import get_config
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+def _normalize(text):
+    return text.strip().lower()
+
+class SuggestIndex:
+    """按热度排序的标题前缀联想索引，条目数受max_entries限制"""
+
+    def __init__(self, max_entries=None, top_k=None, max_prefix_len=None):
+        self.max_entries = max_entries or config.SUGGEST_MAX_ENTRIES
+        self.top_k = top_k or config.SUGGEST_TOP_K
+        self.max_prefix_len = max_prefix_len or config.SUGGEST_MAX_PREFIX_LEN
+        self._lock = threading.Lock()
+        self._titles = {}       # video_id -> 标题
+        self._popularity = {}   # video_id -> 请求次数
+        self._sorted = []       # 排序的(标准化标题, video_id)，用于长前缀查找
+        self._top = {}          # 短前缀 -> 按热度排序的video_id列表（最多top_k个）
+
+    def _rank(self, video_id):
+        """排序键：热度高的在前，热度相同时短标题在前"""
+        return (-self._popularity.get(video_id, 0), len(self._titles[video_id]), video_id)
+
+    def _prefixes(self, video_id):
+        normalized = _normalize(self._titles[video_id])
+        return [normalized[:i] for i in range(1, min(len(normalized), self.max_prefix_len) + 1)]
+
+    def _promote(self, video_id):
+        """增量更新该标题所有短前缀的top-k列表"""
+        rank = self._rank(video_id)
+        for prefix in self._prefixes(video_id):
+            bucket = self._top.setdefault(prefix, [])
+            if video_id in bucket:
+                bucket.remove(video_id)
+            elif len(bucket) >= self.top_k and rank >= self._rank(bucket[-1]):
+                continue
+            bucket.append(video_id)
+            bucket.sort(key=self._rank)
+            del bucket[self.top_k:]
+
+    def _matches(self, prefix):
+        """在排序数组上查找以prefix开头的所有标题"""
+        start = bisect.bisect_left(self._sorted, (prefix,))
+        matches = []
+        for index in range(start, len(self._sorted)):
+            title, video_id = self._sorted[index]
+            if not title.startswith(prefix):
+                break
+            matches.append(video_id)
+        return matches
+
+    def _remove(self, video_id):
+        # 从已满的top-k列表中移除后，列表外可能还有匹配的标题，需要重新补齐
+        refill = []
+        for prefix in self._prefixes(video_id):
+            bucket = self._top.get(prefix)
+            if bucket and video_id in bucket:
+                if len(bucket) >= self.top_k:
+                    refill.append(prefix)
+                bucket.remove(video_id)
+                if not bucket:
+                    del self._top[prefix]
+
+        key = (_normalize(self._titles[video_id]), video_id)
+        index = bisect.bisect_left(self._sorted, key)
+        if index < len(self._sorted) and self._sorted[index] == key:
+            del self._sorted[index]
+        del self._titles[video_id]
+
+        for prefix in refill:
+            bucket = heapq.nsmallest(self.top_k, self._matches(prefix), key=self._rank)
+            if bucket:
+                self._top[prefix] = bucket
+            else:
+                self._top.pop(prefix, None)
+
+    def add(self, video_id, title):
+        """写入或更新一个标题"""
+        if not video_id or not title:
+            return
+
+        with self._lock:
+            if self._titles.get(video_id) == title:
+                return
+            if video_id in self._titles:
+                self._remove(video_id)
+
+            self._titles[video_id] = title
+            bisect.insort(self._sorted, (_normalize(title), video_id))
+            self._promote(video_id)
+
+            while len(self._titles) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """淘汰最早写入的条目中热度最低的一个"""
+        candidates = islice(self._titles, 64)
+        victim = min(candidates, key=lambda video_id: self._popularity.get(video_id, 0))
+        self._remove(victim)
+        self._popularity.pop(victim, None)
+
+    def add_search_results(self, results):
+        """用search_data的结果增量更新"""
+        for item in (results or {}).get('items', []):
+            self.add(item.video_id, item.title)
+
+    def record_hit(self, video_id):
+        """记录一次播放/详情请求，提升该标题的热度（只统计已收录的标题，保证内存有界）"""
+        with self._lock:
+            if video_id not in self._titles:
+                return
+            self._popularity[video_id] = self._popularity.get(video_id, 0) + 1
+            self._promote(video_id)
+
+    def suggest(self, prefix, limit=None):
+        """返回以prefix开头的标题，按热度排序（最多top_k个，limit小于1时按1处理）"""
+        limit = self.top_k if limit is None else max(1, min(limit, self.top_k))
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+
+        with self._lock:
+            if len(prefix) <= self.max_prefix_len:
+                video_ids = self._top.get(prefix, [])[:limit]
+            else:
+                # 长前缀的匹配范围很小，直接在排序数组上扫描
+                video_ids = heapq.nsmallest(limit, self._matches(prefix), key=self._rank)
+
+            return [
+                {'title': self._titles[video_id], 'video_id': video_id}
+                for video_id in video_ids
+            ]
+
+    def clear(self):
+        """清空联想索引"""
+        with self._lock:
+            self._titles.clear()
+            self._popularity.clear()
+            self._sorted.clear()
+            self._top.clear()
+
+    def stats(self):
+        """获取联想索引统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._titles),
+                'prefixes': len(self._top),
+                'max_entries': self.max_entries
+            }
+
+# 进程内的全局联想索引
+suggest_index = SuggestIndex()
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""cache_policy中完结状态判断的测试"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_policy import is_completed
+
+class IsCompletedTest(unittest.TestCase):
+
+    def test_completed(self):
+        for status in ('全80集', '全 24 集', '已完结', '完结', '大结局'):
+            self.assertTrue(is_completed(status), status)
+
+    def test_ongoing(self):
+        for status in ('未完结', '更新至12集', '更新至第3集 未完结', '没完结', '', None):
+            self.assertFalse(is_completed(status), status)
+
+if __name__ == '__main__':
+    unittest.main()
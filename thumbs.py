@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+封面缩略图代理模块
+上游封面图只抓取一次，按几种标准宽度缩放并转码为AVIF/WebP（Pillow可用时），
+结果保存在按哈希分片的磁盘缓存中，总大小超出上限时淘汰最久未访问的文件
+"""
+
+import os
+import hmac
+import time
+import base64
+import hashlib
+import logging
+import threading
+from io import BytesIO
+from functools import lru_cache
+from urllib.parse import urljoin
+from config import get_config
+from proxy_guard import DisallowedHost, proxy_enabled, host_allowed, get_allowed
+
+# 获取配置
+config = get_config()
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 输出格式：格式名 -> (Pillow编码器, MIME类型)
+_FORMATS = {
+    'avif': ('AVIF', 'image/avif'),
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg')
+}
+
+# 未安装Pillow时原样返回原图，按文件头判断类型
+_MAGIC_MIMETYPES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG', 'image/png'),
+    (b'GIF8', 'image/gif'),
+    (b'RIFF', 'image/webp')
+)
+
+# 同一文件距上次刷新访问时间超过该秒数才再次刷新，减少命中时的写操作
+_TOUCH_INTERVAL = 3600
+
+# 限制同时进行的转码数，转码是CPU密集操作，过多线程同时转码只会互相争抢
+_transcode_slots = threading.BoundedSemaphore(config.THUMB_MAX_TRANSCODES)
+
+@lru_cache(maxsize=1)
+def thumb_proxy_enabled():
+    """是否启用封面代理（SECRET_KEY为默认值或没有配置THUMB_ALLOWED_HOSTS时不启用）"""
+    return proxy_enabled('封面代理', config.THUMB_PROXY_ENABLED, config.THUMB_ALLOWED_HOSTS)
+
+def _sign(payload):
+    """对token载荷签名，防止代理被用于任意地址（与播放列表token使用不同的签名域）"""
+    digest = hmac.new(config.SECRET_KEY.encode('utf-8'), f"img:{payload}".encode('utf-8'), hashlib.sha256)
+    return digest.hexdigest()[:16]
+
+def make_thumb_token(image_url):
+    """为上游封面地址生成代理token（无状态，任意worker均可解析）"""
+    payload = base64.urlsafe_b64encode(image_url.encode('utf-8')).decode('ascii').rstrip('=')
+    return f"{payload}.{_sign(payload)}"
+
+def resolve_thumb_token(token):
+    """解析代理token，签名无效时返回None"""
+    payload, _, signature = token.rpartition('.')
+    if not payload or not hmac.compare_digest(signature, _sign(payload)):
+        return None
+
+    try:
+        padding = '=' * (-len(payload) % 4)
+        image_url = base64.urlsafe_b64decode(payload + padding).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    if not host_allowed(image_url, config.THUMB_ALLOWED_HOSTS):
+        return None
+    return image_url
+
+def thumb_url(image_url, width=None):
+    """上游封面地址对应的代理地址，相对地址按上游站点补全，无法代理时原样返回"""
+    absolute_url = urljoin(config.THUMB_UPSTREAM_BASE, image_url)
+    if not host_allowed(absolute_url, config.THUMB_ALLOWED_HOSTS):
+        return image_url
+    url = f"/img/{make_thumb_token(absolute_url)}"
+    return f"{url}?w={width}" if width else url
+
+@lru_cache(maxsize=1)
+def _pillow():
+    """导入Pillow，未安装时返回None（此时原样转发封面原图）"""
+    try:
+        from PIL import Image
+    except ImportError:
+        logger.warning("未安装Pillow，封面代理只缓存原图，不缩放和转码")
+        return None
+    return Image
+
+@lru_cache(maxsize=1)
+def available_formats():
+    """当前Pillow支持的输出格式，按THUMB_FORMATS的优先顺序，JPEG总是可用"""
+    if _pillow() is None:
+        return ()
+
+    from PIL import features
+    formats = []
+    for name in config.THUMB_FORMATS:
+        if name not in _FORMATS or name == 'jpeg':
+            continue
+        try:
+            supported = features.check(name)
+        except ValueError:
+            # 旧版Pillow不认识该特性
+            supported = False
+        if supported:
+            formats.append(name)
+    formats.append('jpeg')
+    return tuple(formats)
+
+def negotiate_format(accept):
+    """按Accept头选择浏览器支持的最优格式，未安装Pillow时返回None"""
+    for name in available_formats():
+        if name == 'jpeg' or _FORMATS[name][1] in accept:
+            return name
+    return None
+
+def snap_width(width):
+    """将请求的宽度归到不小于它的最近标准宽度，限制每张封面的变体数量"""
+    widths = sorted(config.THUMB_WIDTHS)
+    for standard_width in widths:
+        if standard_width >= width:
+            return standard_width
+    return widths[-1]
+
+class DiskCache:
+    """按哈希分片的磁盘缓存，总大小超出上限时按修改时间（命中时刷新）淘汰最旧的文件
+
+    多个worker共享同一目录：写入先写临时文件再原子替换，淘汰的文件已被其他进程删除也没有影响。
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes_used = None  # 上次扫描的总大小加上之后写入的大小，首次写入时扫描
+        self._pruning = False
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def get(self, key):
+        """读取缓存文件，不存在时返回None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if time.time() - os.stat(path).st_mtime > _TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def set(self, key, data):
+        """写入缓存文件，总大小超出上限时在后台线程中淘汰旧文件"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"写入缩略图缓存失败 {path}: {e}")
+            return
+
+        with self._lock:
+            self.writes += 1
+            if self._bytes_used is not None:
+                self._bytes_used += len(data)
+            should_prune = not self._pruning and (
+                self._bytes_used is None or self._bytes_used > self.max_bytes
+            )
+            if should_prune:
+                self._pruning = True
+        if should_prune:
+            threading.Thread(target=self.prune, name='thumb-cache-prune', daemon=True).start()
+
+    def _scan(self):
+        """列出缓存文件(修改时间, 大小, 路径)，顺带删除中断写入留下的临时文件"""
+        files = []
+        stale_before = time.time() - _TOUCH_INTERVAL
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                    if name.endswith('.tmp'):
+                        if st.st_mtime < stale_before:
+                            os.remove(path)
+                        continue
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def prune(self):
+        """总大小超出上限时删除最久未访问的文件，直到降到上限的90%"""
+        try:
+            files = self._scan()
+            total = sum(size for mtime, size, path in files)
+            removed = 0
+            if total > self.max_bytes:
+                files.sort()
+                target = self.max_bytes * 0.9
+                for mtime, size, path in files:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError:
+                        continue
+                    total -= size
+                    removed += 1
+                logger.info(f"缩略图缓存淘汰了 {removed} 个文件，剩余 {total} 字节")
+
+            with self._lock:
+                self._bytes_used = total
+                self.evictions += removed
+        except Exception as e:
+            logger.error(f"清理缩略图缓存出错: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._pruning = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'bytes_used': self._bytes_used,
+                'max_bytes': self.max_bytes,
+                'path': self.root
+            }
+
+_disk_cache = DiskCache(config.THUMB_CACHE_DIR, config.THUMB_CACHE_MAX_BYTES)
+
+# 上游抓取和转码计数
+_stats_lock = threading.Lock()
+_stats = {'fetches': 0, 'fetch_errors': 0, 'transcodes': 0, 'transcode_seconds': 0.0}
+
+def _count(name, value=1):
+    with _stats_lock:
+        _stats[name] += value
+
+def _cache_key(image_url, variant):
+    return hashlib.sha256(f"{image_url}\n{variant}".encode('utf-8')).hexdigest()[:40]
+
+def _sniff_mimetype(data):
+    for magic, mimetype in _MAGIC_MIMETYPES:
+        if data.startswith(magic):
+            return mimetype
+    return 'application/octet-stream'
+
+def fetch_source(image_url):
+    """获取封面原图，磁盘缓存中没有时请求上游，失败时返回None"""
+    key = _cache_key(image_url, 'source')
+    data = _disk_cache.get(key)
+    if data is not None:
+        return data
+
+    # requests导入较慢，首次使用时才导入
+    import requests
+
+    headers = {
+        'User-Agent': config.USER_AGENT,
+        'Referer': config.THUMB_UPSTREAM_BASE
+    }
+    chunks = []
+    size = 0
+    try:
+        with get_allowed(image_url, config.THUMB_ALLOWED_HOSTS, headers=headers,
+                         timeout=config.REQUEST_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+            if not content_type.startswith('image/'):
+                logger.warning(f"上游封面不是图片 ({content_type}): {image_url}")
+                _count('fetch_errors')
+                return None
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > config.THUMB_MAX_SOURCE_BYTES:
+                    logger.warning(f"上游封面过大，放弃代理: {image_url}")
+                    _count('fetch_errors')
+                    return None
+                chunks.append(chunk)
+    except DisallowedHost as e:
+        logger.warning(f"封面地址（或其重定向）不在允许的域名中 {image_url}: {e}")
+        _count('fetch_errors')
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"获取封面失败 {image_url}: {e}")
+        _count('fetch_errors')
+        return None
+
+    data = b''.join(chunks)
+    _count('fetches')
+    _disk_cache.set(key, data)
+    return data
+
+def transcode(data, width, fmt):
+    """将图片缩放到指定宽度（不放大）并编码为指定格式"""
+    Image = _pillow()
+    encoder, _ = _FORMATS[fmt]
+    start_time = time.time()
+
+    with _transcode_slots:
+        with Image.open(BytesIO(data)) as source:
+            # JPEG按DCT缩放比例直接解码为接近目标的尺寸，省去大部分解码和缩放开销
+            if source.width > width:
+                source.draft('RGB', (width, max(1, source.height * width // source.width)))
+
+            has_alpha = source.mode in ('RGBA', 'LA', 'PA') or 'transparency' in source.info
+            image = source.convert('RGBA' if has_alpha and fmt != 'jpeg' else 'RGB')
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                image = image.resize((width, height), Image.LANCZOS, reducing_gap=2.0)
+
+            out = BytesIO()
+            if fmt == 'jpeg':
+                image.save(out, encoder, quality=config.THUMB_QUALITY, optimize=True, progressive=True)
+            elif fmt == 'avif':
+                image.save(out, encoder, quality=config.THUMB_AVIF_QUALITY, speed=8)
+            else:
+                image.save(out, encoder, quality=config.THUMB_QUALITY, method=4)
+
+    _count('transcodes')
+    _count('transcode_seconds', time.time() - start_time)
+    return out.getvalue()
+
+def get_cached_thumbnail(image_url, width, fmt):
+    """只从磁盘缓存获取缩略图（不请求上游、不转码），返回值同get_thumbnail"""
+    if fmt is None:
+        key = _cache_key(image_url, 'source')
+        data = _disk_cache.get(key)
+        return (data, _sniff_mimetype(data), key) if data is not None else None
+
+    key = _cache_key(image_url, f"{width}.{fmt}")
+    data = _disk_cache.get(key)
+    return (data, _FORMATS[fmt][1], key) if data is not None else None
+
+def get_thumbnail(image_url, width, fmt):
+    """获取缩略图，返回(图片数据, MIME类型, ETag)，失败时返回None
+
+    fmt为None（未安装Pillow）时返回原图。
+    """
+    if fmt is None:
+        data = fetch_source(image_url)
+        if data is None:
+            return None
+        return data, _sniff_mimetype(data), _cache_key(image_url, 'source')
+
+    key = _cache_key(image_url, f"{width}.{fmt}")
+    data = _disk_cache.get(key)
+    if data is None:
+        source = fetch_source(image_url)
+        if source is None:
+            return None
+        try:
+            data = transcode(source, width, fmt)
+        except Exception as e:
+            # Pillow无法识别或解码的图片
+            logger.error(f"封面转码失败 {image_url}: {e}")
+            return None
+        _disk_cache.set(key, data)
+
+    return data, _FORMATS[fmt][1], key
+
+def get_thumb_cache_stats():
+    """获取缩略图缓存统计信息"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['transcode_seconds'] = round(stats['transcode_seconds'], 3)
+    stats['formats'] = list(available_formats())
+    stats['disk_cache'] = _disk_cache.stats()
+    return stats
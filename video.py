@@ -6,17 +6,23 @@
 支持异步并发请求、智能缓存机制和延迟加载
 """
 
+import os
 import re
 import json
+import atexit
 import time
-import asyncio
-import aiohttp
 import logging
-from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
-import requests
+import sqlite3
+import threading
+from datetime import datetime
 from functools import lru_cache
 from config import get_config
+from models import Episode, Video
+from catalog import get_catalog
+from page_store import PageStore, get_page_store, page_digest
+from cache import TimedCache
+from generations import generations
+from cache_policy import play_url_ttl, video_ttl
 
 # 获取配置
 config = get_config()
@@ -24,101 +30,102 @@ config = get_config()
 # 配置日志
 logger = logging.getLogger(__name__)
 
-# 缓存类 - 支持过期时间
-class TimedCache:
-    """带过期时间的缓存类"""
-    
-    def __init__(self, default_timeout=None, max_size=1000):
-        self.cache = {}
-        self.default_timeout = default_timeout or config.CACHE_TIMEOUT
-        self.max_size = max_size
-        
-    def get(self, key):
-        """获取缓存值"""
-        if key not in self.cache:
-            return None
-            
-        value, timestamp = self.cache[key]
-        
-        # 检查是否过期
-        if datetime.now() - timestamp > timedelta(seconds=self.default_timeout):
-            del self.cache[key]
-            return None
-            
-        return value
-    
-    def set(self, key, value, timeout=None):
-        """设置缓存值"""
-        # 如果缓存满了，清理过期项
-        if len(self.cache) >= self.max_size:
-            self._cleanup_expired()
-            
-            # 如果还是满的，删除最旧的项
-            if len(self.cache) >= self.max_size:
-                oldest_key = min(self.cache.keys(), key=lambda k: self.cache[k][1])
-                del self.cache[oldest_key]
-        
-        self.cache[key] = (value, datetime.now())
-    
-    def _cleanup_expired(self):
-        """清理过期的缓存项"""
-        now = datetime.now()
-        expired_keys = [
-            key for key, (value, timestamp) in self.cache.items()
-            if now - timestamp > timedelta(seconds=self.default_timeout)
-        ]
-        for key in expired_keys:
-            del self.cache[key]
-        
-        if expired_keys:
-            logger.info(f"清理了 {len(expired_keys)} 个过期缓存项")
-    
-    def clear(self):
-        """清空缓存"""
-        self.cache.clear()
-        logger.info("缓存已清空")
-    
-    def stats(self):
-        """获取缓存统计信息"""
-        now = datetime.now()
-        valid_items = 0
-        expired_items = 0
-        
-        for value, timestamp in self.cache.values():
-            if now - timestamp <= timedelta(seconds=self.default_timeout):
-                valid_items += 1
-            else:
-                expired_items += 1
-        
-        return {
-            'total_items': len(self.cache),
-            'valid_items': valid_items,
-            'expired_items': expired_items,
-            'hit_rate': valid_items / len(self.cache) if self.cache else 0,
-            'max_size': self.max_size,
-            'cache_timeout': self.default_timeout
-        }
+# requests、bs4、aiohttp和asyncio导入较慢，在首次使用时才导入（见warm_up）
 
-# 创建缓存实例
+# 详情页解析逻辑变化时递增，页面存储中按旧逻辑解析过的页面会重新解析
+_PAGE_PARSER_VERSION = 1
+
+# 创建缓存实例（按剧集地址失效）
 _play_url_cache = TimedCache(
     default_timeout=config.CACHE_TIMEOUT,
-    max_size=config.CACHE_MAX_SIZE
+    max_size=config.CACHE_MAX_SIZE,
+    generation=lambda episode_url: generations.current('episode', episode_url)
+)
+
+# 详情页缓存（元数据和剧集列表，供分页复用），列表中带有播放地址，剧集失效时同样失效
+_video_page_cache = TimedCache(
+    default_timeout=config.CACHE_TIMEOUT,
+    max_size=config.CACHE_MAX_SIZE,
+    generation=lambda video_url: video_generation(get_video_id_by_link(video_url))
 )
 
 def get_play_link_by_id(video_id):
     """根据视频ID生成播放链接"""
     return f"https://djw1.com/play/{video_id}.html"
 
-# 创建全局连接池（提高性能）
-_connector = None
-_session = None
+def get_video_id_by_link(video_url):
+    """从播放链接取出视频ID（get_play_link_by_id的逆过程）"""
+    name = video_url.rsplit('/', 1)[-1]
+    return name[:-5] if name.endswith('.html') else name
+
+def video_generation(video_id):
+    """视频详情及其剧集的代数，详情或剧集失效时都会变化"""
+    return generations.current('detail', video_id) + generations.current('episode', video_id)
+
+# 每个线程持有自己的事件循环和会话（aiohttp会话绑定创建它的事件循环，不能跨循环/线程共享），
+# 循环在调用之间保持打开，连接池中的keep-alive连接得以复用
+class _ThreadAsyncState:
+    """一个线程的事件循环和异步会话"""
+    __slots__ = ('thread', 'loop', 'session')
+    
+    def __init__(self, thread, loop):
+        self.thread = thread
+        self.loop = loop
+        self.session = None
+
+_async_local = threading.local()
+_async_states = []  # 所有线程的状态，用于回收已退出线程的会话和进程退出时关闭
+_async_states_lock = threading.Lock()
+
+def _get_async_state():
+    """获取当前线程的事件循环和会话状态"""
+    state = getattr(_async_local, 'state', None)
+    if state is not None and not state.loop.is_closed():
+        return state
+    
+    import asyncio
+    
+    state = _ThreadAsyncState(threading.current_thread(), asyncio.new_event_loop())
+    with _async_states_lock:
+        # 顺便回收已退出线程（如开发服务器的请求线程）遗留的会话
+        dead_states = [s for s in _async_states if not s.thread.is_alive()]
+        _async_states[:] = [s for s in _async_states if s.thread.is_alive()]
+        _async_states.append(state)
+    for dead_state in dead_states:
+        _close_async_state(dead_state)
+    
+    _async_local.state = state
+    return state
+
+def _get_event_loop():
+    """获取当前线程复用的事件循环"""
+    return _get_async_state().loop
+
+def run_async(coro):
+    """在当前线程复用的事件循环中运行协程（与其他上游请求共用本线程的异步会话）"""
+    return _get_event_loop().run_until_complete(coro)
+
+def _close_async_state(state):
+    """关闭一个线程的会话和事件循环（该循环不能正在运行）"""
+    if state.loop.is_closed() or state.loop.is_running():
+        return
+    try:
+        if state.session is not None and not state.session.closed:
+            state.loop.run_until_complete(state.session.close())
+    except Exception as e:
+        logger.warning(f"关闭异步会话失败: {e}")
+    finally:
+        state.session = None
+        state.loop.close()
 
 async def get_session():
-    """获取异步会话（使用连接池）"""
-    global _connector, _session
+    """获取当前线程的异步会话（使用连接池）"""
+    import aiohttp
+    
+    state = _get_async_state()
     
-    if _connector is None:
-        _connector = aiohttp.TCPConnector(
+    if state.session is None or state.session.closed:
+        connector = aiohttp.TCPConnector(
             limit=config.MAX_CONCURRENT_REQUESTS,
             limit_per_host=config.MAX_CONCURRENT_REQUESTS // 2,
             ttl_dns_cache=300,  # DNS缓存5分钟
@@ -126,28 +133,73 @@ async def get_session():
             keepalive_timeout=30,
             enable_cleanup_closed=True
         )
-    
-    if _session is None or _session.closed:
         timeout = aiohttp.ClientTimeout(total=config.ASYNC_TIMEOUT)
-        _session = aiohttp.ClientSession(
-            connector=_connector,
+        state.session = aiohttp.ClientSession(
+            connector=connector,
             timeout=timeout,
             headers={'User-Agent': config.USER_AGENT}
         )
     
-    return _session
+    return state.session
 
 async def cleanup_session():
-    """清理会话和连接池"""
-    global _session, _connector
-    
-    if _session and not _session.closed:
-        await _session.close()
-        _session = None
+    """清理当前线程的会话和连接池"""
+    state = getattr(_async_local, 'state', None)
+    if state is None:
+        return
+    session, state.session = state.session, None
     
-    if _connector:
-        await _connector.close()
-        _connector = None
+    if session and not session.closed:
+        await session.close()
+
+def close_thread_session():
+    """关闭当前线程的会话和事件循环（线程退出前调用）"""
+    state = getattr(_async_local, 'state', None)
+    if state is None:
+        return
+    _async_local.state = None
+    with _async_states_lock:
+        if state in _async_states:
+            _async_states.remove(state)
+    _close_async_state(state)
+
+def close_all_sessions():
+    """关闭本进程所有线程的会话（worker退出时调用，此时各线程已不再处理请求）"""
+    with _async_states_lock:
+        states = list(_async_states)
+        _async_states.clear()
+    for state in states:
+        _close_async_state(state)
+
+def _reset_after_fork():
+    """fork后的子进程不沿用父进程的事件循环和会话（其中的连接与父进程共享）"""
+    global _async_local, _async_states_lock, _refresher_pid, _batch_pool, _batch_pool_lock, _batch_inflight_lock
+    _async_local = threading.local()
+    _async_states_lock = threading.Lock()
+    _async_states.clear()
+    # 后台线程不会随fork复制到子进程
+    _refresher_pid = None
+    _batch_pool = None
+    _batch_pool_lock = threading.Lock()
+    _batch_inflight.clear()
+    _batch_inflight_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(close_all_sessions)
+
+# 播放地址提取使用的正则，模块加载时编译一次（gunicorn预加载后各worker共享）
+_PLAY_URLS_JSON_PATTERNS = [
+    re.compile(r'playUrls\s*=\s*({[^}]+})'),
+    re.compile(r'playUrls\s*:\s*({[^}]+})'),
+    re.compile(r'var\s+playUrls\s*=\s*({[^}]+})')
+]
+_WWM3U8_PATTERNS = [
+    re.compile(r'"wwm3u8"\s*:\s*"(https?://[^"]+)"'),
+    re.compile(r"'wwm3u8'\s*:\s*'(https?://[^']+)'"),
+    re.compile(r'wwm3u8\s*:\s*["\'](https?://[^"\']+)["\']')
+]
+_ANY_M3U8_PATTERN = re.compile(r'(https?://[^"\']*\.m3u8[^"\']*)')
+_RELEASE_DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
 
 def extract_m3u8_url_from_script(script_content):
     """从脚本内容中提取m3u8播放地址"""
@@ -155,15 +207,9 @@ def extract_m3u8_url_from_script(script_content):
         return ""
     
     # 方法1: 查找JSON格式的播放地址
-    json_patterns = [
-        r'playUrls\s*=\s*({[^}]+})',
-        r'playUrls\s*:\s*({[^}]+})',
-        r'var\s+playUrls\s*=\s*({[^}]+})'
-    ]
-    
     m3u8_url = ""
-    for pattern in json_patterns:
-        match = re.search(pattern, script_content)
+    for pattern in _PLAY_URLS_JSON_PATTERNS:
+        match = pattern.search(script_content)
         if match:
             try:
                 # 清理JSON字符串
@@ -177,21 +223,15 @@ def extract_m3u8_url_from_script(script_content):
     
     # 方法2: 直接查找m3u8 URL
     if not m3u8_url:
-        m3u8_patterns = [
-            r'"wwm3u8"\s*:\s*"(https?://[^"]+)"',
-            r"'wwm3u8'\s*:\s*'(https?://[^']+)'",
-            r'wwm3u8\s*:\s*["\'](https?://[^"\']+)["\']'
-        ]
-        
-        for pattern in m3u8_patterns:
-            match = re.search(pattern, script_content)
+        for pattern in _WWM3U8_PATTERNS:
+            match = pattern.search(script_content)
             if match:
                 m3u8_url = match.group(1).replace('\\', '')
                 break
     
     # 方法3: 查找任何m3u8链接
     if not m3u8_url:
-        m3u8_match = re.search(r'(https?://[^"\']*\.m3u8[^"\']*)', script_content)
+        m3u8_match = _ANY_M3U8_PATTERN.search(script_content)
         if m3u8_match:
             m3u8_url = m3u8_match.group(1).replace('\\', '')
     
@@ -199,20 +239,22 @@ def extract_m3u8_url_from_script(script_content):
 
 async def get_episode_play_url_async(session, episode_url):
     """异步获取单个剧集的播放地址"""
+    from bs4 import BeautifulSoup
+    
     if not episode_url:
         return None
     
+    # 确保URL是完整的（缓存键与写入时一致）
+    if not episode_url.startswith('http'):
+        episode_url = f"https://djw1.com{episode_url}"
+    
     # 检查缓存
     cached_result = _play_url_cache.get(episode_url)
     if cached_result is not None:
-        logger.debug(f"缓存命中: {episode_url}")
+        logger.debug("缓存命中: %s", episode_url)
         return cached_result
     
     try:
-        # 确保URL是完整的
-        if not episode_url.startswith('http'):
-            episode_url = f"https://djw1.com{episode_url}"
-        
         # 使用异步请求
         async with session.get(episode_url) as response:
             if response.status != 200:
@@ -230,8 +272,8 @@ async def get_episode_play_url_async(session, episode_url):
                         m3u8_url = extract_m3u8_url_from_script(script.string)
                         if m3u8_url:
                             # 缓存结果
-                            _play_url_cache.set(episode_url, m3u8_url)
-                            logger.debug(f"获取到播放地址: {episode_url}")
+                            _play_url_cache.set(episode_url, m3u8_url, timeout=play_url_ttl(m3u8_url))
+                            logger.debug("获取到播放地址: %s", episode_url)
                             return m3u8_url
             
             # 如果没找到，尝试查找页面中的所有脚本
@@ -241,8 +283,8 @@ async def get_episode_play_url_async(session, episode_url):
                     m3u8_url = extract_m3u8_url_from_script(script.string)
                     if m3u8_url:
                         # 缓存结果
-                        _play_url_cache.set(episode_url, m3u8_url)
-                        logger.debug(f"获取到播放地址: {episode_url}")
+                        _play_url_cache.set(episode_url, m3u8_url, timeout=play_url_ttl(m3u8_url))
+                        logger.debug("获取到播放地址: %s", episode_url)
                         return m3u8_url
             
             # 缓存空结果
@@ -258,20 +300,23 @@ async def get_episode_play_url_async(session, episode_url):
 
 def get_episode_play_url(episode_url):
     """同步获取单个剧集的播放地址（保持向后兼容）"""
+    import requests
+    from bs4 import BeautifulSoup
+    
     if not episode_url:
         return None
     
+    # 确保URL是完整的（缓存键与写入时一致）
+    if not episode_url.startswith('http'):
+        episode_url = f"https://djw1.com{episode_url}"
+    
     # 检查缓存
     cached_result = _play_url_cache.get(episode_url)
     if cached_result is not None:
-        logger.debug(f"缓存命中: {episode_url}")
+        logger.debug("缓存命中: %s", episode_url)
         return cached_result
     
     try:
-        # 确保URL是完整的
-        if not episode_url.startswith('http'):
-            episode_url = f"https://djw1.com{episode_url}"
-        
         headers = {
             'User-Agent': config.USER_AGENT
         }
@@ -291,8 +336,8 @@ def get_episode_play_url(episode_url):
                     m3u8_url = extract_m3u8_url_from_script(script.string)
                     if m3u8_url:
                         # 缓存结果
-                        _play_url_cache.set(episode_url, m3u8_url)
-                        logger.debug(f"获取到播放地址: {episode_url}")
+                        _play_url_cache.set(episode_url, m3u8_url, timeout=play_url_ttl(m3u8_url))
+                        logger.debug("获取到播放地址: %s", episode_url)
                         return m3u8_url
         
         # 如果没找到，尝试查找页面中的所有脚本
@@ -302,8 +347,8 @@ def get_episode_play_url(episode_url):
                 m3u8_url = extract_m3u8_url_from_script(script.string)
                 if m3u8_url:
                     # 缓存结果
-                    _play_url_cache.set(episode_url, m3u8_url)
-                    logger.debug(f"获取到播放地址: {episode_url}")
+                    _play_url_cache.set(episode_url, m3u8_url, timeout=play_url_ttl(m3u8_url))
+                    logger.debug("获取到播放地址: %s", episode_url)
                     return m3u8_url
         
         # 缓存空结果
@@ -318,186 +363,199 @@ def get_episode_play_url(episode_url):
         return None
 
 async def get_episodes_play_urls_async(episode_list, max_concurrent=None, max_episodes=None):
-    """异步批量获取剧集播放地址"""
+    """异步批量获取剧集播放地址（只解析传入的剧集窗口）"""
+    import asyncio
+    
     if not episode_list:
         return []
     
     # 使用配置的默认值
     max_concurrent = max_concurrent or config.MAX_CONCURRENT_REQUESTS
-    max_episodes = max_episodes or config.MAX_EPISODES
+    max_episodes = max_episodes or len(episode_list)
     
-    # 限制获取的剧集数量，实现延迟加载
+    # 只处理请求的窗口，调用方负责分页
     episodes_to_fetch = episode_list[:max_episodes]
     
-    # 使用全局会话
+    # 使用当前线程的会话
     session = await get_session()
+    semaphore = asyncio.Semaphore(max_concurrent)
+    
+    async def fetch(episode):
+        async with semaphore:
+            try:
+                play_url = await get_episode_play_url_async(session, episode.url)
+            except Exception as e:
+                logger.error(f"获取剧集播放地址失败: {e}")
+                play_url = None
+        # 返回新的剧集对象，不修改缓存中共享的剧集
+        return episode.with_play_url(play_url)
+    
+    # 并发执行任务，结果保持原有顺序
+    results = await asyncio.gather(*(fetch(episode) for episode in episodes_to_fetch))
+    
+    logger.info("异步获取完成，处理了 %s 个剧集", len(episodes_to_fetch))
+    return results
+
+def resolve_episode_play_urls(episodes, use_async=True):
+    """为一组剧集解析播放地址，返回新的剧集列表"""
+    episodes = list(episodes)
+    if not episodes:
+        return episodes
+    
+    if use_async:
+        loop = _get_event_loop()
+        episodes = loop.run_until_complete(
+            get_episodes_play_urls_async(episodes)
+        )
+    else:
+        episodes = [
+            episode.with_play_url(get_episode_play_url(episode.url))
+            for episode in episodes
+        ]
+    
+    return episodes
+
+def diff_episodes(previous_episodes, episodes):
+    """按剧集地址对比新旧剧集列表
     
-    # 创建异步任务
-    tasks = []
-    for episode in episodes_to_fetch:
-        task = get_episode_play_url_async(session, episode['url'])
-        tasks.append((episode, task))
+    返回(合并后的剧集列表, 新增剧集列表)：已解析的播放地址沿用旧列表中同一地址的值。
+    """
+    known_play_urls = {episode.url: episode.play_url for episode in previous_episodes}
+    merged = []
+    added = []
+    for episode in episodes:
+        if episode.url not in known_play_urls:
+            added.append(episode)
+        elif not episode.play_url and known_play_urls[episode.url]:
+            episode = episode.with_play_url(known_play_urls[episode.url])
+        merged.append(episode)
+    return merged, added
+
+def fetch_video_page(video_url, refresh=False):
+    """获取视频详情页（元数据和剧集列表，不解析剧集播放地址）
+    
+    依次查找内存缓存和持久化目录，目录条目过期（有效期由更新状态和更新间隔决定）或refresh为True时
+    才请求上游；上游失败时退回目录中的旧数据。分页接口和详情接口共用同一份剧集列表。
+    内存缓存的有效期不超过目录有效期的剩余时间，也不超过其中播放地址的有效期。
+    """
+    return _load_video_page(video_url, refresh)[0]
+
+def _load_video_page(video_url, refresh=False):
+    """fetch_video_page的实现，额外返回与上一版本相比新增的剧集"""
+    previous_page = _video_page_cache.get(video_url)
+    if previous_page is not None and not refresh:
+        logger.debug("详情页缓存命中: %s", video_url)
+        return previous_page, []
     
-    # 并发执行任务
-    results = []
-    for episode, task in tasks:
+    catalog = get_catalog()
+    stale_page = None
+    if catalog is not None:
         try:
-            play_url = await task
-            episode['play_url'] = play_url
-            results.append(episode)
-        except Exception as e:
-            logger.error(f"获取剧集播放地址失败: {e}")
-            episode['play_url'] = None
-            results.append(episode)
+            stored_page, fetched_at, max_age = catalog.get_video(video_url, play_url_max_age=config.CACHE_TIMEOUT)
+        except sqlite3.Error as e:
+            logger.error(f"读取视频目录失败 {video_url}: {e}")
+            stored_page, fetched_at, max_age = None, None, None
+        
+        if stored_page is not None:
+            remaining = fetched_at + max_age - time.time()
+            if not refresh and remaining > 0:
+                logger.debug("视频目录命中: %s", video_url)
+                _video_page_cache.set(video_url, stored_page, timeout=video_ttl(stored_page, remaining))
+                return stored_page, []
+            stale_page = stored_page
     
-    # 为剩余的剧集添加占位符
-    for episode in episode_list[max_episodes:]:
-        episode['play_url'] = None
-        results.append(episode)
+    page = _fetch_video_page_upstream(video_url, stale_page or previous_page)
+    if page is None:
+        if stale_page is not None:
+            logger.warning(f"上游获取失败，使用目录中的旧数据: {video_url}")
+            return stale_page, []
+        return None, []
     
-    logger.info(f"异步获取完成，处理了 {len(episodes_to_fetch)} 个剧集")
-    return results
+    # 与上一版本按地址对比，沿用已解析的播放地址
+    added = []
+    previous_page = stale_page or previous_page
+    if previous_page is not None:
+        episodes, added = diff_episodes(previous_page.episodes, page.episodes)
+        page = page._replace(episodes=tuple(episodes))
+        if added:
+            logger.info(f"发现 {len(added)} 个新剧集: {video_url}")
+    
+    max_age = None
+    if catalog is not None:
+        try:
+            catalog.upsert_video(video_url, page)
+            # 重新读取以带上目录中已解析的播放地址和学习到的有效期
+            page, _, max_age = catalog.get_video(video_url, play_url_max_age=config.CACHE_TIMEOUT)
+        except sqlite3.Error as e:
+            logger.error(f"写入视频目录失败 {video_url}: {e}")
+    
+    _video_page_cache.set(video_url, page, timeout=video_ttl(page, max_age))
+    return page, added
 
-def parse_video_details(video_url, use_async=True, max_episodes=None):
-    """解析视频详情，支持异步和延迟加载"""
-    max_episodes = max_episodes or config.MAX_EPISODES
+def _fetch_video_page_upstream(video_url, previous_page=None):
+    """从上游获取并解析视频详情页
+    
+    启用页面存储时按上次保存的ETag和Last-Modified发送条件请求：上游返回304，或返回的页面与上次
+    逐字节相同时，直接沿用previous_page（上次解析的结果）；没有previous_page时才解析页面。
+    """
+    import requests
     
-    # 优化：减少默认的max_episodes以提高首次加载速度
-    if max_episodes > 20:
-        max_episodes = 10  # 首次只加载10集，提高速度
+    store = get_page_store()
+    stored = None
+    if store is not None:
+        try:
+            stored = store.get(video_url)
+        except sqlite3.Error as e:
+            logger.error(f"读取页面存储失败 {video_url}: {e}")
+        # 解析逻辑变化后保存的页面需要重新解析
+        if stored is not None and stored.parser != _PAGE_PARSER_VERSION:
+            stored = None
     
     headers = {
         'User-Agent': config.USER_AGENT
     }
+    headers.update(PageStore.conditional_headers(stored))
     
     try:
-        logger.info(f"开始解析视频详情: {video_url}, max_episodes: {max_episodes}")
-        logger.info(f"请求头: {headers}")
+        # 请求头固定不变，逐步骤的细节只在DEBUG级别输出
+        logger.debug("开始获取视频详情页: %s, 请求头: %s", video_url, headers)
         start_time = time.time()
         
         # 优化：使用更短的超时时间
-        logger.info(f"发送HTTP请求到: {video_url}")
         response = requests.get(video_url, headers=headers, timeout=5)
-        logger.info(f"HTTP响应状态: {response.status_code}")
-        response.raise_for_status()
-        
-        parse_time = time.time() - start_time
-        logger.info(f"页面获取耗时: {parse_time:.2f}秒")
-        
-        # 解析HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 提取主标题
-        title_tag = soup.find('h1', class_='items-title')
-        main_title = ""
-        if title_tag:
-            # 移除<span>标签内容
-            for span in title_tag.find_all('span', class_='items-epname'):
-                span.extract()
-            main_title = title_tag.get_text(strip=True)
-        
-        # 提取标签
-        tags = []
-        tag_links = soup.find_all('a', rel='tag')
-        for tag in tag_links:
-            tag_text = tag.get_text(strip=True)
-            if tag_text:
-                tags.append(tag_text)
-        
-        # 提取更新时间信息
-        time_tag = soup.find('time', class_='excerpt-update')
-        datetime_str = time_tag['datetime'] if time_tag and time_tag.has_attr('datetime') else ""
-        update_text = time_tag.get_text(strip=True) if time_tag else ""
-        
-        # 格式化日期
-        formatted_date = ""
-        if datetime_str:
-            try:
-                dt = datetime.fromisoformat(datetime_str.rstrip('+08:00'))
-                formatted_date = dt.strftime('%Y-%m-%d')
-            except ValueError:
-                formatted_date = datetime_str
-        
-        # 提取状态信息
-        status_info = ""
-        text_info_div = soup.find('div', class_='text-info')
-        if text_info_div:
-            status_span = text_info_div.find('span', class_='info-mark')
-            if status_span:
-                status_info = status_span.get_text(strip=True)
-        
-        # 提取剧集列表
-        episode_list = []
-        ep_items_div = soup.find('div', class_='ep-list-items')
-        if ep_items_div:
-            for a_tag in ep_items_div.find_all('a', class_='ep-item'):
-                episode_title = a_tag.get('title', '').strip()
-                episode_url = a_tag.get('href', '').strip()
-                episode_number = a_tag.get_text(strip=True)
-                
-                episode_list.append({
-                    'title': episode_title,
-                    'url': episode_url,
-                    'number': episode_number,
-                    'play_url': None  # 初始化为None
-                })
-        
-        # 提取首发时间
-        release_date = ""
-        if text_info_div:
-            release_span = text_info_div.find('span', class_='info-addtime')
-            if release_span:
-                release_text = release_span.get_text(strip=True)
-                # 提取日期部分
-                date_match = re.search(r'\d{4}-\d{2}-\d{2}', release_text)
-                if date_match:
-                    release_date = date_match.group(0)
-        
-        # 提取主视频的m3u8播放URL
-        m3u8_url = ""
-        player_section = soup.find('section', class_='player-content')
-        if player_section:
-            script_tags = player_section.find_all('script')
-            for script in script_tags:
-                if script.string:
-                    m3u8_url = extract_m3u8_url_from_script(script.string)
-                    if m3u8_url:
-                        break
+        logger.debug("HTTP响应状态: %s", response.status_code)
         
-        # 获取剧集播放地址
-        if use_async and episode_list:
-            # 使用异步方式获取播放地址
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                episode_list = loop.run_until_complete(
-                    get_episodes_play_urls_async(episode_list, max_episodes=max_episodes)
-                )
-            finally:
-                loop.close()
+        if response.status_code == 304 and stored is not None:
+            logger.info("视频详情页未修改: %s, 耗时: %.2f秒", video_url, time.time() - start_time)
+            outcome, body = 'not_modified', b''
         else:
-            # 使用同步方式获取播放地址（仅前几集）
-            for i, episode in enumerate(episode_list[:max_episodes]):
-                episode['play_url'] = get_episode_play_url(episode['url'])
+            response.raise_for_status()
+            logger.info("获取视频详情页: %s, 耗时: %.2f秒", video_url, time.time() - start_time)
+            if store is None:
+                return parse_video_page(response.text)
+            body = response.content
+            digest = page_digest(body)
+            outcome = 'unchanged' if stored is not None and digest == stored.digest else 'changed'
         
-        # 如果主视频没有播放地址，尝试从第一个剧集获取
-        if not m3u8_url and episode_list:
-            m3u8_url = episode_list[0].get('play_url', '')
+        counts = {'requests': 1, outcome: 1, 'bytes_transferred': len(body)}
+        if outcome == 'not_modified':
+            counts['bytes_saved'] = stored.size
+        if outcome != 'changed':
+            _touch_stored_page(store, video_url, response)
+            if previous_page is not None:
+                store.count(parses_skipped=1, **counts)
+                return previous_page
         
-        result = {
-            'video_title': main_title,
-            'tags': tags,
-            'update_datetime': datetime_str,
-            'formatted_date': formatted_date,
-            'update_text': update_text,
-            'status_info': status_info,
-            'release_date': release_date,
-            'episodes': episode_list,
-            'm3u8_url': m3u8_url
-        }
-        
-        logger.info(f"视频详情解析完成: {main_title}, 剧集数: {len(episode_list)}")
-        return result
+        if outcome == 'not_modified':
+            page = parse_video_page(store.text(stored))
+        else:
+            # 与requests的response.text相同的解码方式，保存编码以便之后按同样方式解码
+            encoding = response.encoding or response.apparent_encoding
+            page = parse_video_page(body.decode(encoding, errors='replace'))
+            if outcome == 'changed':
+                _store_page(store, video_url, response, body, encoding, digest)
+        store.count(parses=1, **counts)
+        return page
     
     except requests.exceptions.RequestException as e:
         logger.error(f"请求错误 {video_url}: {e}")
@@ -506,10 +564,428 @@ def parse_video_details(video_url, use_async=True, max_episodes=None):
         logger.error(f"解析错误 {video_url}: {e}", exc_info=True)
         return None
 
+def _store_page(store, video_url, response, body, encoding, digest):
+    """保存详情页原始内容，失败时只记录日志（下次刷新无条件请求）"""
+    try:
+        store.put(
+            video_url, body, encoding,
+            response.headers.get('ETag'), response.headers.get('Last-Modified'),
+            digest, _PAGE_PARSER_VERSION
+        )
+    except sqlite3.Error as e:
+        logger.error(f"写入页面存储失败 {video_url}: {e}")
+
+def _touch_stored_page(store, video_url, response):
+    """页面未变化，更新检查时间和上游给出的新校验信息"""
+    try:
+        store.touch(video_url, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    except sqlite3.Error as e:
+        logger.error(f"更新页面存储失败 {video_url}: {e}")
+
+def parse_video_page(html):
+    """解析视频详情页HTML，返回Video"""
+    from bs4 import BeautifulSoup
+    
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # 提取主标题
+    title_tag = soup.find('h1', class_='items-title')
+    main_title = ""
+    if title_tag:
+        # 移除<span>标签内容
+        for span in title_tag.find_all('span', class_='items-epname'):
+            span.extract()
+        main_title = title_tag.get_text(strip=True)
+    
+    # 提取标签
+    tags = []
+    tag_links = soup.find_all('a', rel='tag')
+    for tag in tag_links:
+        tag_text = tag.get_text(strip=True)
+        if tag_text:
+            tags.append(tag_text)
+    
+    # 提取更新时间信息
+    time_tag = soup.find('time', class_='excerpt-update')
+    datetime_str = time_tag['datetime'] if time_tag and time_tag.has_attr('datetime') else ""
+    update_text = time_tag.get_text(strip=True) if time_tag else ""
+    
+    # 格式化日期
+    formatted_date = ""
+    if datetime_str:
+        try:
+            dt = datetime.fromisoformat(datetime_str.rstrip('+08:00'))
+            formatted_date = dt.strftime('%Y-%m-%d')
+        except ValueError:
+            formatted_date = datetime_str
+    
+    # 提取状态信息
+    status_info = ""
+    text_info_div = soup.find('div', class_='text-info')
+    if text_info_div:
+        status_span = text_info_div.find('span', class_='info-mark')
+        if status_span:
+            status_info = status_span.get_text(strip=True)
+    
+    # 提取剧集列表
+    episode_list = []
+    ep_items_div = soup.find('div', class_='ep-list-items')
+    if ep_items_div:
+        for a_tag in ep_items_div.find_all('a', class_='ep-item'):
+            episode_title = a_tag.get('title', '').strip()
+            episode_url = a_tag.get('href', '').strip()
+            episode_number = a_tag.get_text(strip=True)
+            
+            episode_list.append(Episode.create(episode_title, episode_url, episode_number))
+    
+    # 提取首发时间
+    release_date = ""
+    if text_info_div:
+        release_span = text_info_div.find('span', class_='info-addtime')
+        if release_span:
+            release_text = release_span.get_text(strip=True)
+            # 提取日期部分
+            date_match = _RELEASE_DATE_PATTERN.search(release_text)
+            if date_match:
+                release_date = date_match.group(0)
+    
+    # 提取主视频的m3u8播放URL
+    m3u8_url = ""
+    player_section = soup.find('section', class_='player-content')
+    if player_section:
+        script_tags = player_section.find_all('script')
+        for script in script_tags:
+            if script.string:
+                m3u8_url = extract_m3u8_url_from_script(script.string)
+                if m3u8_url:
+                    break
+    
+    page = Video.create(
+        title=main_title,
+        tags=tags,
+        update_datetime=datetime_str,
+        formatted_date=formatted_date,
+        update_text=update_text,
+        status_info=status_info,
+        release_date=release_date,
+        m3u8_url=m3u8_url,
+        episodes=episode_list
+    )
+    
+    return page
+
+def get_video_episodes(video_url, offset=0, limit=None, use_async=True, resolve=True):
+    """分页获取剧集列表（Episode对象），只解析请求窗口内剧集的播放地址
+    
+    返回的next_offset为下一页的游标，没有更多剧集时为None。
+    """
+    limit = limit or config.MAX_EPISODES
+    
+    page = fetch_video_page(video_url)
+    if page is None:
+        return None
+    
+    all_episodes = page.episodes
+    window = list(all_episodes[offset:offset + limit])
+    if resolve:
+        # 目录中已有播放地址的剧集不再请求上游
+        pending = [episode for episode in window if not episode.play_url]
+        if pending:
+            resolved = resolve_episode_play_urls(pending, use_async=use_async)
+            resolved_iter = iter(resolved)
+            window = [episode if episode.play_url else next(resolved_iter) for episode in window]
+            _store_resolved_episodes(video_url, page, resolved)
+    
+    end = offset + len(window)
+    return {
+        'episodes': window,
+        'offset': offset,
+        'limit': limit,
+        'total': len(all_episodes),
+        'next_offset': end if end < len(all_episodes) else None
+    }
+
+def _store_resolved_episodes(video_url, page, resolved):
+    """将新解析的播放地址写回详情页缓存和目录，供后续分页和刷新沿用"""
+    episodes, _ = diff_episodes(resolved, page.episodes)
+    page = page._replace(episodes=tuple(episodes))
+    # 保持原有的到期时间，新解析的播放地址可能更早过期
+    remaining = _video_page_cache.expires_in(video_url)
+    _video_page_cache.set(video_url, page, timeout=video_ttl(page, remaining))
+    
+    catalog = get_catalog()
+    if catalog is None:
+        return
+    try:
+        catalog.record_play_urls([(episode.url, episode.play_url) for episode in resolved])
+    except sqlite3.Error as e:
+        logger.error(f"写入播放地址失败: {e}")
+
+def refresh_video(video_url, use_async=True):
+    """从上游刷新一个视频，只解析新增剧集的播放地址
+    
+    已解析的播放地址按剧集地址沿用，返回新增剧集数，失败时返回None。
+    """
+    page, added = _load_video_page(video_url, refresh=True)
+    if page is None:
+        return None
+    
+    if added:
+        resolved = resolve_episode_play_urls(added, use_async=use_async)
+        _store_resolved_episodes(video_url, page, resolved)
+    
+    return len(added)
+
+def refresh_stale_videos(limit=50):
+    """刷新目录中可能有新剧集的视频（连载中的优先），返回成功刷新的数量"""
+    catalog = get_catalog()
+    if catalog is None:
+        return 0
+    
+    refreshed = 0
+    for video_url, checked_at in catalog.stale_videos(limit):
+        # 多个worker同时运行时，只有认领成功的worker会请求上游
+        if not catalog.claim_refresh(video_url, checked_at):
+            continue
+        if refresh_video(video_url) is not None:
+            refreshed += 1
+    
+    if refreshed:
+        logger.info(f"视频目录刷新完成，刷新了 {refreshed} 个视频")
+    return refreshed
+
+_refresher_pid = None
+_refresher_lock = threading.Lock()
+
+def start_catalog_refresher(interval=None):
+    """启动后台线程定期刷新视频目录
+    
+    每个进程只启动一次；gunicorn预加载时由post_fork在每个worker中调用（线程不会随fork复制），
+    多个worker同时刷新时由claim_refresh保证同一视频只被刷新一次。
+    """
+    global _refresher_pid
+    interval = interval or config.CATALOG_REFRESH_INTERVAL
+    if get_catalog() is None or interval <= 0:
+        return None
+    
+    with _refresher_lock:
+        if _refresher_pid == os.getpid():
+            return None
+        _refresher_pid = os.getpid()
+    
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                refresh_stale_videos()
+            except Exception as e:
+                logger.error(f"视频目录刷新出错: {e}", exc_info=True)
+    
+    thread = threading.Thread(target=run, name='catalog-refresher', daemon=True)
+    thread.start()
+    return thread
+
+def parse_video_details(video_url, use_async=True, max_episodes=None):
+    """解析视频详情，返回只包含第一页剧集的Video（episode_count为剧集总数）
+    
+    剩余剧集通过get_video_episodes按游标分页获取。
+    """
+    max_episodes = max_episodes or config.MAX_EPISODES
+    
+    logger.info("开始解析视频详情: %s, max_episodes: %s", video_url, max_episodes)
+    page = fetch_video_page(video_url)
+    if page is None:
+        return None
+    
+    first_page = get_video_episodes(
+        video_url,
+        offset=0,
+        limit=max_episodes,
+        use_async=use_async
+    )
+    episode_list = first_page['episodes']
+    
+    # 如果主视频没有播放地址，尝试从第一个剧集获取
+    m3u8_url = page.m3u8_url
+    if not m3u8_url and episode_list:
+        m3u8_url = episode_list[0].play_url or ''
+    
+    result = page._replace(
+        episodes=tuple(episode_list),
+        next_offset=first_page['next_offset'],
+        m3u8_url=m3u8_url
+    )
+    
+    logger.info("视频详情解析完成: %s, 剧集数: %s", page.title, page.episode_count)
+    return result
+
+# 批量详情请求共用的线程池：详情页使用同步请求，在池中并发获取（每个进程一个，fork后重新创建）
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+# 进行中的详情页获取：超时后重试的批量请求等待同一次获取，不重复请求上游
+_batch_inflight = {}
+_batch_inflight_lock = threading.Lock()
+
+def _get_batch_pool():
+    global _batch_pool
+    if _batch_pool is None:
+        from concurrent.futures import ThreadPoolExecutor
+        with _batch_pool_lock:
+            if _batch_pool is None:
+                _batch_pool = ThreadPoolExecutor(
+                    max_workers=config.VIDEOS_BATCH_WORKERS,
+                    thread_name_prefix='video-batch'
+                )
+    return _batch_pool
+
+def _submit_page_fetch(video_url):
+    """在线程池中获取详情页，同一地址进行中时返回已有的Future"""
+    with _batch_inflight_lock:
+        future = _batch_inflight.get(video_url)
+        if future is not None:
+            return future
+        future = _get_batch_pool().submit(fetch_video_page, video_url)
+        _batch_inflight[video_url] = future
+    # 在锁外注册：已完成的Future会立即在当前线程中调用回调，回调需要获取同一把锁
+    future.add_done_callback(lambda _: _forget_page_fetch(video_url))
+    return future
+
+def _forget_page_fetch(video_url):
+    with _batch_inflight_lock:
+        _batch_inflight.pop(video_url, None)
+
+def fetch_video_details_batch(video_urls, max_episodes=1, resolve=True, max_concurrent=None, timeout=None):
+    """并发获取多个视频的详情，返回(结果, 超时未完成的地址列表)
+    
+    结果为{video_url: Video或None（获取失败）}，Video只包含前max_episodes集（episode_count为总数）。
+    详情页依次查找内存缓存、目录和上游；resolve为True时在当前线程的异步会话上解析这些剧集的播放地址。
+    max_concurrent限制本次调用同时进行的上游请求数，timeout秒后返回已完成的部分，
+    未完成的详情页仍在后台获取并写入缓存，重试时可直接命中。
+    """
+    loop = _get_event_loop()
+    return loop.run_until_complete(_fetch_video_details_batch_async(
+        video_urls,
+        max_episodes,
+        resolve,
+        max_concurrent or config.VIDEOS_BATCH_CONCURRENCY,
+        timeout or config.VIDEOS_BATCH_TIMEOUT
+    ))
+
+async def _fetch_video_details_batch_async(video_urls, max_episodes, resolve, max_concurrent, timeout):
+    import asyncio
+    
+    semaphore = asyncio.Semaphore(max_concurrent)
+    session = await get_session() if resolve else None
+    
+    async def fetch(video_url):
+        # 内存缓存命中时不切换线程
+        page = _video_page_cache.get(video_url)
+        if page is None:
+            async with semaphore:
+                # 超时取消时不取消线程池中的获取，完成后结果照常写入缓存
+                page = await asyncio.shield(asyncio.wrap_future(_submit_page_fetch(video_url)))
+        if page is None:
+            return None
+        
+        window = list(page.episodes[:max_episodes])
+        pending = [episode for episode in window if not episode.play_url] if resolve else []
+        if pending:
+            async def resolve_episode(episode):
+                async with semaphore:
+                    try:
+                        play_url = await get_episode_play_url_async(session, episode.url)
+                    except Exception as e:
+                        logger.error(f"获取剧集播放地址失败: {e}")
+                        play_url = None
+                return episode.with_play_url(play_url)
+            
+            resolved = await asyncio.gather(*(resolve_episode(episode) for episode in pending))
+            resolved_iter = iter(resolved)
+            window = [episode if episode.play_url else next(resolved_iter) for episode in window]
+            _store_resolved_episodes(video_url, page, resolved)
+        
+        m3u8_url = page.m3u8_url
+        if not m3u8_url and window:
+            m3u8_url = window[0].play_url or ''
+        return page._replace(
+            episodes=tuple(window),
+            next_offset=len(window) if len(window) < len(page.episodes) else None,
+            m3u8_url=m3u8_url
+        )
+    
+    tasks = {asyncio.ensure_future(fetch(video_url)): video_url for video_url in dict.fromkeys(video_urls)}
+    done, not_done = await asyncio.wait(tasks, timeout=timeout)
+    for task in not_done:
+        task.cancel()
+    if not_done:
+        await asyncio.wait(not_done)
+        logger.warning("批量获取详情超时，%s/%s 个视频未完成", len(not_done), len(tasks))
+    
+    results = {}
+    for task in done:
+        video_url = tasks[task]
+        try:
+            results[video_url] = task.result()
+        except Exception as e:
+            logger.error(f"批量获取详情失败 {video_url}: {e}", exc_info=True)
+            results[video_url] = None
+    return results, [tasks[task] for task in not_done]
+
+def warm_up():
+    """预先导入上游请求和解析依赖
+    
+    gunicorn在fork worker之前于主进程调用，worker以写时复制方式共享已导入的模块，
+    回收重启的worker无需再次导入。
+    """
+    import asyncio
+    import aiohttp
+    import requests
+    from bs4 import BeautifulSoup
+    
+    # 初始化html.parser解析器
+    BeautifulSoup('<html></html>', 'html.parser')
+
 def clear_cache():
-    """清除播放地址缓存"""
+    """清除播放地址缓存和详情页缓存"""
     _play_url_cache.clear()
+    _video_page_cache.clear()
+
+def invalidate_video(video_id, namespace=None):
+    """在所有worker中使一个视频的缓存失效，返回新的失效序号
+    
+    范围包括视频ID和该视频各剧集的地址（剧集地址取自目录和本worker的详情页缓存）；
+    目录中的记录同时标记为过期并丢弃已解析的播放地址，下次请求从上游重新获取并重新解析。
+    """
+    video_url = get_play_link_by_id(video_id)
+    episode_urls = set()
+    catalog = get_catalog()
+    if catalog is not None:
+        try:
+            episode_urls.update(catalog.expire_video(video_url))
+        except sqlite3.Error as e:
+            logger.error(f"标记目录过期失败 {video_url}: {e}")
+    page = _video_page_cache.get(video_url)
+    if page is not None:
+        episode_urls.update(episode.url for episode in page.episodes)
+    # 详情页失效时不再按校验信息沿用上次的解析结果
+    store = get_page_store()
+    if store is not None and namespace != 'episode':
+        try:
+            store.discard(video_url)
+        except sqlite3.Error as e:
+            logger.error(f"删除已保存的详情页失败 {video_url}: {e}")
+    
+    # 播放地址缓存使用完整地址作为键
+    scopes = [video_id] + [
+        url if url.startswith('http') else f"https://djw1.com{url}"
+        for url in episode_urls
+    ]
+    return generations.invalidate(namespace, scopes)
 
 def get_cache_stats():
     """获取缓存统计信息"""
-    return _play_url_cache.stats()
\ No newline at end of file
+    return _play_url_cache.stats()
+
+def get_page_cache_stats():
+    """获取详情页缓存统计信息"""
+    return _video_page_cache.stats()
\ No newline at end of file
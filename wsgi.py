@@ -6,7 +6,9 @@ WSGI 入口文件
 用于生产环境部署
 """
 
-from app import app
+from app import create_app
+
+app = create_app()
 
 if __name__ == "__main__":
     app.run()
\ No newline at end of file